@@ -0,0 +1,54 @@
+"""
+Compare the time to build a SubmitImportJob request with suds factory objects (submitPortfolioImportJob) and with
+the bulk template builder (submitBulkPortfolioImportJob), for synthetic portfolios of increasing size, and check that
+both requests are identical. Nothing is sent to the server.
+
+The credentials are read from the BDT_URL, BDT_USER_ID, BDT_PASSWORD and BDT_CLIENT_ID environment variables.
+Run it from the repository root with python -m benchmarks.benchmark_import
+"""
+import os
+import time
+
+import numpy as np
+
+from msci.bdt.context.ServiceClient import ServiceClient
+from msci.bdt.context.import_builder import build_import_envelope
+
+url = os.environ.get('BDT_URL', 'https://www.barraone.com')
+user_id = os.environ.get('BDT_USER_ID', '')
+password = os.environ.get('BDT_PASSWORD', '')
+client_id = os.environ.get('BDT_CLIENT_ID', '')
+
+sizes = [1000, 10000, 50000]
+
+
+def synthetic_portfolio(num_positions):
+    rng = np.random.default_rng(num_positions)
+    return {
+        'PortfolioName': 'BENCHMARK_%i' % num_positions,
+        'EffectiveStartDate': '2024-07-12',
+        'Positions': {
+            'id': ['ID%08i' % i for i in range(num_positions)],
+            'idtype': ['CUSIP'] * num_positions,
+            'Holdings': rng.integers(1, 100000, num_positions).astype(float),
+        }
+    }
+
+
+with ServiceClient(url, user_id, password, client_id) as bdt_service_client:
+    # suds returns the request instead of sending it
+    bdt_service_client.client.set_options(nosend=True)
+
+    for size in sizes:
+        port_list = [synthetic_portfolio(size)]
+
+        start = time.perf_counter()
+        suds_envelope = bdt_service_client.submitPortfolioImportJob(port_list).envelope
+        suds_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk_envelope = build_import_envelope(bdt_service_client, port_list, 'BDTImportUserPort')
+        bulk_time = time.perf_counter() - start
+
+        print('%8i positions   suds %8.3f s   bulk %8.3f s   x%6.1f   identical: %s'
+              % (size, suds_time, bulk_time, suds_time / bulk_time, suds_envelope == bulk_envelope))
@@ -0,0 +1,57 @@
+"""
+Compare the time to download an interactive positions report with suds building the report objects and with the
+raw-XML fast path (InteractiveClient.fast_pos_report), for the first stored analytics available, and check that both
+return the same values.
+
+The credentials are read from the BDT_URL, BDT_USER_ID, BDT_PASSWORD and BDT_CLIENT_ID environment variables.
+Run it from the repository root with python -m benchmarks.benchmark_pos_report
+"""
+import os
+import time
+
+import numpy as np
+
+from msci.bdt.context.BDTClient import BDTClient
+from msci.bdt.context.InteractiveClient import InteractiveClient
+
+url = os.environ.get('BDT_URL', 'https://www.barraone.com')
+user_id = os.environ.get('BDT_USER_ID', '')
+password = os.environ.get('BDT_PASSWORD', '')
+client_id = os.environ.get('BDT_CLIENT_ID', '')
+
+names = BDTClient.POS_REPORT_COLS['Text'] + BDTClient.POS_REPORT_COLS['Numeric']
+cols = {'Name': names, 'Owner': ['SYSTEM'] * len(names)}
+
+
+def same_columns(suds_report, fast_report):
+    """
+    Return True if the columns of both reports are equal, NaN being equal to NaN in the float64 columns
+    """
+    for name, values in suds_report.items():
+        a, b = np.asarray(values), np.asarray(fast_report.get(name))
+        if a.dtype.kind == 'f' and b.dtype.kind == 'f':
+            if not np.array_equal(a, b, equal_nan=True):
+                return False
+        elif a.shape != b.shape or not np.array_equal(a, b):
+            return False
+    return True
+
+
+with InteractiveClient(url, user_id, password, client_id) as bdt_client:
+    stored_analytics = bdt_client.get_available_stored_analytics()[0]
+
+    timings = {}
+    reports = {}
+    for fast in (False, True):
+        InteractiveClient.fast_pos_report = fast
+        for data_rows in (True, False):
+            start = time.perf_counter()
+            reports[fast, data_rows] = bdt_client.get_stored_analytics_position_report(stored_analytics, cols,
+                                                                                      data_rows)
+            timings[fast, data_rows] = time.perf_counter() - start
+
+    for data_rows in (True, False):
+        fast_report = reports[True, data_rows]
+        print('data_rows=%-5s %8i rows   suds %8.3f s   fast %8.3f s   identical: %s'
+              % (data_rows, len(next(iter(fast_report.values()), [])), timings[False, data_rows],
+                 timings[True, data_rows], same_columns(reports[False, data_rows], fast_report)))
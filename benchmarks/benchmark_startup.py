@@ -0,0 +1,50 @@
+"""
+Measure the construction time of a ServiceClient:
+
+- cold: the WSDL and schemas are fetched and parsed
+- disk cache: a new process would find the parsed WSDL in the on-disk WsdlCache
+- in process: the suds client built for the first ServiceClient is cloned
+
+The credentials are read from the BDT_URL, BDT_USER_ID, BDT_PASSWORD and BDT_CLIENT_ID environment variables.
+Run it from the repository root with python -m benchmarks.benchmark_startup
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from msci.bdt.context.BDTClient import BDTClient
+from msci.bdt.context.ServiceClient import ServiceClient
+
+url = os.environ.get('BDT_URL', 'https://www.barraone.com')
+user_id = os.environ.get('BDT_USER_ID', '')
+password = os.environ.get('BDT_PASSWORD', '')
+client_id = os.environ.get('BDT_CLIENT_ID', '')
+
+repeat = 5
+
+
+def construct():
+    start = time.perf_counter()
+    ServiceClient(url, user_id, password, client_id)
+    return time.perf_counter() - start
+
+
+cache_dir = tempfile.mkdtemp(prefix='bdt-wsdl-benchmark-')
+BDTClient.wsdl_cache_dir = cache_dir
+try:
+    timings = {'cold': [], 'disk cache': [], 'in process': []}
+    for _ in range(repeat):
+        shutil.rmtree(cache_dir)
+        BDTClient._client_templates.clear()
+        timings['cold'].append(construct())
+
+        BDTClient._client_templates.clear()
+        timings['disk cache'].append(construct())
+
+        timings['in process'].append(construct())
+
+    for name, values in timings.items():
+        print('%-12s best %8.1f ms   mean %8.1f ms' % (name, 1000 * min(values), 1000 * sum(values) / len(values)))
+finally:
+    shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,195 @@
+import asyncio
+from contextlib import contextmanager
+from functools import partial
+
+from msci.bdt.context.ServiceClient import ServiceClient
+from msci.bdt.context.exceptions import BDTError
+from msci.bdt.context.pool import ClientPool
+
+
+class AsyncServiceClient(object):
+    """
+    asyncio front-end to a pool of ServiceClient.
+
+    The blocking suds calls run on an executor, each on a client leased from the pool for the duration of the call
+    (suds clients cannot be shared between threads), so that the number of concurrent server calls is the size of the
+    pool. Job polling sleeps with asyncio.sleep, so that a single event loop can drive many jobs in flight. Report
+    parsing is offloaded to a separate executor so that it neither blocks the loop nor holds a client.
+
+    Create it around a ClientPool, or with ``await AsyncServiceClient.connect(...)`` to build the pool off the event
+    loop. A single ServiceClient is also accepted, its calls then being run one at a time.
+
+    The jobs sent are tracked in export_jobs, shared by all the clients of the pool so that a job sent on one client
+    and downloaded on another is forgotten once done, and its reports found in the report_cache of the clients.
+    """
+
+    def __init__(self, clients, executor=None, report_executor=None):
+        """
+        :param clients: the pool of synchronous clients, see ClientPool.service, or a single client
+        :type clients:  msci.bdt.context.pool.ClientPool or msci.bdt.context.ServiceClient.ServiceClient
+        :param executor: concurrent.futures executor running the server calls (event loop default if None)
+        :type executor:  concurrent.futures.Executor
+        :param report_executor: concurrent.futures executor running readReport (event loop default if None)
+        :type report_executor:  concurrent.futures.Executor
+        """
+        if isinstance(clients, ClientPool):
+            self.pool = clients
+            # client whose settings and parsing methods are used, readReport makes no server call so it may run on a
+            # client leased to another thread
+            with self.pool.lease() as client:
+                self.sync_client = client
+        else:
+            self.pool = None
+            self.sync_client = clients
+        self.export_jobs = self.sync_client.export_jobs
+        self.logger = self.sync_client.logger
+        self.semaphore = asyncio.Semaphore(1 if self.pool is None else self.pool.size)
+        self.executor = executor
+        self.report_executor = report_executor
+
+    @classmethod
+    async def connect(cls, url, user_id, password, client_id, logger=None, timeout=50000, max_concurrent_calls=8,
+                      executor=None, report_executor=None, **kwargs):
+        """
+        Build a pool of max_concurrent_calls ServiceClient on the executor and return the async client
+
+        See ServiceClient for url, user_id, password, client_id, logger, timeout and kwargs, and __init__ for the rest.
+        """
+        loop = asyncio.get_running_loop()
+        pool = await loop.run_in_executor(executor, partial(ClientPool.service, url, user_id, password, client_id,
+                                                            max_concurrent_calls, logger, timeout, **kwargs))
+        return cls(pool, executor, report_executor)
+
+    @contextmanager
+    def _lease(self):
+        if self.pool is None:
+            yield self.sync_client
+        else:
+            with self.pool.lease() as client:
+                yield client
+
+    def _call(self, method, args, kwargs):
+        with self._lease() as client:
+            # whichever client runs the call, see export_jobs
+            client.export_jobs = self.export_jobs
+            return method(client, *args, **kwargs)
+
+    async def _run(self, method, *args, **kwargs):
+        """
+        Run a blocking client method making server calls on the executor, once a call slot is available
+
+        :param method: function taking the leased client followed by args and kwargs, e.g. ServiceClient.waitJob
+        :type method:  callable
+        """
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(self._call, method, args, kwargs))
+
+    async def call(self, name, *args, **kwargs):
+        """
+        Call a BDT service method with the credentials, as service_client.service.<name>(*args, **kwargs) does
+        """
+        return await self._run(lambda client, *a, **k: getattr(client.service, name)(*a, **k), *args, **kwargs)
+
+    async def createExportSet(self, export_set_type, export_setup_args):
+        return await self._run(ServiceClient.createExportSet, export_set_type, export_setup_args)
+
+    async def createPorfolioAnalysisExportSet(self, name, model, portfolio_list, report_list, **kwargs):
+        return await self._run(ServiceClient.createPorfolioAnalysisExportSet, name, model, portfolio_list,
+                               report_list, **kwargs)
+
+    async def createPorfolioExposureExportSet(self, name, model, portfolio_list, **kwargs):
+        return await self._run(ServiceClient.createPorfolioExposureExportSet, name, model, portfolio_list, **kwargs)
+
+    async def createMPCExportSet(self, name, model, case_name, report_list, **kwargs):
+        return await self._run(ServiceClient.createMPCExportSet, name, model, case_name, report_list, **kwargs)
+
+    async def deleteExportSet(self, export_set_name):
+        return await self._run(ServiceClient.deleteExportSet, export_set_name)
+
+    async def sendExportJob(self, exp_set_name, analysis_date, job_name):
+        return await self._run(ServiceClient.sendExportJob, exp_set_name, analysis_date, job_name)
+
+    async def getJobStatus(self, job_id, job_type):
+        return await self._run(ServiceClient.getJobStatus, job_id, job_type)
+
+    async def waitJob(self, job_id, job_type):
+        """
+        Wait for job to be completed on the server without blocking the event loop
+
+        :param job_id:
+        :type job_id:  str
+        :param job_type: 'Import', 'Export', ...
+        :type job_type:  str
+        """
+        status = await self.getJobStatus(job_id, job_type)
+        while status > 0:
+            self.logger.debug('Expected time to finish job %s: %i' % (job_id, status))
+            await asyncio.sleep(status * self.sync_client.poll_factor)
+            status = await self.getJobStatus(job_id, job_type)
+
+        if status:
+            msg = 'Job id %s failed:%i' % (job_id, status)
+            self.logger.error(msg)
+            # a failed job is never downloaded
+            self.sync_client._forget_export_job(job_id)
+            raise BDTError(msg, job_id, status)
+
+    async def getExportJob(self, job_id, stream=None):
+        return await self._run(ServiceClient.getExportJob, job_id, stream)
+
+    async def readReport(self, byte_array, export_set_type, **kwargs):
+        """
+        Parse the ExportSet Binary data on the report executor, see _CommonClient.readReport
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.report_executor, partial(self.sync_client.readReport, byte_array,
+                                                                        export_set_type, **kwargs))
+
+    async def _get_report(self, report_type, job_id, wait_for_completion, **kwargs):
+        """
+        Async equivalent of _CommonClient._get_report, reading the report_cache and parsing on the report executor
+        """
+        self.logger.info('Parsing %s report for job id : %s ' % (report_type, job_id))
+        loop = asyncio.get_running_loop()
+        reports, cache_key = await loop.run_in_executor(self.report_executor, partial(self.sync_client._cached_report,
+                                                                                      report_type, job_id, kwargs))
+        if reports is not None:
+            return reports
+
+        if wait_for_completion:
+            await self.waitJob(job_id, 'Export')
+        byte_array = await self.getExportJob(job_id)
+        return await loop.run_in_executor(self.report_executor, partial(self._read_export_data, byte_array,
+                                                                        report_type, cache_key, kwargs))
+
+    def _read_export_data(self, byte_array, report_type, cache_key, kwargs):
+        # closes the data once read if it was streamed to a temporary file
+        reports = self.sync_client._read_export_data(byte_array, report_type, **kwargs)
+        self.sync_client._cache_report(cache_key, reports)
+        return reports
+
+    async def getMPCReport(self, job_id, *, wait_for_completion=True, **kwargs):
+        return await self._get_report('MPC', job_id, wait_for_completion, **kwargs)
+
+    async def getPortfolioAnalysisReports(self, job_id, *, wait_for_completion=True, **kwargs):
+        return await self._get_report('PortfolioAnalysis', job_id, wait_for_completion, **kwargs)
+
+    async def getPortfolioExposureReports(self, job_id, *, wait_for_completion=True, **kwargs):
+        return await self._get_report('PortfolioExposure', job_id, wait_for_completion, **kwargs)
+
+    async def terminate(self):
+        """
+        Terminate the clients, closing the pool
+        """
+        if self.pool is None:
+            await self._run(ServiceClient.terminate)
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self.pool.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.terminate()
@@ -1,5 +1,15 @@
+import threading
+
+from suds import tostr
+from suds.client import Client, ServiceSelector, _SoapClient
+from suds.options import Options
+from suds.properties import Unskin
 from suds.plugin import MessagePlugin
 from suds.bindings import binding
+from suds.transport import Request, TransportError
+
+from msci.bdt.context.transport import HttpAuthenticated
+from msci.bdt.context.wsdl_cache import WsdlCache
 
 try:
     from urllib.parse import urlparse
@@ -7,8 +17,33 @@ except ImportError:
     from urlparse import urlparse
 
 
+def clone_suds_client(template, **kwargs):
+    """
+    Return a new suds client sharing the WSDL, factory and service definitions of the template, with a copy of its
+    options updated with kwargs.
+
+    Equivalent to Client.clone followed by set_options, except that the options are copied shallowly (suds deep
+    copies them, which recurses endlessly on the BDT WSDL) and that the clone gets the transport from kwargs or a
+    new default one.
+    """
+    client = Client.__new__(Client)
+    client.options = Options()
+    # the transport options are linked to the client options, a transport cannot be shared
+    options = {k: v for k, v in Unskin(template.options).defined.items() if k != 'transport'}
+    options.update(kwargs)
+    client.options.transport = options.pop('transport', None) or HttpAuthenticated()
+    client.set_options(**options)
+    client.wsdl = template.wsdl
+    client.factory = template.factory
+    client.service = ServiceSelector(client, template.wsdl.services)
+    client.sd = template.sd
+    client.messages = dict(tx=None, rx=None)
+    return client
+
+
 class BDTClient(object):
-    # A list of the numeric and text columns available in BarraOne position reports (not comprehensive)
+    # A list of the numeric and text columns available in BarraOne position reports (not comprehensive), which
+    # InteractiveClient.pos_report_schema converts to float64 and text columns
     POS_REPORT_COLS = {
         "Numeric": [
             'Holdings', 'Mkt Value','Price','Weight (%)', 'FX Conversion Rate',
@@ -24,6 +59,18 @@ class BDTClient(object):
         ]
     }
     
+    # Folder of the on-disk WSDL cache shared by the clients (a private folder of the user in the temporary directory
+    # if None), and number of seconds a cached WSDL is used before being revalidated with the server. Set
+    # use_wsdl_cache to False to read the WSDL from the server for each client.
+    use_wsdl_cache = True
+    wsdl_cache_dir = None
+    wsdl_cache_max_age = 3600
+
+    # suds clients already built in this process, by url and options, cloned to build new clients without reading
+    # the WSDL again and with the types already resolved by their factory
+    _client_templates = {}
+    _client_templates_lock = threading.Lock()
+
     def __init__(self, url, user_id, password, client_id, logger=None, timeout=5000, **kwargs):
 
         """
@@ -59,6 +106,9 @@ class BDTClient(object):
 
         if not isinstance(url, list):
             url = [url]
+        # a client may be built without contacting the server (cloned or cached WSDL), check the endpoints are up to
+        # fail over to the next one
+        self._check_endpoint = len(url) > 1
 
         connection_errors = []
         for url0 in url:
@@ -95,6 +145,79 @@ class BDTClient(object):
         """
         raise NotImplemented
 
+    def _new_suds_client(self, plugins, **kwargs):
+        """
+        Return a suds client for self.url, cloned from the one built for the same url and options in this process if
+        any, the WSDL being otherwise read through the WsdlCache
+
+        :param plugins: the suds plugins of this client
+        :type plugins:  list
+        :param kwargs: kwargs for the underlying suds client
+        """
+        try:
+            key = (type(self).__name__, self.url, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            # options we cannot compare, no template
+            key = None
+
+        with self._client_templates_lock:
+            template = self._client_templates.get(key)
+            # True if the server was contacted to build the client
+            fetched = False
+            if template is None:
+                transport = HttpAuthenticated()
+                options = {'cache': None}
+                if self.use_wsdl_cache:
+                    options = {'cache': WsdlCache(transport, self.wsdl_cache_dir, self.wsdl_cache_max_age),
+                               'cachingpolicy': 1}
+                options.update(kwargs)
+                template = Client(self.url, location=self.url, transport=transport, **options)
+                fetched = bool(transport.document_validators)
+                if key is not None:
+                    self._client_templates[key] = template
+
+        client = clone_suds_client(template, timeout=self.timeout, plugins=plugins, transport=HttpAuthenticated())
+        if not fetched and self._check_endpoint:
+            self._probe_endpoint(client)
+        return client
+
+    def _probe_endpoint(self, client):
+        """
+        Open the WSDL url, raising an exception if the server cannot be reached or replies with an error, as reading
+        the WSDL would
+
+        :param client: the suds client whose transport is used
+        :type client:  suds.client.Client
+        """
+        # the body is not read, only the reply status matters
+        client.options.transport._open(Request(self.url, None, self.timeout)).close()
+
+    def _open_service_stream(self, name, *args):
+        """
+        Call a service method with the arguments given, but return the open HTTP response instead of letting suds read
+        and parse the reply. SOAP faults are raised as WebFault, as suds does.
+        """
+        method = getattr(self.client.service, name).method
+        soapenv = method.binding.input.get_message(method, args, {})
+        request = self._service_request(method, soapenv.plain().encode('utf-8'))
+        try:
+            return self.client.options.transport.open_stream(request)
+        except TransportError as e:
+            content = e.fp and e.fp.read() or ''
+            # raises the WebFault of a SOAP fault reply
+            _SoapClient(self.client, method).process_reply(content, e.httpcode, tostr(e))
+            raise
+
+    def _service_request(self, method, envelope):
+        """
+        Return the transport request sending a SOAP envelope for a service method, as suds would
+        """
+        request = Request(self.url, envelope, self.timeout)
+        request.headers = {'Content-Type': 'text/xml; charset=utf-8', 'SOAPAction': method.soap.action}
+        request.headers.update(self.client.options.headers)
+        return request
+
     def _get_service_method(self, name):
         """
         Return the handler to the service method
@@ -1,11 +1,45 @@
-from suds.client import Client
+import re
+import time
+from functools import partial
+from suds import WebFault, tostr
+from suds.sudsobject import Object
+from suds.transport import TransportError
+
 from msci.bdt.context.BDTClient import BDTClient, LogPlugin
-from msci.bdt.context.transport import HttpAuthenticated
-from collections import defaultdict
+from msci.bdt.context.pos_report import DEFAULT_DATA_TYPES, ReportSchema, read_positions_report
+from collections import OrderedDict, defaultdict
 
 
 class InteractiveClient(BDTClient):
     wsdl = '/bdti/BDTInteractive?wsdl'
+    # Number of seconds after login after which SessionPool logs the session in again, to stay below the session
+    # expiry of the server
+    session_lifetime = 1500
+    # Fault strings of the SOAP faults meaning that the session expired or is not logged in, upon which the call is
+    # retried once after logging in again. Only the whole fault string is matched, so that other faults merely
+    # mentioning the session are raised as they are.
+    AUTH_FAULT_RE = re.compile(r'\s*(user (is )?not logged in|not logged in|session (has )?(expired|timed out)|'
+                               r'(invalid|unknown|expired) session( id)?|session (id )?(is )?(invalid|not found)|'
+                               r'authentication (failed|required))\.?\s*', re.I)
+    # If True, download_pos_report reads the GetPositionsReport reply XML straight into columns instead of letting
+    # suds build the report objects, see msci.bdt.context.pos_report
+    fast_pos_report = False
+    # Types of the positions report columns, see msci.bdt.context.pos_report.ReportSchema: numeric columns are returned
+    # as float64 arrays and text columns as arrays of interned strings. Register more columns to convert them, set to
+    # None to return the cell values as strings.
+    pos_report_schema = ReportSchema(BDTClient.POS_REPORT_COLS, DEFAULT_DATA_TYPES)
+    # Set* methods whose calls are skipped when they would not change the session state, each with the Set* methods
+    # which may change that state on the server as a side effect, or after which it must be set again (the holdings of
+    # the current portfolio depend on the analysis date and the model)
+    STATE_METHODS = {
+        'SetAnalysisDate': ('SetCurrentPortfolioStoredAnalytics',),
+        'SetModel': ('SetCurrentPortfolioStoredAnalytics',),
+        'SetCurrentPortfolio': ('SetAnalysisDate', 'SetModel', 'SetCurrentPortfolioStoredAnalytics',
+                                'SetAdHocPortfolio'),
+        'SetCurrentSettings': ('SetAnalysisDate', 'SetModel', 'SetCurrentPortfolioStoredAnalytics'),
+        'SetCurrentPortfolioStoredAnalytics': ('SetAnalysisDate', 'SetModel', 'SetCurrentPortfolio',
+                                               'SetCurrentSettings', 'SetAdHocPortfolio'),
+    }
 
     def __init__(self, url, user_id, password, client_id, logger=None, timeout=50000, **kwargs):
 
@@ -27,23 +61,73 @@ class InteractiveClient(BDTClient):
         """
 
         BDTClient.__init__(self, url, user_id, password, client_id, logger, timeout, **kwargs)
-        self.service = self.client.service
+        # Override service with helper
+        self.service = _Session(self)
+        # name -> (args, kwargs) of the last call of each Set* service method, replayed after logging in again
+        self.session_state = OrderedDict()
+        # name -> (arguments, result) of the STATE_METHODS calls the session is known to be in
+        self.state_cache = {}
+        # number of Set* calls skipped as the session was already in that state
+        self.skipped_calls = 0
+        self.login_time = None
+        self.login()
+
+    def login(self):
+        """
+        Log in, starting a new session
+
+        """
         self.logger.debug('Interactive client login in progress...')
         try:
-            self.service.Login(self.user_id, self.client_id, self.password)
+            self.client.service.Login(self.user_id, self.client_id, self.password)
         except Exception as e:
             msg = 'Unable to login to url: "%s"' % self.url
             detail = 'Error received: %s type:%s' % (e, type(e))
             raise Exception(msg, detail)
+        self.login_time = time.monotonic()
         self.logger.debug('... logged in.')
 
+    def relogin(self):
+        """
+        Log in again, e.g. once the session expired, and restore the session state (analysis date, model, current
+        portfolio...) by replaying the last call of each Set* service method
+
+        """
+        try:
+            self.client.service.Logout()
+        except Exception as e:
+            self.logger.debug('Logout of the previous session failed: %s' % e)
+        self.login()
+        self.state_cache.clear()
+        for name, (args, kwargs) in list(self.session_state.items()):
+            self.logger.debug('Restoring session state: %s' % name)
+            getattr(self.client.service, name)(*args, **kwargs)
+
+    def session_expiring(self):
+        """
+        Return True if the session was logged in for longer than session_lifetime
+
+        """
+        return time.monotonic() - self.login_time > self.session_lifetime
+
+    def is_auth_fault(self, error):
+        """
+        Return True if the error of a service call means that the session expired or is not logged in
+
+        """
+        if isinstance(error, TransportError):
+            return error.httpcode in (401, 403)
+        if not isinstance(error, WebFault):
+            return False
+        fault_string = getattr(error.fault, 'faultstring', None)
+        return fault_string is not None and self.AUTH_FAULT_RE.fullmatch(tostr(fault_string)) is not None
+
     def _get_client(self, **kwargs):
         """
         Return the python suds client
 
         """
-        return Client(self.url, location=self.url, cache=None, timeout=self.timeout,
-                      plugins=[LogPlugin(self.logger, True)], transport=HttpAuthenticated(), **kwargs)
+        return self._new_suds_client([LogPlugin(self.logger, True)], **kwargs)
 
     def terminate(self):
         """
@@ -51,7 +135,7 @@ class InteractiveClient(BDTClient):
 
         """
         self.logger.debug('Logging out ... ')
-        self.service.Logout()
+        self.client.service.Logout()
         self.logger.debug('... Done')
 
     def get_available_stored_analytics(self):
@@ -94,6 +178,8 @@ class InteractiveClient(BDTClient):
         :type cols:  dict
         :param data_rows: set to True to get position level data, false to get just top-level results (faster)
         :type data_rows: boolean
+        :return: column name -> column, converted according to pos_report_schema
+        :rtype: dict
         """
 
         # set the view to the selected columns
@@ -112,6 +198,10 @@ class InteractiveClient(BDTClient):
         grouping = []
         sorting = []
 
+        if self.fast_pos_report:
+            with self.service.open_stream('GetPositionsReport', columns, grouping, settings, sorting) as reply:
+                return read_positions_report(reply, data_rows, self.pos_report_schema)
+
         # get the position report for designed columns
         reportres = self.service.GetPositionsReport(columns, grouping, settings, sorting)
 
@@ -142,6 +232,10 @@ class InteractiveClient(BDTClient):
                 else:
                     continue
 
+        if self.pos_report_schema is not None:
+            definitions = {col._Name: {k.lstrip('_'): v for k, v in dict(col).items()} for col in col_def}
+            return self.pos_report_schema.convert(positions, definitions)
+
         # return back the results
         return positions
 
@@ -184,3 +278,71 @@ class InteractiveClient(BDTClient):
         return rej
 
         
+
+
+class _Session(object):
+    """
+    This is a helper object, used by the InteractiveClient object, to keep the session usable across expiries: the
+    calls of the Set* methods are recorded to be replayed after a new login, and a call failing because the session
+    expired is retried once after logging in again. The calls of the STATE_METHODS setting the state the session is
+    already in are skipped.
+    """
+
+    def __init__(self, IC):
+        self.IC = IC
+
+    def __getattr__(self, item):
+        def f(*args, **kwargs):
+            if item not in self.IC.STATE_METHODS:
+                return self._call(item, getattr(self.IC.client.service, item), args, kwargs)
+
+            key = state_key((args, kwargs))
+            cached = self.IC.state_cache.get(item)
+            if cached is not None and cached[0] == key:
+                self.IC.skipped_calls += 1
+                return cached[1]
+            self.IC.state_cache.pop(item, None)
+            result = self._call(item, getattr(self.IC.client.service, item), args, kwargs)
+            # a failed call did not set the state, it is sent again next time
+            if getattr(result, 'IsDone', True):
+                self.IC.state_cache[item] = (key, result)
+            return result
+
+        return f
+
+    def open_stream(self, item, *args):
+        """
+        Call a service method like the other methods, but return the open HTTP response of the reply
+        """
+        return self._call(item, partial(self.IC._open_service_stream, item), args, {})
+
+    def _call(self, item, method, args, kwargs):
+        try:
+            result = method(*args, **kwargs)
+        except (WebFault, TransportError) as e:
+            if item in ('Login', 'Logout') or not self.IC.is_auth_fault(e):
+                raise
+            self.IC.logger.warning('Session lost, logging in again: %s' % e)
+            self.IC.relogin()
+            result = method(*args, **kwargs)
+        if item.startswith('Set'):
+            self.IC.session_state.pop(item, None)
+            self.IC.session_state[item] = (args, kwargs)
+            # the states this call may have changed are unknown
+            for name, side_effects in self.IC.STATE_METHODS.items():
+                if item in side_effects:
+                    self.IC.state_cache.pop(name, None)
+        return result
+
+
+def state_key(value):
+    """
+    Return a comparable snapshot of the arguments of a service call, suds objects being compared by content
+    """
+    if isinstance(value, Object):
+        return tuple((name, state_key(v)) for name, v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((name, state_key(v)) for name, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(state_key(v) for v in value)
+    return value
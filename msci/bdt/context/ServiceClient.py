@@ -1,15 +1,45 @@
 from warnings import warn
+import inspect
 import zipfile
 import csv
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import ExitStack
 from io import StringIO, BytesIO
 
 from msci.bdt import create_unique_export_set_name
 
-from msci.bdt.context._CommonClient import _CommonClient
+from msci.bdt.context._CommonClient import _CommonClient, JobScheduler
+from msci.bdt.context.registry import ExportSetRegistry, freeze
 
 BOOL_STR = {True : "true", False : "false"}
 
 class ServiceClient(_CommonClient):
+    # True to reuse the export sets of the report flows (get_exposures_report, ...) through the registry, False to
+    # create and delete an export set per call
+    reuse_export_sets = False
+    # Maximum number of export sets kept by the registry and seconds after which an unused one is deleted (None: never)
+    export_set_registry_size = 64
+    export_set_registry_ttl = None
+
+    def __init__(self, url, user_id, password, client_id, logger=None, timeout=50000, **kwargs):
+        """
+        Service BDT Client constructor, see _CommonClient
+
+        """
+        _CommonClient.__init__(self, url, user_id, password, client_id, logger, timeout, **kwargs)
+        self.export_set_registry = ExportSetRegistry(self, self.export_set_registry_size,
+                                                     self.export_set_registry_ttl)
+
+    def terminate(self):
+        """
+        Delete the export sets created through the registry, close the kept-alive connections and release the router
+
+        """
+        self.export_set_registry.clear()
+        self.client.options.transport.close()
+        _CommonClient.terminate(self)
 
     def portfolioSelection(self, portfolio_list, ccy='USD'):
         """
@@ -100,6 +130,76 @@ class ServiceClient(_CommonClient):
         pae._ModelOwner = model_owner
         return pae
 
+    def registeredExportSet(self, export_set_type, *args, **kwargs):
+        """
+        Return the name of an export set with the given definition, creating it on the server the first time only.
+
+        Export sets are keyed by their type and full definition (model, model owner, portfolio list, report list,
+        ccy, format and extra attributes), reused across calls and dates, and deleted by the export_set_registry
+        when idle or when the client is terminated. They must not be deleted with deleteExportSet.
+
+        :param export_set_type: 'PortfolioAnalysis', 'PortfolioExposure', 'MPC' or 'STRESS'
+        :type export_set_type:  str
+        :param args: the arguments of createPorfolioAnalysisExportSet, createPorfolioExposureExportSet,
+         createMPCExportSet or createShocksStressTestExportSet respectively, without the name
+        :param kwargs: keyword arguments of the same method
+        :return: The name of the export set
+        :rtype: str
+        """
+        create = self._export_set_create_method(export_set_type)
+
+        # bind with the defaults, so that the same definition is found whether or not defaults were spelled out
+        definition = inspect.signature(create).bind(None, *args, **kwargs)
+        definition.apply_defaults()
+        arguments = definition.arguments
+        arguments.pop('name')
+        key = (export_set_type, freeze(arguments))
+
+        return self.export_set_registry.get(key, lambda: self._create_export_set(export_set_type, *args, **kwargs))
+
+    def exportSet(self, export_set_type, *args, **kwargs):
+        """
+        Return the name of an export set with the given definition, to be released with releaseExportSet once its jobs
+        are done. It is taken from the registry if reuse_export_sets is True (see registeredExportSet), otherwise a
+        new export set is created on the server.
+
+        See registeredExportSet for the parameters.
+        """
+        if self.reuse_export_sets:
+            return self.registeredExportSet(export_set_type, *args, **kwargs)
+        return self._create_export_set(export_set_type, *args, **kwargs)
+
+    def releaseExportSet(self, export_set_name):
+        """
+        Delete an export set returned by exportSet, unless it is kept by the registry
+
+        :param export_set_name:
+        :type export_set_name:  str
+        """
+        if self.export_set_registry.definition(export_set_name) is None:
+            self.deleteExportSet(export_set_name)
+
+    def _export_set_create_method(self, export_set_type):
+        create_methods = {'PortfolioAnalysis': self.createPorfolioAnalysisExportSet,
+                          'PortfolioExposure': self.createPorfolioExposureExportSet,
+                          'MPC': self.createMPCExportSet,
+                          'STRESS': self.createShocksStressTestExportSet}
+        if export_set_type not in create_methods:
+            raise ValueError('Invalid export set type %s, must be one of %s' % (export_set_type,
+                                                                               list(create_methods)))
+        return create_methods[export_set_type]
+
+    def _create_export_set(self, export_set_type, *args, **kwargs):
+        create = self._export_set_create_method(export_set_type)
+        if export_set_type == 'STRESS':
+            # the stress test export set needs a name
+            arguments = inspect.signature(create).bind(None, *args, **kwargs).arguments
+            name = create_unique_export_set_name(portfolio=arguments['portfolio_list'][0][0],
+                                                 model=arguments['risk_model'])
+            create(name, *args, **kwargs)
+            return name
+        return create(None, *args, **kwargs)
+
     def deleteExportSet(self, export_set_name):
         self.logger.info('Deleting Export Set:%s' % export_set_name)
         self.service.DeleteExportSet(export_set_name)
@@ -262,7 +362,13 @@ class ServiceClient(_CommonClient):
         """
 
         self.logger.info('Sending Export job: %s for Export set: %s on %s' % (job_name, exp_set_name, analysis_date))
-        return self.service.SubmitExportJob(exp_set_name, analysis_date, job_name, False)
+        job_id = self.service.SubmitExportJob(exp_set_name, analysis_date, job_name, False)
+
+        # export sets from the registry are identified by their definition, so that cached reports are found again
+        # for a new job on the same definition and date (see report_cache)
+        definition = self.export_set_registry.definition(exp_set_name)
+        self.export_jobs[job_id] = (exp_set_name if definition is None else definition, analysis_date)
+        return job_id
 
 
     def sendAndWaitExportJob(self, exp_set_name, analysis_date, job_name, fn=None):
@@ -283,6 +389,120 @@ class ServiceClient(_CommonClient):
         self.waitJob(job_id, 'Export')
         return self.downloadExportJob(job_id, fn)
 
+    def backfill(self, exp_set_name, dates, sink, export_set_type='PortfolioExposure', max_in_flight=4,
+                 parse_workers=2, job_name=None, **kwargs):
+        """
+        Run an existing export set over many analysis dates, pipelining job submission, waiting, download and parsing.
+
+        Up to max_in_flight jobs are kept running on the server. As soon as one finishes, its data is downloaded on a
+        worker thread with its own suds client, and its files parsed on a pool of parse_workers processes, while the
+        next dates are submitted and the running jobs polled from the calling thread. The parsed reports are passed to
+        sink from the calling thread, so the sink may use thread-bound resources such as a sqlite connection. A
+        failure on one date does not stop the others.
+
+        :param exp_set_name: Name of the export set, reused for every date
+        :type exp_set_name:  str
+        :param dates: analysis dates, submitted in this order
+        :type dates:  list of str 'yyyy-mm-dd' or date/datetime/Timestamp objects
+        :param sink: called as sink(analysis_date, reports) for each date, in the order the reports are parsed
+        :type sink:  callable
+        :param export_set_type: Export set type from B1 (PortfolioExposure default), see readReport
+        :type export_set_type:  str
+        :param max_in_flight: maximum number of jobs running on the server at a time, and of download threads
+        :type max_in_flight:  int
+        :param parse_workers: number of processes parsing reports, shared by all the dates. Ignored if the workers or
+         executor readReport option is given or the client has a report_executor. 0 to parse on the download threads
+        :type parse_workers:  int
+        :param job_name: job name prefix, the analysis date is appended (export set name default)
+        :type job_name:  str
+        :param kwargs: readReport options, e.g. columnar, matrix, workers or executor
+        :return: dictionary of analysis date to None if successful, or the exception raised for that date
+        :rtype: dict
+        """
+
+        if job_name is None:
+            job_name = exp_set_name
+
+        pending_dates = deque(d if isinstance(d, str) else d.strftime('%Y-%m-%d') for d in dates)
+        job_dates = {}
+        reading = []
+        results = {}
+        scheduler = JobScheduler(self)
+        # clients of the download threads, this client submitting and polling the jobs
+        idle_workers = queue.LifoQueue()
+        workers = []
+
+        def read(job_id):
+            try:
+                worker = idle_workers.get_nowait()
+            except queue.Empty:
+                worker = self._worker_client()
+                workers.append(worker)
+            try:
+                return worker._read_export_data(worker.getExportJob(job_id), export_set_type, **kwargs)
+            finally:
+                idle_workers.put(worker)
+
+        with ExitStack() as stack:
+            if parse_workers and self.report_executor is None and not (kwargs.get('workers')
+                                                                       or kwargs.get('executor')):
+                kwargs['executor'] = stack.enter_context(ProcessPoolExecutor(max_workers=parse_workers))
+                kwargs['workers'] = parse_workers
+            stack.enter_context(self._closing_workers(workers))
+            read_executor = stack.enter_context(ThreadPoolExecutor(max_workers=max_in_flight))
+
+            while pending_dates or scheduler or reading:
+
+                # keep the server busy
+                while pending_dates and len(scheduler) < max_in_flight:
+                    analysis_date = pending_dates.popleft()
+                    try:
+                        job_id = self.sendExportJob(exp_set_name, analysis_date, '%s_%s' % (job_name, analysis_date))
+                    except Exception as e:
+                        self.logger.error('Unable to submit job for %s: %s' % (analysis_date, e))
+                        results[analysis_date] = e
+                    else:
+                        job_dates[job_id] = analysis_date
+                        scheduler.add(job_id, 'Export')
+
+                # hand the parsed reports over to the sink
+                still_reading = []
+                for analysis_date, job_id, future in reading:
+                    if not future.done():
+                        still_reading.append((analysis_date, job_id, future))
+                        continue
+                    try:
+                        reports = future.result()
+                    except Exception as e:
+                        self.logger.error('Unable to read job %s for %s: %s' % (job_id, analysis_date, e))
+                        results[analysis_date] = e
+                        continue
+                    try:
+                        sink(analysis_date, reports)
+                    except Exception as e:
+                        self.logger.error('Unable to process reports for %s: %s' % (analysis_date, e))
+                        results[analysis_date] = e
+                    else:
+                        results[analysis_date] = None
+                reading = still_reading
+
+                if scheduler:
+                    # do not sleep through finished reads for too long
+                    finished = scheduler.poll(max_wait=1 if reading else None)
+                    if finished is None:
+                        continue
+
+                    job_id, error = finished
+                    analysis_date = job_dates.pop(job_id)
+                    if error is not None:
+                        results[analysis_date] = error
+                        continue
+                    reading.append((analysis_date, job_id, read_executor.submit(read, job_id)))
+                elif reading:
+                    wait([future for _, _, future in reading], return_when=FIRST_COMPLETED)
+
+        return results
+
     def createShocksStressTestExportSet(self, name, portfolio_list, scenarios, risk_model, style_format=".csv",
                                   ccy="USD", model_owner="SYSTEM", stress_testing_views_list=None):
         """
@@ -452,7 +672,7 @@ class ServiceClient(_CommonClient):
         log_response = self.service.GetImportJobLog(job_id)
         return log_response
 
-    def downloadExportJob(self, job_id, file_name=None):
+    def downloadExportJob(self, job_id, file_name=None, stream=None):
         """
         Download the Export Set Binary data into a file
 
@@ -460,13 +680,25 @@ class ServiceClient(_CommonClient):
         :type job_id:  str
         :param file_name: Output path to save export file. If not given, file is not saved and byte_array is returned
         :type file_name:  str
+        :param stream: If True, decode the data straight into the file as it is received instead of holding it in
+         memory. Defaults to the stream_downloads attribute of the client
+        :type stream:  boolean
         :return:
         """
 
         self.logger.info('Downloading results into: %s ' % file_name)
-        byte_array = self.getExportJob(job_id)
+        if stream is None:
+            stream = self.stream_downloads
+
         if file_name is None:
-            return byte_array
+            return self.getExportJob(job_id, stream)
+
+        if stream:
+            with open(file_name, 'wb') as f:
+                self.streamExportJob(job_id, f)
+            return 0
+
+        byte_array = self.getExportJob(job_id)
 
         try:
             with open(file_name, 'wb') as f:
@@ -481,19 +713,61 @@ class ServiceClient(_CommonClient):
     def getShocksStressReport(self, job_id, wait_for_completion=True):
         return self._get_report('STRESS',  job_id, wait_for_completion)
 
-    def getMPCReport(self, job_id, *, wait_for_completion=True):
-        return  self._get_report('MPC', job_id, wait_for_completion)
+    def getMPCReport(self, job_id, *, wait_for_completion=True, columnar=False):
+        return  self._get_report('MPC', job_id, wait_for_completion, columnar=columnar)
+
+    def getMPCMatrix(self, job_id, *, wait_for_completion=True, packed=False):
+        """
+        Retrieve the MPC correlation/covariance reports of an export job as NumPy matrices
+
+        :param job_id:
+        :type job_id:  str
+        :param wait_for_completion: If True (default), wait for the job to complete first
+        :type wait_for_completion: boolean
+        :param packed: If True, return the matrices in packed upper-triangular storage
+        :type packed: boolean
+        :return: reports, see _CommonClient.readMPCMatrix
+        """
+        self.logger.info('Parsing MPC matrix for job id : %s ' % job_id)
+        if wait_for_completion:
+            self.waitJob(job_id, 'Export')
+        byte_array = self.getExportJob(job_id)
+        try:
+            return self.readMPCMatrix(byte_array, packed=packed)
+        finally:
+            if hasattr(byte_array, 'close'):
+                byte_array.close()
 
     def getPortfolioAnalysisReport(self, job_id, *, wait_for_completion=True):
         warn("The 'getPortfolioAnalysisReport' method has been renamed to 'getPortfolioAnalysisReportS'."+\
              "The singular version will be removed in a future release.", DeprecationWarning, 2)
         return self.getPortfolioAnalysisReports(job_id, wait_for_completion=wait_for_completion)
 
-    def getPortfolioAnalysisReports(self, job_id, *, wait_for_completion=True):
-        return self._get_report('PortfolioAnalysis', job_id, wait_for_completion)
+    def getPortfolioAnalysisReports(self, job_id, *, wait_for_completion=True, columnar=False, workers=None):
+        return self._get_report('PortfolioAnalysis', job_id, wait_for_completion, columnar=columnar, workers=workers)
+
+    def getPortfolioExposureReports(self, job_id, *, wait_for_completion=True, include_spec_risk=False, columnar=False,
+                                    matrix=None, workers=None):
+        """
+        Retrieve and parse the reports of a PortfolioExposure export job
 
-    def getPortfolioExposureReports(self, job_id, *, wait_for_completion=True, include_spec_risk=False):
-        return self._get_report('PortfolioExposure', job_id, wait_for_completion, include_spec_risk=include_spec_risk)
+        :param job_id:
+        :type job_id:  str
+        :param wait_for_completion: If True (default), wait for the job to complete first
+        :type wait_for_completion: boolean
+        :param include_spec_risk: If True, include Specific Risk as its own 'Factor' in the narrow format
+        :type include_spec_risk: boolean
+        :param columnar: If True, return the columns as NumPy arrays
+        :type columnar: boolean
+        :param matrix: 'csr', 'coo' or 'dense' to return each report Detail as an asset x factor exposure matrix with
+         'Asset ID', 'Asset ID Type' (row index), 'Factor' (column index), 'Exposure' and 'Specific Risk' keys
+        :type matrix: str
+        :param workers: If set, parse the report files on a pool of this many processes
+        :type workers: int
+        :return: reports
+        """
+        return self._get_report('PortfolioExposure', job_id, wait_for_completion, include_spec_risk=include_spec_risk,
+                                columnar=columnar, matrix=matrix, workers=workers)
 
     def getPortfolioExposureReport(self, job_id, *, wait_for_completion=True, include_spec_risk=False):
         warn("The 'getPortfolioExposureReport' method has been renamed to 'getPortfolioExposureReports'" + \
@@ -1,22 +1,35 @@
+import os
+import copy
+import mmap
+import queue
 import time
 import zipfile
 import csv
 import base64
-from collections import defaultdict
-from suds.client import Client
+import heapq
+import tempfile
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from suds import tostr
+from suds.client import _SoapClient
+from suds.transport import TransportError
 
 try:
     # for Python 2.x
-    from StringIO import StringIO
     from BytesIO import BytesIO
 except ImportError:
     # for Python 3.x
-    from io import StringIO
     from io import BytesIO
+from io import TextIOWrapper, UnsupportedOperation
 
-from msci.bdt.context.BDTClient import BDTClient, LogPlugin
-from msci.bdt.context.exceptions import BDTError
+from msci.bdt.context.BDTClient import BDTClient, LogPlugin, clone_suds_client
+from msci.bdt.context.download import stream_binary_data
+from msci.bdt.context.import_builder import build_import_envelope
+from msci.bdt.context.import_log import DETAIL_ELEMENT, GROUP_ELEMENT, read_import_log
+from msci.bdt.context.routing import EndpointRouter
 from msci.bdt.context.transport import HttpAuthenticated
+from msci.bdt.context.exceptions import BDTError
 
 
 def parse_field(field_value):
@@ -35,15 +48,519 @@ def parse_field(field_value):
 
     return field_value
 
+
+def chunk_portfolios(port_list, max_positions):
+    """
+    Split portfolio dictionaries in order into lists of whole portfolios with at most max_positions positions in
+    total, a larger portfolio making a list on its own
+    """
+    chunks = []
+    chunk = []
+    chunk_positions = 0
+    for this_port in port_list:
+        num_positions = len(this_port['Positions']['id'])
+        if chunk and chunk_positions + num_positions > max_positions:
+            chunks.append(chunk)
+            chunk = []
+            chunk_positions = 0
+        chunk.append(this_port)
+        chunk_positions += num_positions
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def merge_columns(tables):
+    """
+    Concatenate dictionaries of lists, padding with None the keys missing from some of them
+    """
+    merged = defaultdict(list)
+    num_rows = 0
+    for table in tables:
+        table_rows = max((len(values) for values in table.values()), default=0)
+        for key in table:
+            if key not in merged:
+                merged[key] = [None] * num_rows
+        for key, values in merged.items():
+            values.extend(table.get(key, [None] * table_rows))
+        num_rows += table_rows
+    return merged
+
+
+def is_status_file(filename):
+    """
+    Return True if the export set file is the jobstatus file, False for report files
+    """
+    return 'jobstatus' in filename
+
+
+def rename_duplicate_columns(columns):
+    """
+    Rename duplicated column names by appending '-1', '-2', ... to the second, third, ... occurrence
+
+    :param columns: column names
+    :type columns:  list[str]
+    :return: column names without duplicates, in the same order
+    :rtype: list[str]
+    """
+    if len(columns) == len(set(columns)):
+        return columns
+
+    # use max_duplicate_num dictionary to track any duplicate columns
+    # will contain a duplicate count for any columns that are duplicate
+    # contains an int that we append to the column name and then increment afterwards
+    max_duplicate_num = defaultdict(int)
+    new_cols = []
+    seen_cols = set()
+    for this_col in columns:
+        if this_col not in seen_cols:
+            new_col = this_col
+        else:
+            # we increment before creating modified_col so that
+            # first duplicate with end with '-1'
+            duplicate_num = max_duplicate_num[this_col]+1
+            new_col = this_col + '-' + str(duplicate_num)
+            max_duplicate_num[this_col] = duplicate_num
+        new_cols.append(new_col)
+        seen_cols.add(new_col)
+    return new_cols
+
+
+def read_report_file(f, filename, export_set_type, delimiter, include_specific_risk=False, columnar=False,
+                     text_dtype=object, matrix=None):
+    """
+    Parse a single report file of an export set into a python dictionary
+
+    :param f: text stream over the report file
+    :type f:  file-like object
+    :param filename: name of the report file inside the export set archive
+    :type filename:  str
+    :param export_set_type: Export set type from B1, see _CommonClient.readReport
+    :type export_set_type:  str
+    :param delimiter: column delimiter of the report file (the jobstatus file is always comma-delimited)
+    :type delimiter:  str
+    :param include_specific_risk: If True, include Specific Risk in PortfolioExposure Report. Default = False
+    :type include_specific_risk: boolean
+    :param columnar: If True, return Summary and Detail columns as NumPy arrays. Default = False
+    :type columnar: boolean
+    :param text_dtype: dtype of the text columns in columnar mode, object (default) or str
+    :type text_dtype: type
+    :param matrix: If set, return the PortfolioExposure Detail as an asset x factor matrix with this layout:
+     'csr', 'coo' or 'dense'. Implies columnar. Default = None
+    :type matrix: str
+    :return: report as a {'Header', 'Summary', 'Detail', 'Filename'} dictionary
+    """
+    is_status = is_status_file(filename)
+    if matrix is not None and export_set_type == 'PortfolioExposure' and not is_status:
+        columnar = True
+    header = {}
+    positions = {}
+    num_header_columns = 0
+    columns = None
+    summary = None
+
+    status_header_section = 0
+    # Here is a sample of the jobstatus file:
+    # note that this file is always CSV (with commas) even if the output file
+    # is pipe delimited - i.e. for the PortfolioExposure report type.
+
+    # See a sample below. Each line in the sample corresponds to a new line in the file:
+
+    # <start sample>
+    # Risk Model, Version, Covariance Matrix Date
+    # MAC.L, 400.00, 2020 / 06 / 26
+    # Name, Owner, Valid
+    # AllAssetCorrelations, System, true
+    # AllocationSelection - GICS, python, true
+    # Cashflow - Custom, python, true
+    # Risk - Decomp, python, true
+    #
+    # Portfolio, Analysis Date, Owner, Processed, Holdings Date, Bmk, Bmk Holdings Date, Market Value,
+    #   <cont on same line> Currency, Accept %, Directory, Full Tree Path, Stored Analytics Status,
+    # BA204, 2020/06/30, SYSTEM, Yes, 2020/06/30, CASH,, 1325289383537.18, USD, 97.97, BA204/, SYSTEM/BA204,
+    # SAP500D, 2020/06/30, SYSTEM, Yes, 2020/06/30, CASH,, 25636608236818.79, USD, 100.00, SAP500D/, SYSTEM/SAP500D,
+    # <end sample>
+
+    # There are three sections to  reading this file:
+
+    # 1:This first row of headers only has one corresponding row of values. This is always true
+    # regardless of how many portfolios or reports are in the export set
+
+    # 'Risk Model' = 'MAC.L', Version = 400.00, and Covariance Matrix Date = '2020/06/26',
+
+    # 2: The second section has one row per report definition specified in the job
+    # 'Name' = 'AllAssetCorrelations, 'Owner' = 'System, 'Valid' = true
+    # 'Name' = 'AllocationSelection - GICS, 'Owner' = 'python, 'Valid' = true
+    # 'Name' = 'Cashflow - Custom, 'Owner' = 'python, 'Valid' = true
+    # 'Name' = 'Risk - Decomp, 'Owner' = 'python, 'Valid' = true
+
+    # 3: The third section has one row per portfolio specified in the job:
+    # e.g. 'Portfolio' = 'BA204', 'Holdings Date' = '2020/06/30', and 'Full Tree Path' = 'SYSTEM/BA204' for the first row
+    # e.g. 'Portfolio' = 'SAP500D', 'Bmk' = 'CASH', and 'Market Value' = 25636608236818.79 for the second row
+
+    # the file is parsed like a standard report, with Header, Summary and Detail being returned.
+    # The first two sections are combined into the 'Header' dictionary, and the third section is returned
+    # in the 'Details' dictionary. 'Summary' is set to None
+
+    # I use 'status_header_section' to track which section I am on I read each line in the file
+
+    if is_status:
+        temp_delimiter = ','
+    else:
+        temp_delimiter = delimiter
+
+    for this_line in csv.reader(f, delimiter=temp_delimiter):
+
+        if not this_line:
+            continue  # skip over empty rows
+
+        if not num_header_columns:
+            num_header_columns = len(this_line)
+        header_row = this_line
+
+        if len(header_row) <= num_header_columns:
+            # still reading headers
+
+            if is_status:
+                # we are reading headers from the status file
+                # headers and values are row based
+                # so when we read the column headers
+                # the next line in the file will contain the corresponding values
+                # we look for either 'Risk Model' or 'Name' in the first column of the current line
+
+                # if first column = 'Risk Model', just the next row should be read as values
+                # if first column = 'Name', all following rows should be read as values
+
+                if status_header_section > 0:
+                    if status_header_section == 1:
+                        status_header_section = 0
+                        header['Risk Model'] = header_row[0]
+                        header['Version'] = header_row[1]
+                        header['Covariance Matrix Date'] = header_row[2]
+                    elif status_header_section == 2:
+
+                        if summary is None:
+                            summary = {'Name': [], 'Owner': [], 'Valid': []}
+
+                        summary['Name'].append(header_row[0])
+                        summary['Owner'].append(header_row[1])
+                        summary['Valid'].append(header_row[2])
+
+                else:
+                    if header_row[0] == 'Risk Model':
+                        status_header_section = 1
+
+                    if header_row[0] == 'Name':
+                        status_header_section = 2
+
+            elif num_header_columns == 2:
+                if len(header_row) > 1:
+                    header_values = header_row[1].strip()
+                else:
+                    header_values = header_row[-1]
+
+                header[header_row[0].replace(':', '')] = header_values
+
+        else:
+            # number of columns has changed
+            # the first time this happens we are looking at the column row
+            # subsequent rows will be the summary row (if it is present)
+            # and then the detail rows
+            if columns is None:
+
+                # get the list of columns from current line
+                columns = [x.strip() for x in this_line]
+
+                has_summary = False # assume no summary unless explicitly specified
+
+                # for the Correlations report, there may be duplicated columns if the portfolio
+                # contains positions with the same name (e.g. Class A and B shares)
+                # If we find  duplicates we rename the columns to address the problem
+                columns = rename_duplicate_columns(columns)
+
+                # if report includes summary row, it is the first row after the headers
+                # we remove this row and return as a separate output,
+                # with the same columns as the details
+
+                # Positions Reports are required to have the Asset ID and Holdings columns in them
+                # So we can use this to test columns of a report to determine
+                # if it's a Positions Report
+                # Positions Report have a summary report which must be separated out
+
+                if export_set_type == 'PortfolioAnalysis':
+                    if {'Asset ID', 'Holdings'}.issubset(set(columns)):
+                        # Positions report - contains both 'Asset ID' and 'Holdings' columns
+                        has_summary = True
+                    elif {'Asset ID', 'Asset ID Type'}.issubset(set(columns)):
+                        # Cashflow report - contains Asset ID and ID Type, but not 'Holdings
+                        has_summary = True
+                    elif {'Risk Source'}.issubset(set(columns)):
+                        # this must be a Risk Decomposition or a Risk Delta Report
+                        has_summary = True
+                    elif is_status:
+                        has_summary = True
+                elif export_set_type == 'HVR':
+                    has_summary = True
+
+                # now go on to the next line in the file
+                # will be either summary or details depending on value of has_summary
+                for this_column in columns:
+                    positions[this_column] = []
+                continue
+
+            if has_summary and summary is None:
+
+                summary = {}
+                summary_row_fields = [x.strip() for x in this_line]
+
+                for col_name, summary_field in zip(columns, summary_row_fields):
+                    # if we can cast this to a float we will do so, otherwise leave as is
+                    # and strip '%' signs as well
+                    if columnar:
+                        # converted together with the detail columns below
+                        summary[col_name] = [summary_field]
+                    else:
+                        summary[col_name] = [parse_field(summary_field)]
+                # now go on to the next line in the file - detail rows
+                # ensure that we don't read the next line as a sumamry
+                has_summary = False
+                continue
+
+            detail_row_fields = [x.strip() for x in this_line]
+
+            for col_name, detail_field in zip(columns, detail_row_fields):
+                # if we can cast this to a float we will do so, otherwise leave as is
+                # and strip '%' signs as well
+                positions[col_name].append(detail_field)
+
+    # next we consider entire columns to determine whether to cast to float or not
+    # this has to be done at a column level since there may be castable values in columns
+    # that contain text information (e.g. a Barra ID or CUSIP that is entirely numeric)
+    # and those values should remain as text
+
+    if columnar:
+        # a single vectorized pass per column, see msci.bdt.context.columnar
+        from msci.bdt.context import columnar as columnar_engine
+
+        positions = columnar_engine.parse_columns(positions, text_dtype)
+        if summary is not None:
+            summary = columnar_engine.parse_columns(summary, text_dtype)
+    else:
+        for col_name, col_values in positions.items():
+            parsed_values = list(map(parse_field, col_values))
+            # if the column only contains floats or None or empty string (''), convert to float
+            # (parse_field will leave non-numeric text as is)
+            if not any(isinstance(x, str) for x in parsed_values):
+                positions[col_name] = parsed_values
+
+    # reformat the 'wide' output for the exposure report to a 4 column narrow format
+    # does not need to be done for the specific covariance report though
+    # Specific Covariance does not have 'Asset ID' in keys, only 'Asset ID 1' and 'Asset ID 2'
+    if export_set_type == 'PortfolioExposure' and 'Asset ID' in positions.keys() and matrix is not None:
+        positions = columnar_engine.exposure_matrix(positions, matrix)
+
+    elif export_set_type == 'PortfolioExposure' and 'Asset ID' in positions.keys() and columnar:
+        positions = columnar_engine.exposure_long_format(positions, include_specific_risk)
+
+    elif export_set_type == 'PortfolioExposure' and 'Asset ID' in positions.keys():
+        asset_id_lst = positions['Asset ID']
+        asset_id_type_lst = positions['Asset ID Type']
+        spec_risk_lst = positions['Specific Risk']
+
+        # note that our output dictionary will have multiple rows for each asset
+        asset_asset_lst = []
+        asset_asset_type_lst = []
+        asset_factor_lst = []
+        asset_exposure_lst = []
+
+        for this_factor in [i for i in positions.keys() if i not in
+                                                           ['Asset ID', 'Asset ID Type',
+                                                            'Specific Risk']]:
+
+            for (this_asset_id, this_assset_id_type, this_exposure) in zip(asset_id_lst,
+                                                                           asset_id_type_lst,
+                                                                           positions[this_factor]):
+                if this_exposure is not None:
+                    asset_asset_lst.append(this_asset_id)
+                    asset_asset_type_lst.append(this_assset_id_type)
+                    asset_factor_lst.append(this_factor)
+                    asset_exposure_lst.append(this_exposure)
+
+        # if requested, append the specific risk numbers as well as their own 'factor'
+        if include_specific_risk:
+            asset_asset_lst = asset_asset_lst + asset_id_lst
+            asset_asset_type_lst = asset_asset_type_lst + asset_id_type_lst
+            asset_factor_lst = asset_factor_lst + ['Specific Risk' for i in asset_id_lst]
+            asset_exposure_lst = asset_exposure_lst + [float(spec_risk) for spec_risk in
+                                                       spec_risk_lst]
+
+        # replace positions dictionary with condensed one for Portfolio Exposures
+        positions = {'Asset ID': asset_asset_lst,
+                     'Asset ID Type': asset_asset_type_lst,
+                     'Factor': asset_factor_lst,
+                     'Exposure': asset_exposure_lst}
+
+
+    if is_status:
+        # remove the column with empty column if it exists, in the jobstatus detail dictionary
+        positions.pop('', None)
+
+    return {'Header': header, 'Summary': summary, 'Detail': positions, 'Filename': filename}
+
+
+class _MappedFile(mmap.mmap):
+    """
+    Read-only memory map usable as a zipfile file object (mmap only gained seekable() in Python 3.13)
+    """
+
+    def seekable(self):
+        return True
+
+
+@contextmanager
+def open_export_set(source):
+    """
+    Open the ExportSet Binary data as a zip archive.
+
+    :param source: the export set as bytes, or as a path or binary file object, which are read through a memory map
+    :type source:  bytes, str or file-like object
+    :return: context manager returning a zipfile.ZipFile
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        with zipfile.ZipFile(BytesIO(source), "r") as myzip:
+            yield myzip
+        return
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            with open_export_set(f) as myzip:
+                yield myzip
+        return
+
+    try:
+        mapped = _MappedFile(source.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, UnsupportedOperation):
+        # not backed by a real file, read it as is
+        mapped = None
+
+    if mapped is None:
+        with zipfile.ZipFile(source, "r") as myzip:
+            yield myzip
+    else:
+        with mapped, zipfile.ZipFile(mapped, "r") as myzip:
+            yield myzip
+
+
+def read_report_bytes(file_bytes, filename, *args):
+    """
+    Parse a single report file given as bytes, see read_report_file for the arguments.
+    Module level so that it can be sent to a process pool.
+    """
+    return read_report_file(TextIOWrapper(BytesIO(file_bytes), encoding='utf-8', newline=''), filename, *args)
+
+
+class JobScheduler(object):
+    """
+    Polls the status of many server jobs in a single loop, see _CommonClient.as_completed.
+
+    Jobs are kept in a heap ordered by their next poll time. A running job is polled again after poll_factor times
+    the expected time to finish reported by the server.
+    """
+
+    def __init__(self, client):
+        """
+        :param client: the client used to check the job status
+        :type client:  msci.bdt.context._CommonClient._CommonClient
+        """
+        self.client = client
+        self.schedule = []
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.schedule)
+
+    def add(self, job_id, job_type):
+        """
+        Start tracking a job, its status is checked at the next poll
+        """
+        self.seq += 1
+        heapq.heappush(self.schedule, (time.monotonic(), self.seq, job_id, job_type))
+
+    def next_poll_delay(self):
+        """
+        Seconds until the next job is due to be polled (0 if overdue, None if there are no jobs)
+        """
+        if not self.schedule:
+            return None
+        return max(0.0, self.schedule[0][0] - time.monotonic())
+
+    def poll(self, max_wait=None):
+        """
+        Sleep until the next job is due and check its status. If the next job is due in more than max_wait seconds,
+        only sleep for max_wait seconds and return None.
+
+        :param max_wait: maximum number of seconds to sleep
+        :type max_wait:  float
+        :return: (job id, None if successful or BDTError) if the job has finished, None if it is still running
+        """
+        delay = self.next_poll_delay()
+        if max_wait is not None and delay > max_wait:
+            time.sleep(max_wait)
+            return None
+        if delay > 0:
+            time.sleep(delay)
+
+        poll_time, seq, job_id, job_type = heapq.heappop(self.schedule)
+        try:
+            status = self.client.getJobStatus(job_id, job_type)
+        except Exception as e:
+            msg = 'Job id %s status check failed: %s' % (job_id, e)
+            self.client.logger.error(msg)
+            return job_id, BDTError(msg, job_id)
+
+        if status > 0:
+            self.client.logger.debug('Expected time to finish job %s: %i' % (job_id, status))
+            next_poll = time.monotonic() + status * self.client.poll_factor
+            heapq.heappush(self.schedule, (next_poll, seq, job_id, job_type))
+            return None
+
+        if status:
+            msg = 'Job id %s failed:%i' % (job_id, status)
+            self.client.logger.error(msg)
+            # a failed job is never downloaded
+            self.client._forget_export_job(job_id)
+            return job_id, BDTError(msg, job_id, status)
+
+        return job_id, None
+
+
 class _CommonClient(BDTClient):
     wsdl = '/axis2/services/BDTService?wsdl'
+    # Optional concurrent.futures executor shared by all readReport calls to parse export set files in parallel
+    report_executor = None
+    # Fraction of the expected time to finish a job, as reported by the server, to wait before polling it again
+    poll_factor = 0.2
+    # Optional msci.bdt.context.cache.ReportCache, to cache parsed reports across runs
+    report_cache = None
+    # readReport options which do not change the parsed reports
+    UNCACHED_READ_OPTIONS = ['workers', 'executor']
+    # If True, export job data is streamed to a temporary file instead of being held in memory, see getExportJob
+    stream_downloads = False
+    # If True and a list of urls is given, each call is sent to the fastest healthy url instead of the first one
+    # reached, see msci.bdt.context.routing. If hedge_requests is also True, slow idempotent calls are sent again to
+    # the next url.
+    route_endpoints = False
+    hedge_requests = False
+    # EndpointRouter of this client, if routing, shared with the clients of the same urls, see EndpointRouter.shared
+    router = None
 
     def __init__(self, url, user_id, password, client_id, logger=None, timeout=50000, **kwargs):
 
         """
         Service BDT Client constructor with service overriding to handle credentials nicely
 
-        :param url: web service url, example https://www.barraone.com, or a list of urls to try in order
+        :param url: web service url, example https://www.barraone.com, or a list of urls to try in order, or to
+         route the calls across if route_endpoints is True
         :type url:  str or list[str]
         :param user_id:
         :type user_id:  str
@@ -58,16 +575,44 @@ class _CommonClient(BDTClient):
         """
 
         BDTClient.__init__(self, url, user_id, password, client_id, logger, timeout, **kwargs)
+        if self.route_endpoints and isinstance(url, list) and len(url) > 1:
+            self.router = EndpointRouter.shared(url, self.hedge_requests, self.logger)
+            self.client.options.transport.router = self.router
         # Override service with helper
         self.service = _Service(self)
+        # job id -> (export set definition, analysis date) of the export jobs submitted by this client
+        self.export_jobs = {}
+        # see _import_log_xsd_types
+        self._import_log_types = None
 
     def _get_client(self, **kwargs):
         """
         Return the python suds client
 
         """
-        return Client(self.url, location=self.url, timeout=self.timeout, plugins=[LogPlugin(self.logger, False)],
-                      transport=HttpAuthenticated(), **kwargs)
+        return self._new_suds_client([LogPlugin(self.logger, False)], **kwargs)
+
+    def terminate(self):
+        """
+        Release the router of this client, if routing
+
+        """
+        if self.router is not None:
+            self.router.release()
+            self.router = None
+
+    def _worker_client(self):
+        """
+        Return a copy of this client with its own suds client and transport, for a worker thread, as suds clients
+        cannot be shared between threads. Its transport is to be closed once done, the router being shared.
+        """
+        worker = copy.copy(self)
+        transport = HttpAuthenticated()
+        transport.router = self.router
+        worker.client = clone_suds_client(self.client, transport=transport)
+        worker.factory = worker.client.factory
+        worker.service = _Service(worker)
+        return worker
 
     def getJobStatus(self, job_id, job_type):
         """
@@ -101,15 +646,55 @@ class _CommonClient(BDTClient):
             self.logger.debug('Expected time to finish job: %i' % status)
             status = self.getJobStatus(job_id, job_type)
             if status > 0:
-                time.sleep(status * 0.2)
+                time.sleep(status * self.poll_factor)
             else:
                 break
 
         if status:
             msg = 'Job id %s failed:%i' % (job_id, status)
             self.logger.error(msg)
+            # a failed job is never downloaded
+            self._forget_export_job(job_id)
             raise BDTError(msg, job_id, status)
 
+    def as_completed(self, job_ids, job_type='Export'):
+        """
+        Wait for many jobs to be completed on the server, yielding them in the order they finish.
+
+        All jobs are tracked in a single polling loop. Each job is polled again after a fraction of its reported
+        expected time to finish, so the total wait follows the slowest job rather than the sum of the jobs.
+        A failed job does not stop the others: it is yielded with a BDTError.
+
+        :param job_ids: job ids, or (job id, job type) tuples to mix Import and Export jobs
+        :type job_ids:  list
+        :param job_type: 'Import', 'Export', ... for the job ids given without a type
+        :type job_type:  str
+        :return: generator of (job id, None if successful or BDTError) tuples
+        """
+
+        scheduler = JobScheduler(self)
+        for job in job_ids:
+            this_id, this_type = job if isinstance(job, tuple) else (job, job_type)
+            scheduler.add(this_id, this_type)
+
+        while scheduler:
+            finished = scheduler.poll()
+            if finished is not None:
+                yield finished
+
+    def waitJobs(self, job_ids, job_type='Export'):
+        """
+        Synchronously wait for many jobs to be completed on the server, see as_completed
+
+        :param job_ids: job ids, or (job id, job type) tuples to mix Import and Export jobs
+        :type job_ids:  list
+        :param job_type: 'Import', 'Export', ... for the job ids given without a type
+        :type job_type:  str
+        :return: dictionary of job id to None if successful or BDTError, in the order the jobs finished
+        :rtype: dict
+        """
+        return dict(self.as_completed(job_ids, job_type))
+
     def removeUnderscores(self, input_list_of_tuples):
         output_dict = {}
         for old_key, value in input_list_of_tuples:
@@ -119,17 +704,63 @@ class _CommonClient(BDTClient):
 
         return output_dict
 
-    def getImportJobLog(self, import_job_id):
+    def getImportJobLog(self, import_job_id, columnar=False, summary_only=False):
+        """
+        Wait for an import job to complete and return its log
+
+        :param import_job_id:
+        :type import_job_id:  str
+        :param columnar: parse the log straight from the SOAP reply into NumPy arrays (numbers and booleans converted
+         according to the schema, interned strings otherwise), see msci.bdt.context.import_log. Much faster for logs
+         with many details
+        :type columnar:  boolean
+        :param summary_only: parse the log like columnar, but only count the details per ResultCode instead of
+         returning them
+        :type summary_only:  boolean
+        :return: import_log, import_detail dictionaries of lists (of arrays if columnar), or import_log and a Counter
+         of the details per ResultCode if summary_only
+        """
 
         # wait till import is completed
         self.waitJob(import_job_id,'Import')
 
+        if columnar or summary_only:
+            with self._open_service_stream('GetImportJobLog', import_job_id) as reply:
+                return read_import_log(reply, self._import_log_xsd_types(), summary_only=summary_only)
+
         job_log = self.service.GetImportJobLog(import_job_id)
+        return self._read_import_job_log(job_log)
 
+    def _import_log_xsd_types(self):
+        """
+        Return the resolved XSD types of the ImportLogGroup and ImportLogDetail attributes, for read_import_log
+        """
+        if self._import_log_types is None:
+            method = self.client.service.GetImportJobLog.method
+            try:
+                response = self.client.wsdl.schema.elements[method.soap.output.body.parts[0].element].resolve()
+                group = response.get_child('LogGroups')[0].resolve().get_child(GROUP_ELEMENT)[0].resolve()
+                detail = group.get_child('Details')[0].resolve().get_child(DETAIL_ELEMENT)[0].resolve()
+            except Exception as e:
+                # parse all the columns as strings
+                self.logger.warning('Unable to find the import log types in the WSDL: %s' % e)
+                self._import_log_types = {}
+            else:
+                self._import_log_types = {
+                    GROUP_ELEMENT: {attribute.name: attribute.resolve() for attribute, _ in group.attributes()},
+                    DETAIL_ELEMENT: {attribute.name: attribute.resolve() for attribute, _ in detail.attributes()},
+                }
+        return self._import_log_types
+
+    def _read_import_job_log(self, job_log, first_job=1):
+        """
+        Return the import_log and import_detail dictionaries of lists of an import job log, numbering its log groups
+        in the 'Job' column from first_job
+        """
         import_log = defaultdict(list)
         import_detail = defaultdict(list)
 
-        for job_num, item in enumerate(job_log.LogGroups.ImportLogGroup, start=1):
+        for job_num, item in enumerate(job_log.LogGroups.ImportLogGroup, start=first_job):
             temp_dict = self.removeUnderscores(item)
             import_log['Job'].append(job_num)
             for this_key, this_value in temp_dict.items():
@@ -154,305 +785,152 @@ class _CommonClient(BDTClient):
 
         return import_log, import_detail
 
-    def readReport(self, byte_array, export_set_type, **kwargs):
+    def _report_delimiter(self, export_set_type):
         """
-        Parse the ExportSet Binary data to extract the report data into python dictionary
+        Return the column delimiter used by report files of the given export set type
+        """
+        if export_set_type == 'PortfolioExposure':
+            return '|'
+
+        if export_set_type not in ['PortfolioAnalysis', 'MPC', 'HVR', 'STRESS']:
+            # Unrecognized report type. Warn user, but default to comma-delimited
+            self.logger.warning('Unrecognized export set type ' + str(export_set_type))
+            self.logger.warning('Defaulting to comma-delimited output')
+
+        return ','
+
+    def iter_reports(self, byte_array, export_set_type, **kwargs):
+        """
+        Parse the ExportSet Binary data one report file at a time.
+
+        Each file of the export set is decoded incrementally and yielded as soon as it has been parsed, so that only
+        one report is held in memory at a time. The jobstatus file is yielded like any other report and can be
+        recognised with is_status_file(report['Filename']).
 
         :param byte_array:
         :type byte_array:  binary
+        :param export_set_type: Export set type from B1. See readReport
+        :type export_set_type:  str
+        :return: generator of {'Header', 'Summary', 'Detail', 'Filename'} dictionaries
+
+        ``**kwargs``: See readReport
+        """
+
+        delimiter = self._report_delimiter(export_set_type)
+        include_specific_risk = False
+        matrix = None
+        if export_set_type == 'PortfolioExposure':
+            include_specific_risk = kwargs.get('include_spec_risk', False)
+            matrix = kwargs.get('matrix')
+        columnar = kwargs.get('columnar', False)
+        text_dtype = kwargs.get('text_dtype', object)
+        parse_args = (export_set_type, delimiter, include_specific_risk, columnar, text_dtype, matrix)
+
+        workers = kwargs.get('workers')
+        executor = kwargs.get('executor') or self.report_executor
+        if executor is None and workers:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                yield from self._iter_reports_parallel(byte_array, executor, workers, parse_args)
+        elif executor is not None:
+            yield from self._iter_reports_parallel(byte_array, executor, workers or os.cpu_count(), parse_args)
+        else:
+            for filename, f in self._iter_report_files(byte_array):
+                yield read_report_file(f, filename, *parse_args)
+
+    def _iter_reports_parallel(self, byte_array, executor, workers, parse_args):
+        """
+        Fan the files of the ExportSet Binary data out to the executor and yield the reports in their original order.
+        At most 2 * workers files are in flight, to keep memory bounded.
+        """
+        pending = deque()
+        with open_export_set(byte_array) as myzip:
+            for zipf in myzip.infolist():
+                self.logger.info('Reading report from %s' % zipf.filename)
+                pending.append(executor.submit(read_report_bytes, myzip.read(zipf.filename), zipf.filename,
+                                               *parse_args))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+    def _iter_report_files(self, byte_array):
+        """
+        Yield (filename, text stream) for each file of the ExportSet Binary data, decoding it incrementally
+        """
+        with open_export_set(byte_array) as myzip:
+            for zipf in myzip.infolist():
+                self.logger.info('Reading report from %s' % zipf.filename)
+                with myzip.open(zipf.filename) as myfile:
+                    yield zipf.filename, TextIOWrapper(myfile, encoding='utf-8', newline='')
+
+    def readReport(self, byte_array, export_set_type, stream=False, **kwargs):
+        """
+        Parse the ExportSet Binary data to extract the report data into python dictionary
+
+        :param byte_array: export set as bytes, or as a path or binary file object read through a memory map
+        :type byte_array:  binary, str or file-like object
         :param export_set_type: Export set type from B1. Currently only 'PortfolioAnalysis', 'MPC', 'PortfolioExposure' are supported
         :type report_type:  str
+        :param stream: If True, return a generator of reports instead (see iter_reports). Default = False
+        :type stream: boolean
         :return: reports
 
         ``**kwargs``: See below
 
         :param include_spec_risk: If True, include Specific Risk in PortfolioExposure Report. Default = False
         :type include_spec_risk: boolean
+        :param columnar: If True, return numeric columns as float64 NumPy arrays (NaN for missing values) and text
+         columns as text_dtype arrays. Requires numpy. Default = False
+        :type columnar: boolean
+        :param text_dtype: dtype of the text columns in columnar mode, object (default) or str for fixed-width arrays
+        :type text_dtype: type
+        :param matrix: If set, return each PortfolioExposure Detail as an asset x factor exposure matrix instead of the
+         4 column narrow format: 'csr' or 'coo' for SciPy sparse matrices, 'dense' for a float32 NumPy matrix.
+         See msci.bdt.context.columnar.exposure_matrix. Default = None
+        :type matrix: str
+        :param workers: If set, parse the export set files on a pool of this many processes. Reports are returned in
+         their original order. Default = None (parse in the calling thread)
+        :type workers: int
+        :param executor: concurrent.futures executor to parse the export set files with, instead of a new process
+         pool. Defaults to the report_executor attribute of the client
+        :type executor: concurrent.futures.Executor
         """
 
-        include_specific_risk = False
+        if stream:
+            return self.iter_reports(byte_array, export_set_type, **kwargs)
 
-        if export_set_type == 'PortfolioExposure':
-            delimiter = '|'
-            include_specific_risk = kwargs.get('include_spec_risk', False)
+        reports = {'Reports': []}
+        for report in self.iter_reports(byte_array, export_set_type, **kwargs):
+            if is_status_file(report['Filename']):
+                reports['Status'] = report
+            else:
+                reports['Reports'].append(report)
 
-        elif export_set_type in ['PortfolioAnalysis', 'MPC', 'HVR', 'STRESS']:
-            delimiter = ','
-        else:
-            # Unrecognized report type. Warn user, but default to comma-delimited
-            self.logger.warning('Unrecognized export set type ' + str(export_set_type))
-            self.logger.warning('Defaulting to comma-delimited output')
-            delimiter = ','
+        return reports
 
-        reports = {'Reports': []}
+    def readMPCMatrix(self, byte_array, packed=False):
+        """
+        Parse the MPC ExportSet Binary data straight into correlation/covariance matrices.
 
-        with zipfile.ZipFile(BytesIO(byte_array), "r") as myzip:
-            zipfiles = myzip.infolist()
-            for zipf in zipfiles:
-                self.logger.info('Reading report from %s' % zipf.filename)
-                with myzip.open(zipf.filename) as myfile:
-                    header = {}
-                    positions = {}
-                    num_header_columns = 0
-                    columns = None
-                    summary = None
-
-                    status_header_section = 0
-                    lines = myfile.read()
-                    lines = lines.decode("utf-8")
-                    f = StringIO(lines)
-
-                    # Here is a sample of the jobstatus file:
-                    # note that this file is always CSV (with commas) even if the output file
-                    # is pipe delimited - i.e. for the PortfolioExposure report type.
-
-                    # See a sample below. Each line in the sample corresponds to a new line in the file:
-
-                    # <start sample>
-                    # Risk Model, Version, Covariance Matrix Date
-                    # MAC.L, 400.00, 2020 / 06 / 26
-                    # Name, Owner, Valid
-                    # AllAssetCorrelations, System, true
-                    # AllocationSelection - GICS, python, true
-                    # Cashflow - Custom, python, true
-                    # Risk - Decomp, python, true
-                    #
-                    # Portfolio, Analysis Date, Owner, Processed, Holdings Date, Bmk, Bmk Holdings Date, Market Value,
-                    #   <cont on same line> Currency, Accept %, Directory, Full Tree Path, Stored Analytics Status,
-                    # BA204, 2020/06/30, SYSTEM, Yes, 2020/06/30, CASH,, 1325289383537.18, USD, 97.97, BA204/, SYSTEM/BA204,
-                    # SAP500D, 2020/06/30, SYSTEM, Yes, 2020/06/30, CASH,, 25636608236818.79, USD, 100.00, SAP500D/, SYSTEM/SAP500D,
-                    # <end sample>
-
-                    # There are three sections to  reading this file:
-
-                    # 1:This first row of headers only has one corresponding row of values. This is always true
-                    # regardless of how many portfolios or reports are in the export set
-
-                    # 'Risk Model' = 'MAC.L', Version = 400.00, and Covariance Matrix Date = '2020/06/26',
-
-                    # 2: The second section has one row per report definition specified in the job
-                    # 'Name' = 'AllAssetCorrelations, 'Owner' = 'System, 'Valid' = true
-                    # 'Name' = 'AllocationSelection - GICS, 'Owner' = 'python, 'Valid' = true
-                    # 'Name' = 'Cashflow - Custom, 'Owner' = 'python, 'Valid' = true
-                    # 'Name' = 'Risk - Decomp, 'Owner' = 'python, 'Valid' = true
-
-                    # 3: The third section has one row per portfolio specified in the job:
-                    # e.g. 'Portfolio' = 'BA204', 'Holdings Date' = '2020/06/30', and 'Full Tree Path' = 'SYSTEM/BA204' for the first row
-                    # e.g. 'Portfolio' = 'SAP500D', 'Bmk' = 'CASH', and 'Market Value' = 25636608236818.79 for the second row
-
-                    # the file is parsed like a standard report, with Header, Summary and Detail being returned.
-                    # The first two sections are combined into the 'Header' dictionary, and the third section is returned
-                    # in the 'Details' dictionary. 'Summary' is set to None
-
-                    # I use 'status_header_section' to track which section I am on I read each line in the file
-
-                    if 'jobstatus' in zipf.filename:
-                        temp_delimiter = ','
-                    else:
-                        temp_delimiter = delimiter
-
-                    for this_line in csv.reader(f, delimiter=temp_delimiter):
-
-                        if not this_line:
-                            continue  # skip over empty rows
-
-                        if not num_header_columns:
-                            num_header_columns = len(this_line)
-                        header_row = this_line
-
-                        if len(header_row) <= num_header_columns:
-                            # still reading headers
-
-                            if 'jobstatus' in zipf.filename:
-                                # we are reading headers from the status file
-                                # headers and values are row based
-                                # so when we read the column headers
-                                # the next line in the file will contain the corresponding values
-                                # we look for either 'Risk Model' or 'Name' in the first column of the current line
-
-                                # if first column = 'Risk Model', just the next row should be read as values
-                                # if first column = 'Name', all following rows should be read as values
-
-                                if status_header_section > 0:
-                                    if status_header_section == 1:
-                                        status_header_section = 0
-                                        header['Risk Model'] = header_row[0]
-                                        header['Version'] = header_row[1]
-                                        header['Covariance Matrix Date'] = header_row[2]
-                                    elif status_header_section == 2:
-
-                                        if summary is None:
-                                            summary = {'Name': [], 'Owner': [], 'Valid': []}
-
-                                        summary['Name'].append(header_row[0])
-                                        summary['Owner'].append(header_row[1])
-                                        summary['Valid'].append(header_row[2])
-
-                                else:
-                                    if header_row[0] == 'Risk Model':
-                                        status_header_section = 1
-
-                                    if header_row[0] == 'Name':
-                                        status_header_section = 2
-
-                            elif num_header_columns == 2:
-                                if len(header_row) > 1:
-                                    header_values = header_row[1].strip()
-                                else:
-                                    header_values = header_row[-1]
-
-                                header[header_row[0].replace(':', '')] = header_values
-
-                        else:
-                            # number of columns has changed
-                            # the first time this happens we are looking at the column row
-                            # subsequent rows will be the summary row (if it is present)
-                            # and then the detail rows
-                            if columns is None:
-
-                                # get the list of columns from current line
-                                columns = [x.strip() for x in this_line]
-
-                                has_summary = False # assume no summary unless explicitly specified
-
-                                # for the Correlations report, there may be duplicated columns if the portfolio
-                                # contains positions with the same name (e.g. Class A and B shares)
-                                # If we find  duplicates we rename the columns to address the problem
-                                # this is inefficient code O(n^2) but fast relative to everything else :)
-                                if len(columns) != len(set(columns)):
-                                    # use max_duplicate_num dictionary to track any duplicate columns
-                                    # will contain a duplicate count for any columns that are duplicate
-                                    # contains an int that we append to the column name and then increment afterwards
-                                    max_duplicate_num = defaultdict(int)
-                                    new_cols = []
-                                    for this_col in columns:
-                                        if this_col not in new_cols:
-                                            new_cols.append(this_col)
-                                        else:
-                                            # we increment before creating modified_col so that
-                                            # first duplicate with end with '-1'
-                                            duplicate_num = max_duplicate_num[this_col]+1
-                                            modified_col = this_col + '-' + str(duplicate_num)
-                                            new_cols.append(modified_col)
-                                            max_duplicate_num[this_col] = duplicate_num
-                                    columns = new_cols
-
-                                # if report includes summary row, it is the first row after the headers
-                                # we remove this row and return as a separate output,
-                                # with the same columns as the details
-
-                                # Positions Reports are required to have the Asset ID and Holdings columns in them
-                                # So we can use this to test columns of a report to determine
-                                # if it's a Positions Report
-                                # Positions Report have a summary report which must be separated out
-
-                                if export_set_type == 'PortfolioAnalysis':
-                                    if {'Asset ID', 'Holdings'}.issubset(set(columns)):
-                                        # Positions report - contains both 'Asset ID' and 'Holdings' columns
-                                        has_summary = True
-                                    elif {'Asset ID', 'Asset ID Type'}.issubset(set(columns)):
-                                        # Cashflow report - contains Asset ID and ID Type, but not 'Holdings
-                                        has_summary = True
-                                    elif {'Risk Source'}.issubset(set(columns)):
-                                        # this must be a Risk Decomposition or a Risk Delta Report
-                                        has_summary = True
-                                    elif 'jobstatus' in zipf.filename:
-                                        has_summary = True
-                                elif export_set_type == 'HVR':
-                                    has_summary = True
-
-                                # now go on to the next line in the file
-                                # will be either summary or details depending on value of has_summary
-                                for this_column in columns:
-                                    positions[this_column] = []
-                                continue
-
-                            if has_summary and summary is None:
-
-                                summary = {}
-                                summary_row_fields = [x.strip() for x in this_line]
-
-                                for col_name, summary_field in zip(columns, summary_row_fields):
-                                    # if we can cast this to a float we will do so, otherwise leave as is
-                                    # and strip '%' signs as well
-                                    summary[col_name] = [parse_field(summary_field)]
-                                # now go on to the next line in the file - detail rows
-                                # ensure that we don't read the next line as a sumamry
-                                has_summary = False
-                                continue
-
-                            detail_row_fields = [x.strip() for x in this_line]
-
-                            for col_name, detail_field in zip(columns, detail_row_fields):
-                                # if we can cast this to a float we will do so, otherwise leave as is
-                                # and strip '%' signs as well
-                                positions[col_name].append(detail_field)
-
-                    # next we consider entire columns to determine whether to cast to float or not
-                    # this has to be done at a column level since there may be castable values in columns
-                    # that contain text information (e.g. a Barra ID or CUSIP that is entirely numeric)
-                    # and those values should remain as text
-
-                    for col_name, col_values in positions.items():
-                        col_types = set(map(lambda x: type(parse_field(x)), col_values))
-                        # if the column only contains floats or None or empty string (''), convert to float
-                        # (parse_field will leave 'None' as is)
-                        if col_types.issubset({float, type(None)}):
-                            positions[col_name] = list(map(parse_field, col_values))
-                        # else:
-                        #     self.logger.info(col_name+ ' not coverted to float')
-
-                    # reformat the 'wide' output for the exposure report to a 4 column narrow format
-                    # does not need to be done for the specific covariance report though
-                    # Specific Covariance does not have 'Asset ID' in keys, only 'Asset ID 1' and 'Asset ID 2'
-                    if export_set_type == 'PortfolioExposure' and 'Asset ID' in positions.keys():
-                        asset_id_lst = positions['Asset ID']
-                        asset_id_type_lst = positions['Asset ID Type']
-                        spec_risk_lst = positions['Specific Risk']
-
-                        # note that our output dictionary will have multiple rows for each asset
-                        asset_asset_lst = []
-                        asset_asset_type_lst = []
-                        asset_factor_lst = []
-                        asset_exposure_lst = []
-
-                        for this_factor in [i for i in positions.keys() if i not in
-                                                                           ['Asset ID', 'Asset ID Type',
-                                                                            'Specific Risk']]:
-
-                            for (this_asset_id, this_assset_id_type, this_exposure) in zip(asset_id_lst,
-                                                                                           asset_id_type_lst,
-                                                                                           positions[this_factor]):
-                                if this_exposure is not None:
-                                    asset_asset_lst.append(this_asset_id)
-                                    asset_asset_type_lst.append(this_assset_id_type)
-                                    asset_factor_lst.append(this_factor)
-                                    asset_exposure_lst.append(this_exposure)
-
-                        # if requested, append the specific risk numbers as well as their own 'factor'
-                        if include_specific_risk:
-                            asset_asset_lst = asset_asset_lst + asset_id_lst
-                            asset_asset_type_lst = asset_asset_type_lst + asset_id_type_lst
-                            asset_factor_lst = asset_factor_lst + ['Specific Risk' for i in asset_id_lst]
-                            asset_exposure_lst = asset_exposure_lst + [float(spec_risk) for spec_risk in
-                                                                       spec_risk_lst]
-
-                        # replace positions dictionary with condensed one for Portfolio Exposures
-                        positions = {'Asset ID': asset_asset_lst,
-                                     'Asset ID Type': asset_asset_type_lst,
-                                     'Factor': asset_factor_lst,
-                                     'Exposure': asset_exposure_lst}
-
-                    if 'jobstatus' in zipf.filename:
-
-                        # remove the column with empty column if it exists, in the jobstatus detail dictionary
-                        positions.pop('', None)
-
-                        reports['Status'] = ({'Header': header, 'Summary': summary,
-                                              'Detail': positions, 'Filename': zipf.filename})
-                    else:
-                        reports['Reports'].append({'Header': header, 'Summary': summary,
-                                                   'Detail': positions, 'Filename': zipf.filename})
+        Unlike readReport, the matrix rows are written into a preallocated NumPy array as they are read, without
+        building per-column lists first. Requires numpy.
+
+        :param byte_array:
+        :type byte_array:  binary
+        :param packed: If True, return the matrices in packed upper-triangular storage. Default = False
+        :type packed: boolean
+        :return: {'Reports': [...], 'Status': ...}, see msci.bdt.context.columnar.read_mpc_matrix_file
+        """
+        from msci.bdt.context.columnar import read_mpc_matrix_file
+
+        delimiter = self._report_delimiter('MPC')
+        reports = {'Reports': []}
+        for filename, f in self._iter_report_files(byte_array):
+            if is_status_file(filename):
+                reports['Status'] = read_report_file(f, filename, 'MPC', delimiter)
+            else:
+                reports['Reports'].append(read_mpc_matrix_file(f, filename, delimiter, packed))
 
         return reports
 
@@ -474,6 +952,180 @@ class _CommonClient(BDTClient):
         # Step 1 create Portfolios
 
         portfolios_for_import = []
+        for this_port in self._valid_import_portfolios(port_list):
+            port = self._import_portfolio(this_port)
+            this_port_positions = this_port['Positions']
+
+            # now iterate through items in Positions dictionary, which contains holdings / values / weights etc
+            pos_list = self.factory.create('Positions')
+            pos_list.Position = []
+            # TODO: Support multiple ids for a given position (via Priority)
+            for asset_num, (asset_id, asset_id_type) in enumerate(
+                    zip(this_port_positions['id'], this_port_positions['idtype'])):
+                pos = self.factory.create('Position')
+                for col_name, col_values in this_port_positions.items():
+                    if hasattr(pos, '_' + col_name):
+                        setattr(pos, '_' + col_name, col_values[asset_num])
+
+                mid = self.factory.create('MID')
+                mid._ID = asset_id
+                mid._IDType = asset_id_type
+                pos.MID = mid
+                pos_list.Position.append(pos)
+
+            port.Positions = pos_list
+            portfolios_for_import.append(port)
+
+        # Step 2 create SubmitImportJob request
+        if not portfolios_for_import:
+            # no valid portfolios found
+            raise Exception('No valid portfolios found to import - check warnings for more details')
+
+        job_id = self.service.SubmitImportJob(JobName=job_name,
+                                              Portfolio=portfolios_for_import)
+
+        return job_id
+
+    def importPortfolios(self, port_list, job_name='BDTImportUserPort', max_positions=100000, max_in_flight=4,
+                         bulk=True):
+        """
+        Import portfolios in chunks of at most max_positions positions, submitted as concurrent import jobs, and
+        return their merged logs.
+
+        port_list is split in order into chunks of whole portfolios: a portfolio is never split across jobs, and one
+        with more than max_positions positions is imported on its own. Up to max_in_flight chunks are submitted or
+        running on the server at a time and all the running jobs are polled in a single loop.
+
+        :param port_list: a list of dictionaries, one for each portfolio being imported, see submitPortfolioImportJob
+        :param job_name: import job name prefix, the chunk number is appended
+        :type job_name: str
+        :param max_positions: maximum number of positions per import job
+        :type max_positions:  int
+        :param max_in_flight: maximum number of import jobs submitted or running at a time
+        :type max_in_flight:  int
+        :param bulk: use submitBulkPortfolioImportJob rather than submitPortfolioImportJob
+        :type bulk:  boolean
+        :return: import_log, import_detail like getImportJobLog, the 'Job' column numbering the log groups across
+         all the chunks in port_list order
+        :raises BDTError: if an import job could not be submitted or failed, once the other jobs have completed
+        """
+        chunks = chunk_portfolios(list(self._valid_import_portfolios(port_list)), max_positions)
+        if not chunks:
+            # no valid portfolios found
+            raise Exception('No valid portfolios found to import - check warnings for more details')
+        submit_name = 'submitBulkPortfolioImportJob' if bulk else 'submitPortfolioImportJob'
+        # clients of the worker threads, this client polling the jobs
+        idle_workers = queue.LifoQueue()
+        workers = []
+
+        def submit(chunk, chunk_job_name):
+            try:
+                worker = idle_workers.get_nowait()
+            except queue.Empty:
+                worker = self._worker_client()
+                workers.append(worker)
+            try:
+                return getattr(worker, submit_name)(chunk, chunk_job_name)
+            finally:
+                idle_workers.put(worker)
+
+        pending_chunks = deque(enumerate(chunks))
+        submitting = {}
+        job_chunks = {}
+        job_logs = {}
+        errors = {}
+        scheduler = JobScheduler(self)
+
+        with self._closing_workers(workers), ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            while pending_chunks or submitting or scheduler:
+
+                while pending_chunks and len(submitting) + len(scheduler) < max_in_flight:
+                    chunk_num, chunk = pending_chunks.popleft()
+                    this_job_name = '%s_%i' % (job_name, chunk_num + 1) if len(chunks) > 1 else job_name
+                    submitting[executor.submit(submit, chunk, this_job_name)] = chunk_num
+
+                for future in [f for f in submitting if f.done()]:
+                    chunk_num = submitting.pop(future)
+                    try:
+                        job_id = future.result()
+                    except Exception as e:
+                        self.logger.error('Unable to submit import chunk %i: %s' % (chunk_num + 1, e))
+                        errors[chunk_num] = e
+                    else:
+                        job_chunks[job_id] = chunk_num
+                        scheduler.add(job_id, 'Import')
+
+                if scheduler:
+                    # do not sleep through finished submissions for too long
+                    finished = scheduler.poll(max_wait=1 if submitting else None)
+                    if finished is None:
+                        continue
+
+                    job_id, error = finished
+                    chunk_num = job_chunks.pop(job_id)
+                    if error is not None:
+                        errors[chunk_num] = error
+                        continue
+                    try:
+                        job_logs[chunk_num] = self.service.GetImportJobLog(job_id)
+                    except Exception as e:
+                        self.logger.error('Unable to retrieve the log of import job %s: %s' % (job_id, e))
+                        errors[chunk_num] = e
+                elif submitting:
+                    wait(list(submitting), return_when=FIRST_COMPLETED)
+
+        if errors:
+            msg = 'Import failed for %i of %i chunks: %s' % (
+                len(errors), len(chunks), '; '.join('chunk %i: %s' % (n + 1, errors[n]) for n in sorted(errors)))
+            self.logger.error(msg)
+            raise BDTError(msg)
+
+        logs = []
+        details = []
+        first_job = 1
+        for chunk_num in range(len(chunks)):
+            import_log, import_detail = self._read_import_job_log(job_logs[chunk_num], first_job)
+            first_job += len(job_logs[chunk_num].LogGroups.ImportLogGroup)
+            logs.append(import_log)
+            details.append(import_detail)
+
+        return merge_columns(logs), merge_columns(details)
+
+    @staticmethod
+    @contextmanager
+    def _closing_workers(workers):
+        """
+        Close the transports of the worker clients once the block exits
+        """
+        try:
+            yield workers
+        finally:
+            for worker in workers:
+                worker.client.options.transport.close()
+
+    def submitBulkPortfolioImportJob(self, port_list, job_name='BDTImportUserPort'):
+        """
+        Import one or more portfolios like submitPortfolioImportJob, for large portfolios.
+
+        The request is serialized from a template compiled from a single position per portfolio instead of suds
+        factory objects for every position, see msci.bdt.context.import_builder. It is identical to the one
+        submitPortfolioImportJob sends.
+
+        :param port_list: a list of dictionaries, one for each portfolio being imported, see submitPortfolioImportJob.
+         The 'Positions' columns can be lists or arrays.
+        :param job_name: optional name for the import job
+        :type job_name: str
+
+        :return: job id corresponding to submitted job
+        :rtype: str
+        """
+        envelope = build_import_envelope(self, port_list, job_name)
+        return self._send_service_envelope('SubmitImportJob', envelope)
+
+    def _valid_import_portfolios(self, port_list):
+        """
+        Yield the portfolio dictionaries with the required keys, logging a warning for the others
+        """
         for this_port in port_list:
             # confirm that Portfolio, Owner and Date exist as keys in each dict
             # otherwise, skip this portfolio and raise a warning
@@ -484,73 +1136,201 @@ class _CommonClient(BDTClient):
             elif 'EffectiveStartDate' not in this_port or 'Positions' not in this_port:
                 self.logger.warning(f'Portfolio with name {this_port["PortfolioName"]} dictionary missing either EffectiveStartDate or Positions keys')
             else:
+                yield this_port
 
-                port = self.factory.create('Portfolio')
-
-                port._Owner = self.user_id
-                port._PortfolioImportType = "BY_HOLDINGS"  # Set by default, may be overwritten
-
-                for this_attr, this_value in this_port.items():
-                    # Go through all inputs for this portfolio
-                    # Assign any that are found on the Portfolio suds object (e.g. Benchmark)
-                    # we will do 'Positions' separately to ensure we treat holdings / value / weights / ids correctly
-                    if hasattr(port, '_' + this_attr) and this_attr != 'Positions':
-                        setattr(port, '_' + this_attr, this_value)
-
-                this_port_positions = this_port['Positions']
-
-                # now iterate through items in Positions dictionary, which contains holdings / values / weights etc
-                pos_list = self.factory.create('Positions')
-                pos_list.Position = []
-                # TODO: Support multiple ids for a given position (via Priority)
-                for asset_num, (asset_id, asset_id_type) in enumerate(
-                        zip(this_port_positions['id'], this_port_positions['idtype'])):
-                    pos = self.factory.create('Position')
-                    for col_name, col_values in this_port_positions.items():
-                        if hasattr(pos, '_' + col_name):
-                            setattr(pos, '_' + col_name, col_values[asset_num])
-
-                    mid = self.factory.create('MID')
-                    mid._ID = asset_id
-                    mid._IDType = asset_id_type
-                    pos.MID = mid
-                    pos_list.Position.append(pos)
-
-                port.Positions = pos_list
-                portfolios_for_import.append(port)
+    def _import_portfolio(self, this_port):
+        """
+        Return the Portfolio suds object of a portfolio dictionary, without its positions
+        """
+        port = self.factory.create('Portfolio')
 
-        # Step 2 create SubmitImportJob request
-        if not portfolios_for_import:
-            # no valid portfolios found
-            raise Exception('No valid portfolios found to import - check warnings for more details')
+        port._Owner = self.user_id
+        port._PortfolioImportType = "BY_HOLDINGS"  # Set by default, may be overwritten
 
-        job_id = self.service.SubmitImportJob(JobName=job_name,
-                                              Portfolio=portfolios_for_import)
+        for this_attr, this_value in this_port.items():
+            # Go through all inputs for this portfolio
+            # Assign any that are found on the Portfolio suds object (e.g. Benchmark)
+            # we will do 'Positions' separately to ensure we treat holdings / value / weights / ids correctly
+            if hasattr(port, '_' + this_attr) and this_attr != 'Positions':
+                setattr(port, '_' + this_attr, this_value)
 
-        return job_id
+        return port
 
-    def getExportJob(self, job_id):
+    def getExportJob(self, job_id, stream=None):
         """
         Retrieve the Export Set binary data once status is complete
 
         :param job_id:
         :type job_id:  str
-        :return: Binary Data
+        :param stream: If True, stream the data into a temporary file instead of memory, see streamExportJob.
+         Defaults to the stream_downloads attribute of the client
+        :type stream:  boolean
+        :return: Binary Data, or a temporary file positioned at the start of the data if streaming
         """
 
+        if stream is None:
+            stream = self.stream_downloads
+
+        if stream:
+            f = tempfile.TemporaryFile()
+            try:
+                self.streamExportJob(job_id, f)
+            except Exception:
+                f.close()
+                raise
+            f.seek(0)
+            return f
+
         self.logger.info('Retrieving export set data for job id : %s' % job_id)
         # TODO should we do an automatic retry once only after waiting 30 seconds if this fails?
         attachment = self.service.GetExportJob(job_id)
+        self._forget_export_job(job_id)
         return base64.b64decode(attachment.BinaryData)
 
+    def streamExportJob(self, job_id, fileobj):
+        """
+        Retrieve the Export Set binary data into a file object, decoding the SOAP reply as it is received
+
+        :param job_id:
+        :type job_id:  str
+        :param fileobj: binary file object to write the export set data to
+        :type fileobj:  file-like object
+        :return: number of bytes written
+        """
+
+        self.logger.info('Streaming export set data for job id : %s' % job_id)
+        with self._open_service_stream('GetExportJob', job_id) as reply:
+            size = stream_binary_data(reply, fileobj)
+
+        if size is None:
+            msg = 'No BinaryData in export job reply for job id %s' % job_id
+            self.logger.error(msg)
+            raise BDTError(msg, job_id)
+
+        self._forget_export_job(job_id)
+        return size
+
+    def _forget_export_job(self, job_id):
+        """
+        Drop a downloaded or failed job from export_jobs, whose entries are only needed to tag the reports of the jobs
+        not downloaded yet in the report_cache
+        """
+        self.export_jobs.pop(job_id, None)
+
+    def _open_service_stream(self, name, *args):
+        """
+        Call a service method with the credentials like _Service does, but return the open HTTP response instead of
+        letting suds read and parse the reply, see BDTClient._open_service_stream
+        """
+        return BDTClient._open_service_stream(self, name, self.user_id, self.client_id, self.password, *args)
+
+    def _send_service_envelope(self, name, envelope):
+        """
+        Send a SOAP envelope built outside of suds for a service method, and return the reply processed by suds
+        """
+        method = getattr(self.client.service, name).method
+        soap_client = _SoapClient(self.client, method)
+        try:
+            reply = self.client.options.transport.send(self._service_request(method, envelope))
+        except TransportError as e:
+            content = e.fp and e.fp.read() or ''
+            return soap_client.process_reply(content, e.httpcode, tostr(e))
+        return soap_client.process_reply(reply.message, None, None)
+
     def _get_report(self, report_type, job_id,  wait_for_completion, **kwargs):
         self.logger.info('Parsing %s report for job id : %s ' % (report_type, job_id))
+
+        reports, cache_key = self._cached_report(report_type, job_id, kwargs)
+        if reports is not None:
+            return reports
+
         if wait_for_completion:
             self.waitJob(job_id, 'Export')
         byte_array = self.getExportJob(job_id)
-        reports = self.readReport(byte_array, export_set_type=report_type, **kwargs)
+        reports = self._read_export_data(byte_array, report_type, **kwargs)
+        self._cache_report(cache_key, reports)
         return reports
 
+    def _cached_report(self, report_type, job_id, kwargs):
+        """
+        Look the reports of an export job up in the report_cache, before the job is downloaded
+
+        :return: the cached reports or None, and the key to cache the reports under once read (None if they are not
+         to be cached), see _cache_report
+        """
+        if self.report_cache is None or kwargs.get('stream', False):
+            return None, None
+
+        cache_tags = self._report_cache_tags(job_id)
+        cache_options = (report_type, {k: v for k, v in kwargs.items() if k not in self.UNCACHED_READ_OPTIONS})
+        for tag in cache_tags:
+            reports = self.report_cache.get(tag, cache_options)
+            if reports is not None:
+                self.logger.info('Found cached %s report for job id : %s ' % (report_type, job_id))
+                return reports, None
+        return None, (cache_tags, cache_options)
+
+    def _cache_report(self, cache_key, reports):
+        """
+        Store the reports read for a key returned by _cached_report in the report_cache
+        """
+        if cache_key is not None:
+            cache_tags, cache_options = cache_key
+            # written once, linked under the other tags
+            self.report_cache.put(cache_tags[0], cache_options, reports, aliases=cache_tags[1:])
+
+    def _report_cache_tags(self, job_id):
+        """
+        Return the report_cache tags of an export job: its id, and its export set definition and analysis date if
+        it was submitted by this client
+        """
+        tags = [('job', self.user_id, job_id)]
+        # export_jobs may be shared with other threads, see AsyncServiceClient
+        job = self.export_jobs.get(job_id)
+        if job is not None:
+            tags.append(('definition', self.user_id) + job)
+        return tags
+
+    def invalidateCachedReports(self, job_id):
+        """
+        Remove the reports of an export job from the report_cache, including those cached for the same export set
+        definition and analysis date if the job is not downloaded yet
+
+        :param job_id:
+        :type job_id:  str
+        """
+        if self.report_cache is not None:
+            for tag in self._report_cache_tags(job_id):
+                self.report_cache.invalidate(tag)
+
+    def _read_export_data(self, byte_array, export_set_type, **kwargs):
+        """
+        readReport, closing the export data afterwards if it was streamed to a temporary file: once the reports are
+        read, or once the generator of reports is exhausted or closed if stream is True
+        """
+        if not hasattr(byte_array, 'close'):
+            return self.readReport(byte_array, export_set_type=export_set_type, **kwargs)
+        try:
+            reports = self.readReport(byte_array, export_set_type=export_set_type, **kwargs)
+        except Exception:
+            byte_array.close()
+            raise
+        if not kwargs.get('stream', False):
+            byte_array.close()
+            return reports
+        return self._closing_reports(reports, byte_array)
+
+    @staticmethod
+    def _closing_reports(reports, byte_array):
+        """
+        Yield the reports of the generator, closing the export data once it is exhausted or closed
+        """
+        try:
+            for report in reports:
+                yield report
+        finally:
+            byte_array.close()
+
 class _Service(object):
     """
     This is a helper object, used by the ServiceClient object, to simplify the syntax of the SOAP service calls.
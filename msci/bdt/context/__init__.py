@@ -9,4 +9,4 @@ interactive clients.
 URLS = {'PROD':'https://www.barraone.com',
         'UAT' :'https://uat.barraone.com',
         'US'  :'https://us.barraone.com',
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,223 @@
+import getpass
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+
+from msci.bdt.context.exceptions import BDTError
+from msci.bdt.context.registry import freeze
+
+MAGIC = b'BDTC'
+HEADER = struct.Struct('<4sIQ')
+BUFFER_LENGTH = struct.Struct('<Q')
+
+
+def private_directory(directory, name):
+    """
+    Return a cache folder readable by the current user only, created if needed. The cache entries are unpickled,
+    which runs code, so a folder owned by another user or writable by others is refused.
+
+    :param directory: cache folder, None for a folder of the current user in the temporary directory
+    :type directory:  str
+    :param name: name of the default folder, suffixed with the user name
+    :type name:  str
+    :raises BDTError: if the folder is not owned by the current user or is writable by others
+    """
+    if directory is None:
+        directory = os.path.join(tempfile.gettempdir(), '%s-%s' % (name, getpass.getuser()))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    stat = os.stat(directory)
+    # no owner on Windows, where the temporary directory is per user
+    if hasattr(os, 'getuid') and (stat.st_uid != os.getuid() or stat.st_mode & 0o022):
+        raise BDTError('Refusing to use cache folder %s: it must be owned by the current user and not writable by '
+                       'others' % directory)
+    return directory
+
+
+class ReportCache(object):
+    """
+    Size-bounded on-disk cache of parsed reports.
+
+    Entries are grouped by tag (a job id, or an export set definition and analysis date) and keyed within a tag by
+    the parsing options. Values are stored with pickle protocol 5 and out-of-band buffers, so NumPy arrays (columnar
+    and matrix outputs) are read back from the file contents without per-element work. The least recently used
+    entries are evicted once the cache grows over max_bytes.
+
+    The folder must be private to the current user, see private_directory.
+    """
+
+    suffix = '.bdtc'
+
+    def __init__(self, directory=None, max_bytes=2 ** 30):
+        """
+        :param directory: cache folder, created if needed (a folder of the user in the temporary directory by default)
+        :type directory:  str
+        :param max_bytes: maximum total size of the cache files
+        :type max_bytes:  int
+        :raises BDTError: if the folder is owned by another user or writable by others
+        """
+        self.directory = private_directory(directory, 'msci-bdt-report-cache')
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def _digest(value):
+        return hashlib.sha1(repr(freeze(value)).encode('utf-8')).hexdigest()
+
+    def _path(self, tag, options):
+        return os.path.join(self.directory, '%s-%s%s' % (self._digest(tag), self._digest(options), self.suffix))
+
+    def _entries(self, prefix=''):
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(self.suffix):
+                yield os.path.join(self.directory, name)
+
+    def get(self, tag, options=None):
+        """
+        Return the cached value, or None if there is none. An entry which cannot be read back, e.g. written by an
+        older version, is removed and treated as missing.
+
+        :param tag: hashable (after freeze) entry group, e.g. ('job', job_id)
+        :param options: hashable (after freeze) parsing options
+        """
+        path = self._path(tag, options)
+        try:
+            with open(path, 'rb') as f:
+                # read in place, without a copy of the file contents
+                data = bytearray(os.fstat(f.fileno()).st_size)
+                size = f.readinto(data)
+        except FileNotFoundError:
+            return None
+
+        try:
+            value = self._decode(data, size)
+        except Exception:
+            self._remove(path)
+            return None
+
+        # mark as recently used for the LRU eviction
+        os.utime(path)
+        return value
+
+    @staticmethod
+    def _decode(data, size):
+        """
+        Unpickle an entry, raising ValueError if it is not a complete entry
+        """
+        if size != len(data) or size < HEADER.size:
+            raise ValueError('Truncated cache entry')
+        magic, num_buffers, main_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('Not a cache entry')
+
+        offset = HEADER.size
+        buffer_lengths = []
+        for _ in range(num_buffers):
+            buffer_lengths.append(BUFFER_LENGTH.unpack_from(data, offset)[0])
+            offset += BUFFER_LENGTH.size
+        if offset + main_length + sum(buffer_lengths) != size:
+            raise ValueError('Truncated cache entry')
+
+        view = memoryview(data)
+        main = view[offset:offset + main_length]
+        offset += main_length
+        buffers = []
+        for length in buffer_lengths:
+            buffers.append(view[offset:offset + length])
+            offset += length
+        return pickle.loads(main, buffers=buffers)
+
+    def put(self, tag, options, value, aliases=()):
+        """
+        Store a value, then evict the least recently used entries if the cache is over max_bytes
+
+        :param aliases: other tags to store the value under, as links to the same file, so that it is written and
+         counted once
+        :type aliases:  list
+        """
+        buffers = []
+        main = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+        raw_buffers = [b.raw() for b in buffers]
+
+        def write(f):
+            f.write(HEADER.pack(MAGIC, len(raw_buffers), len(main)))
+            for raw in raw_buffers:
+                f.write(BUFFER_LENGTH.pack(raw.nbytes))
+            f.write(main)
+            for raw in raw_buffers:
+                f.write(raw)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            for alias in aliases:
+                self._link(tmp_path, self._path(alias, options), write)
+            # atomic, so that concurrent readers and a crash never leave a partial entry
+            os.replace(tmp_path, self._path(tag, options))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        self.evict()
+
+    def _link(self, source, path, write):
+        """
+        Atomically make path a link to the source entry, or a copy written with write if links are not supported
+        """
+        link_path = source + '.link'
+        self._remove(link_path)
+        try:
+            os.link(source, link_path)
+        except OSError:
+            fd, link_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+        try:
+            os.replace(link_path, path)
+        except Exception:
+            self._remove(link_path)
+            raise
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is within max_bytes
+        """
+        # the links of an entry under several tags, see put, share its inode and are counted once
+        files = {}
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            mtime, size, paths = files.setdefault((stat.st_dev, stat.st_ino), (stat.st_mtime, stat.st_size, []))
+            paths.append(path)
+
+        total = sum(size for _, size, _ in files.values())
+        for _, size, paths in sorted(files.values()):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                self._remove(path)
+            total -= size
+
+    def invalidate(self, tag):
+        """
+        Remove all the entries of a tag
+        """
+        for path in list(self._entries(self._digest(tag) + '-')):
+            self._remove(path)
+
+    def clear(self):
+        """
+        Remove all the entries
+        """
+        for path in list(self._entries()):
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,249 @@
+"""
+Vectorized conversion of parsed report columns into NumPy arrays.
+
+This module backs the ``columnar=True`` mode of _CommonClient.readReport. Numeric columns are returned as contiguous
+float64 arrays (NaN for 'N/A' or blank fields, '%' fields scaled by 1/100) and text columns as object or fixed-width
+string arrays. The column type is decided and converted in a single vectorized pass, with the same column level rule
+as parse_field: a column is numeric only if every field in it can be cast to float.
+
+"""
+import csv
+
+import numpy as np
+
+from msci.bdt.context._CommonClient import rename_duplicate_columns
+
+MISSING_VALUES = ['N/A', '']
+
+
+def parse_column(values, text_dtype=object):
+    """
+    Convert a column of stripped report fields into a NumPy array
+
+    :param values: column fields, as read from the report file
+    :type values:  list[str]
+    :param text_dtype: dtype used for text columns, object (default) or str for fixed-width unicode arrays
+    :type text_dtype:  type
+    :return: float64 array for numeric columns, text_dtype array otherwise
+    :rtype: numpy.ndarray
+    """
+    raw = np.asarray(values, dtype=str)
+    missing = np.isin(raw, MISSING_VALUES)
+    percent = np.char.endswith(raw, '%')
+
+    numeric = np.where(percent, np.char.rstrip(raw, '%'), raw)
+    numeric = np.where(missing, 'nan', numeric)
+    try:
+        column = numeric.astype(np.float64)
+    except ValueError:
+        # at least one field is not numeric, so the whole column is text
+        if text_dtype is str:
+            return raw
+        return np.asarray(values, dtype=text_dtype)
+
+    column[percent] /= 100.0
+    return column
+
+
+def parse_columns(positions, text_dtype=object):
+    """
+    Convert every column of a Detail or Summary dictionary with parse_column
+
+    :param positions: dictionary of column name to list of fields
+    :type positions:  dict
+    :param text_dtype: see parse_column
+    :type text_dtype:  type
+    :return: dictionary of column name to numpy.ndarray
+    :rtype: dict
+    """
+    return {col_name: parse_column(col_values, text_dtype) for col_name, col_values in positions.items()}
+
+
+def exposure_long_format(positions, include_specific_risk=False):
+    """
+    Vectorized equivalent of the 'wide' to 4 column narrow reformatting of PortfolioExposure reports
+
+    Rows are ordered by factor, then by asset, and missing exposures are dropped, as in the list based output.
+
+    :param positions: columnar PortfolioExposure Detail dictionary
+    :type positions:  dict
+    :param include_specific_risk: If True, append the specific risk numbers as their own 'Specific Risk' factor
+    :type include_specific_risk: boolean
+    :return: {'Asset ID', 'Asset ID Type', 'Factor', 'Exposure'} dictionary of numpy.ndarray
+    :rtype: dict
+    """
+    asset_ids = positions['Asset ID']
+    asset_id_types = positions['Asset ID Type']
+    factors = [i for i in positions.keys() if i not in ['Asset ID', 'Asset ID Type', 'Specific Risk']]
+
+    if factors:
+        # factor x asset, so that the boolean indexing below walks factor by factor
+        exposures = np.vstack([np.asarray(positions[this_factor], dtype=np.float64) for this_factor in factors])
+    else:
+        exposures = np.empty((0, len(asset_ids)))
+
+    present = ~np.isnan(exposures)
+    factor_idx, asset_idx = np.nonzero(present)
+
+    long_format = {'Asset ID': asset_ids[asset_idx],
+                   'Asset ID Type': asset_id_types[asset_idx],
+                   'Factor': np.asarray(factors, dtype=object)[factor_idx],
+                   'Exposure': exposures[present]}
+
+    if include_specific_risk:
+        long_format['Asset ID'] = np.concatenate([long_format['Asset ID'], asset_ids])
+        long_format['Asset ID Type'] = np.concatenate([long_format['Asset ID Type'], asset_id_types])
+        long_format['Factor'] = np.concatenate([long_format['Factor'],
+                                                np.full(len(asset_ids), 'Specific Risk', dtype=object)])
+        long_format['Exposure'] = np.concatenate([long_format['Exposure'],
+                                                  np.asarray(positions['Specific Risk'], dtype=np.float64)])
+
+    return long_format
+
+
+MATRIX_LAYOUTS = ['csr', 'coo', 'dense']
+
+
+def exposure_matrix(positions, layout='csr'):
+    """
+    Reshape a columnar PortfolioExposure Detail dictionary into an asset x factor exposure matrix
+
+    Sparse layouts only store the exposures present in the report (explicit zeros are kept), the dense layout is a
+    float32 matrix with NaN for missing exposures. Specific Risk is returned as a separate vector.
+
+    :param positions: columnar PortfolioExposure Detail dictionary
+    :type positions:  dict
+    :param layout: 'csr' (default), 'coo' for SciPy sparse matrices (requires scipy) or 'dense'
+    :type layout:  str
+    :return: {'Asset ID', 'Asset ID Type', 'Factor', 'Exposure', 'Specific Risk'} dictionary where 'Asset ID' and
+     'Asset ID Type' index the rows of 'Exposure' and 'Factor' its columns
+    :rtype: dict
+    """
+    if layout not in MATRIX_LAYOUTS:
+        raise ValueError('Invalid exposure matrix layout %s, must be one of %s' % (layout, MATRIX_LAYOUTS))
+
+    asset_ids = positions['Asset ID']
+    factors = [i for i in positions.keys() if i not in ['Asset ID', 'Asset ID Type', 'Specific Risk']]
+
+    dtype = np.float32 if layout == 'dense' else np.float64
+    exposures = np.empty((len(asset_ids), len(factors)), dtype=dtype)
+    for factor_num, this_factor in enumerate(factors):
+        exposures[:, factor_num] = positions[this_factor]
+
+    if layout != 'dense':
+        from scipy import sparse
+
+        present = ~np.isnan(exposures)
+        asset_idx, factor_idx = np.nonzero(present)
+        exposures = sparse.coo_matrix((exposures[present], (asset_idx, factor_idx)), shape=exposures.shape)
+        if layout == 'csr':
+            exposures = exposures.tocsr()
+
+    return {'Asset ID': asset_ids,
+            'Asset ID Type': positions['Asset ID Type'],
+            'Factor': np.asarray(factors, dtype=object),
+            'Exposure': exposures,
+            'Specific Risk': np.asarray(positions['Specific Risk'], dtype=np.float64)}
+
+
+def read_mpc_matrix_file(f, filename, delimiter=',', packed=False):
+    """
+    Parse an MPC correlation/covariance report file straight into a NumPy matrix
+
+    The leading label columns of the report are recognised by matching the label of the first matrix row against the
+    column names, the remaining columns are the assets. Duplicated asset names are kept apart by appending '-1', '-2',
+    ... as in readReport, so 'Assets' is a stable index of both the rows and the columns of the matrix.
+
+    :param f: text stream over the report file
+    :type f:  file-like object
+    :param filename: name of the report file inside the export set archive
+    :type filename:  str
+    :param delimiter: column delimiter
+    :type delimiter:  str
+    :param packed: If True, return the upper triangle of the matrix row by row in a 1-d array of length n(n+1)/2,
+     see unpack_upper. Default = False
+    :type packed: boolean
+    :return: {'Header', 'Assets', 'Matrix', 'Packed', 'Filename'} dictionary
+    :rtype: dict
+    """
+    header = {}
+    num_header_columns = 0
+    columns = None
+    num_label_columns = None
+    num_assets = 0
+    matrix = None
+    row_num = 0
+
+    for this_line in csv.reader(f, delimiter=delimiter):
+
+        if not this_line:
+            continue  # skip over empty rows
+
+        if not num_header_columns:
+            num_header_columns = len(this_line)
+
+        if columns is None:
+            if len(this_line) <= num_header_columns:
+                # still reading headers
+                if num_header_columns == 2:
+                    header[this_line[0].replace(':', '')] = this_line[1].strip() if len(this_line) > 1 else ''
+                continue
+
+            # number of columns has changed, we are looking at the column row
+            columns = [x.strip() for x in this_line]
+            continue
+
+        fields = [x.strip() for x in this_line]
+
+        if matrix is None:
+            # the first matrix row is labelled with the first asset, which tells us where the asset columns start
+            try:
+                num_label_columns = columns.index(fields[0], 1)
+            except ValueError:
+                num_label_columns = 1
+            num_assets = len(columns) - num_label_columns
+            if packed:
+                matrix = np.empty(num_assets * (num_assets + 1) // 2, dtype=np.float64)
+            else:
+                matrix = np.empty((num_assets, num_assets), dtype=np.float64)
+
+        if row_num >= num_assets:
+            raise ValueError('%s: more matrix rows than the %i asset columns' % (filename, num_assets))
+
+        values = parse_column(fields[num_label_columns:num_label_columns + num_assets])
+        if values.dtype != np.float64 or len(values) != num_assets:
+            raise ValueError('%s: row %i is not a numeric row of %i values' % (filename, row_num + 1, num_assets))
+
+        if packed:
+            offset = row_num * num_assets - row_num * (row_num - 1) // 2
+            matrix[offset:offset + num_assets - row_num] = values[row_num:]
+        else:
+            matrix[row_num] = values
+        row_num += 1
+
+    if matrix is None:
+        matrix = np.empty(0 if packed else (0, 0), dtype=np.float64)
+    elif row_num != num_assets:
+        raise ValueError('%s: %i matrix rows for %i asset columns' % (filename, row_num, num_assets))
+
+    assets = rename_duplicate_columns(columns[num_label_columns:]) if columns is not None else []
+
+    return {'Header': header, 'Assets': np.asarray(assets, dtype=object), 'Matrix': matrix, 'Packed': packed,
+            'Filename': filename}
+
+
+def unpack_upper(packed_matrix):
+    """
+    Expand a packed upper-triangular matrix, as returned by read_mpc_matrix_file, into a full symmetric matrix
+
+    :param packed_matrix: upper triangle stored row by row
+    :type packed_matrix:  numpy.ndarray
+    :return: n x n symmetric matrix
+    :rtype: numpy.ndarray
+    """
+    num_assets = int((np.sqrt(8 * len(packed_matrix) + 1) - 1) // 2)
+    matrix = np.empty((num_assets, num_assets), dtype=packed_matrix.dtype)
+    upper = np.triu_indices(num_assets)
+    matrix[upper] = packed_matrix
+    matrix.T[upper] = packed_matrix
+    return matrix
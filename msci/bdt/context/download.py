@@ -0,0 +1,96 @@
+"""
+Streaming retrieval of the base64 encoded binary data returned by the BDT service.
+
+Instead of letting suds read the whole SOAP reply, build an XML tree and return the base64 text, the reply is fed
+chunk by chunk to a SAX parser and the content of the BinaryData element is base64 decoded as it arrives, straight
+into a file object. Memory use is bounded by the chunk size rather than by the size of the export.
+
+"""
+import base64
+import xml.sax
+from xml.sax.handler import ContentHandler, feature_namespaces
+
+
+class Base64Writer(object):
+    """
+    Incremental base64 decoder writing the decoded bytes to a file object
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.pending = ''
+        self.bytes_written = 0
+
+    def write(self, text):
+        # base64 can only be decoded in blocks of 4 characters, the remainder waits for the next chunk
+        data = self.pending + ''.join(text.split())
+        block_end = len(data) - len(data) % 4
+        self.pending = data[block_end:]
+        if block_end:
+            self.bytes_written += self.fileobj.write(base64.b64decode(data[:block_end]))
+
+    def close(self):
+        if self.pending:
+            # let b64decode raise on the truncated input
+            self.bytes_written += self.fileobj.write(base64.b64decode(self.pending))
+            self.pending = ''
+
+
+class BinaryDataHandler(ContentHandler):
+    """
+    SAX handler passing the text of a single element to a Base64Writer
+    """
+
+    def __init__(self, writer, element='BinaryData'):
+        ContentHandler.__init__(self)
+        self.writer = writer
+        self.element = element
+        self.in_element = False
+        self.found = False
+
+    def startElementNS(self, name, qname, attrs):
+        if name[1] == self.element:
+            self.in_element = True
+            self.found = True
+
+    def endElementNS(self, name, qname):
+        if name[1] == self.element:
+            self.in_element = False
+
+    def characters(self, content):
+        if self.in_element:
+            self.writer.write(content)
+
+
+def stream_binary_data(reply, fileobj, element='BinaryData', chunk_size=1 << 16):
+    """
+    Decode the base64 content of an element of a SOAP reply into a file object, one chunk at a time
+
+    :param reply: file-like SOAP reply, e.g. the open HTTP response
+    :type reply:  file-like object
+    :param fileobj: binary file object to write the decoded data to
+    :type fileobj:  file-like object
+    :param element: local name of the element holding the base64 data (BinaryData default)
+    :type element:  str
+    :param chunk_size: number of bytes read from the reply at a time
+    :type chunk_size:  int
+    :return: number of decoded bytes written, or None if the element was not found in the reply
+    :rtype: int
+    """
+    writer = Base64Writer(fileobj)
+    handler = BinaryDataHandler(writer, element)
+
+    parser = xml.sax.make_parser()
+    parser.setFeature(feature_namespaces, True)
+    parser.setContentHandler(handler)
+
+    chunk = reply.read(chunk_size)
+    while chunk:
+        parser.feed(chunk)
+        chunk = reply.read(chunk_size)
+    parser.close()
+    writer.close()
+
+    if not handler.found:
+        return None
+    return writer.bytes_written
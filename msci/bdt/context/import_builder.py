@@ -0,0 +1,161 @@
+"""
+Bulk serialization of SubmitImportJob requests.
+
+suds marshals an import by building a factory object per position and per MID, then an XML tree of the whole request.
+For large portfolios most of the time goes there. Instead, the request is marshalled by suds with a single prototype
+position per portfolio whose attributes are sentinel values. The XML of the prototype is compiled into a template,
+which is then filled with the rendered columns of the positions. Values are rendered with the same XSD translation,
+string conversion and escaping as suds, so that the request is identical to the one suds builds.
+
+"""
+import re
+from itertools import count, islice
+
+from suds import tostr
+from suds.sax.enc import Encoder
+
+SENTINEL = 'BDTIMPORTVALUE%dX'
+SENTINEL_RE = re.compile(r'BDTIMPORTVALUE(\d+)X')
+POSITION_START_RE = re.compile(r'<((?:[\w.-]+:)?)Position\b')
+
+encoder = Encoder()
+
+
+def render_attribute(attribute_open, values, xsd_type, size):
+    """
+    Render an attribute for a column of values as suds does, empty for None and empty values
+
+    :param attribute_open: the attribute start, e.g. ' Holdings="'
+    :type attribute_open:  str
+    :param values: the column of values
+    :param xsd_type: the resolved XSD type of the attribute
+    :param size: number of values to render
+    :type size:  int
+    :rtype: list[str]
+    """
+    translate = xsd_type.translate
+    encode = encoder.encode
+    cells = []
+    for value in islice(values, size):
+        if value is not None:
+            value = tostr(translate(value, False))
+        cells.append(attribute_open + encode(value) + '"' if value else '')
+    return cells
+
+
+class PositionTemplate(object):
+    """
+    Compiled XML of a prototype position, with a sentinel for each of its attribute values
+    """
+
+    def __init__(self, fragment):
+        """
+        :param fragment: XML of the prototype position
+        :type fragment:  str
+        """
+        parts = SENTINEL_RE.split(fragment)
+        self.sentinels = []
+        self.attribute_opens = []
+        literals = [parts[0]]
+        for i in range(1, len(parts), 2):
+            # each sentinel is an attribute value: the literal before ends with ' Name="', the one after starts with '"'
+            before = literals[-1]
+            start = before.rindex(' ')
+            literals[-1] = before[:start]
+            self.attribute_opens.append(before[start:])
+            self.sentinels.append(int(parts[i]))
+            literals.append(parts[i + 1][1:])
+        self.format = '{}'.join(literal.replace('{', '{{').replace('}', '}}') for literal in literals)
+
+    def render(self, columns, size):
+        """
+        Return the XML of the positions
+
+        :param columns: sentinel -> (values, resolved XSD type) of the position attributes
+        :type columns:  dict
+        :param size: number of positions
+        :type size:  int
+        :rtype: str
+        """
+        cells = [render_attribute(attribute_open, columns[sentinel][0], columns[sentinel][1], size)
+                 for sentinel, attribute_open in zip(self.sentinels, self.attribute_opens)]
+        if not cells:
+            return self.format * size
+        return ''.join(map(self.format.format, *cells))
+
+
+def build_import_envelope(client, port_list, job_name):
+    """
+    Return the SubmitImportJob request for the portfolios, byte for byte as suds would build it
+
+    :param client: the client, see _CommonClient.submitPortfolioImportJob for the portfolios
+    :type client:  msci.bdt.context._CommonClient._CommonClient
+    :param port_list: a list of dictionaries, one for each portfolio being imported
+    :type port_list:  list[dict]
+    :param job_name: name of the import job
+    :type job_name:  str
+    :return: the SOAP envelope
+    :rtype: bytes
+    """
+    sentinels = count()
+    portfolios = []
+    prototypes = []
+    for this_port in client._valid_import_portfolios(port_list):
+        port = client._import_portfolio(this_port)
+        positions = this_port['Positions']
+        pos_list = client.factory.create('Positions')
+        pos_list.Position = []
+
+        size = min(len(positions['id']), len(positions['idtype']))
+        if size:
+            pos = client.factory.create('Position')
+            pos_type = pos.__metadata__.sxtype
+            columns = {}
+            for col_name, col_values in positions.items():
+                if hasattr(pos, '_' + col_name):
+                    if len(col_values) < size:
+                        # as indexing the column for each position would
+                        raise IndexError('Column %s of portfolio %s has %i values for %i positions'
+                                         % (col_name, this_port['PortfolioName'], len(col_values), size))
+                    sentinel = next(sentinels)
+                    setattr(pos, '_' + col_name, SENTINEL % sentinel)
+                    columns[sentinel] = (col_values, pos_type.get_attribute(col_name)[0].resolve())
+
+            mid = client.factory.create('MID')
+            mid_type = mid.__metadata__.sxtype
+            for attr_name, col_name in (('ID', 'id'), ('IDType', 'idtype')):
+                sentinel = next(sentinels)
+                setattr(mid, '_' + attr_name, SENTINEL % sentinel)
+                columns[sentinel] = (positions[col_name], mid_type.get_attribute(attr_name)[0].resolve())
+            pos.MID = mid
+            pos_list.Position.append(pos)
+            prototypes.append((columns, size))
+
+        port.Positions = pos_list
+        portfolios.append(port)
+
+    if not portfolios:
+        # no valid portfolios found
+        raise Exception('No valid portfolios found to import - check warnings for more details')
+
+    method = client.client.service.SubmitImportJob.method
+    envelope = method.binding.input.get_message(method, (client.user_id, client.client_id, client.password),
+                                                {'JobName': job_name, 'Portfolio': portfolios}).plain()
+
+    pieces = []
+    end = 0
+    for columns, size in prototypes:
+        sentinel_positions = [envelope.index(SENTINEL % sentinel, end) for sentinel in columns]
+        first, last = min(sentinel_positions), max(sentinel_positions)
+        start_tag = None
+        for start_tag in POSITION_START_RE.finditer(envelope, end, first):
+            pass
+        start = start_tag.start()
+        closing = '</%sPosition>' % start_tag.group(1)
+        stop = envelope.index(closing, last) + len(closing)
+
+        pieces.append(envelope[end:start])
+        pieces.append(PositionTemplate(envelope[start:stop]).render(columns, size))
+        end = stop
+    pieces.append(envelope[end:])
+    return ''.join(pieces).encode('utf-8')
@@ -0,0 +1,150 @@
+"""
+Columnar parsing of import job logs.
+
+The GetImportJobLog reply is streamed through a SAX parser which appends the attributes of each ImportLogGroup and
+ImportLogDetail element straight to column lists, instead of letting suds build an object per log line. Repeated
+strings (result codes, messages) are interned so that each distinct value is held once. The columns are then
+converted to NumPy arrays according to the XSD types of the attributes.
+
+"""
+import xml.sax
+from collections import Counter
+from xml.sax.handler import ContentHandler, feature_namespaces
+
+import numpy as np
+from suds.xsd.sxbuiltin import XBoolean, XDecimal, XFloat, XInteger, XLong
+
+GROUP_ELEMENT = 'ImportLogGroup'
+DETAIL_ELEMENT = 'ImportLogDetail'
+
+
+class ColumnBuilder(object):
+    """
+    Dictionary of column lists, appended one row of attributes at a time, missing values being None
+    """
+
+    def __init__(self):
+        self.columns = {'Job': []}
+        self.num_rows = 0
+
+    def append(self, job, values):
+        self.columns['Job'].append(job)
+        for key, value in values:
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.num_rows
+            column.append(value)
+        self.num_rows += 1
+        for column in self.columns.values():
+            if len(column) < self.num_rows:
+                column.append(None)
+
+
+class ImportLogHandler(ContentHandler):
+    """
+    SAX handler collecting the import log groups and details, or only counting the details per ResultCode
+    """
+
+    def __init__(self, first_job=1, details=True):
+        ContentHandler.__init__(self)
+        self.groups = ColumnBuilder()
+        self.details = ColumnBuilder() if details else None
+        self.result_codes = Counter()
+        self.job = first_job - 1
+        self.strings = {}
+
+    def _values(self, attrs):
+        intern = self.strings.setdefault
+        return [(name[1], intern(value, value)) for name, value in attrs.items()]
+
+    def startElementNS(self, name, qname, attrs):
+        if name[1] == DETAIL_ELEMENT:
+            if self.details is not None:
+                self.details.append(self.job, self._values(attrs))
+            else:
+                self.result_codes[attrs.get((None, 'ResultCode'))] += 1
+        elif name[1] == GROUP_ELEMENT:
+            self.job += 1
+            self.groups.append(self.job, self._values(attrs))
+
+
+def to_array(values, xsd_type=None):
+    """
+    Convert a column of attribute strings to a NumPy array according to its XSD type: numbers (NaN for missing
+    values) and booleans are converted, other columns are object arrays of the strings. Boolean columns with missing
+    values are object arrays of True, False and None, so that missing values are not read as False.
+    """
+    if isinstance(xsd_type, (XInteger, XLong)) and None not in values:
+        return np.array(values, dtype=np.int64)
+    if isinstance(xsd_type, (XInteger, XLong, XFloat, XDecimal)):
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    if isinstance(xsd_type, XBoolean):
+        if None not in values:
+            return np.array([v in ('true', '1') for v in values], dtype=bool)
+        values = [None if v is None else v in ('true', '1') for v in values]
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def to_counter(counts, xsd_type=None):
+    """
+    Convert the keys of a Counter of attribute strings according to their XSD type, as to_array converts the values of
+    a column, missing values being counted under None
+    """
+    keys = [key for key in counts if key is not None]
+    converted = Counter()
+    for key, value in zip(keys, to_array(keys, xsd_type).tolist()):
+        converted[value] += counts[key]
+    if None in counts:
+        converted[None] += counts[None]
+    return converted
+
+
+def to_arrays(columns, xsd_types):
+    arrays = {}
+    for key, values in columns.items():
+        if key == 'Job':
+            arrays[key] = np.array(values, dtype=np.int64)
+        else:
+            arrays[key] = to_array(values, xsd_types.get(key))
+    return arrays
+
+
+def read_import_log(reply, xsd_types=None, first_job=1, summary_only=False, chunk_size=1 << 16):
+    """
+    Parse a GetImportJobLog SOAP reply into columns
+
+    :param reply: file-like SOAP reply, e.g. the open HTTP response
+    :type reply:  file-like object
+    :param xsd_types: element name -> attribute name -> resolved XSD type, for ImportLogGroup and ImportLogDetail
+    :type xsd_types:  dict
+    :param first_job: number of the first log group in the 'Job' column
+    :type first_job:  int
+    :param summary_only: only count the details per ResultCode
+    :type summary_only:  boolean
+    :param chunk_size: number of bytes read from the reply at a time
+    :type chunk_size:  int
+    :return: import_log, and import_detail or, if summary_only, a Counter of the details per ResultCode
+    """
+    if xsd_types is None:
+        xsd_types = {}
+    handler = ImportLogHandler(first_job, details=not summary_only)
+
+    parser = xml.sax.make_parser()
+    parser.setFeature(feature_namespaces, True)
+    parser.setContentHandler(handler)
+    chunk = reply.read(chunk_size)
+    while chunk:
+        parser.feed(chunk)
+        chunk = reply.read(chunk_size)
+    parser.close()
+
+    import_log = to_arrays(handler.groups.columns, xsd_types.get(GROUP_ELEMENT, {}))
+    if 'EffectiveDate' in import_log:
+        # formatted as getImportJobLog does
+        import_log['EffectiveDate'] = to_array([None if v is None else v[:10] for v in import_log['EffectiveDate']])
+    if summary_only:
+        # keyed like the ResultCode column of import_detail
+        return import_log, to_counter(handler.result_codes, xsd_types.get(DETAIL_ELEMENT, {}).get('ResultCode'))
+    return import_log, to_arrays(handler.details.columns, xsd_types.get(DETAIL_ELEMENT, {}))
@@ -0,0 +1,365 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from logging import getLogger
+
+from msci.bdt.context.exceptions import BDTError
+
+
+def get_current_version(client):
+    """
+    Default health check of the service clients: a cheap call which fails if the connection is broken
+    """
+    client.service.GetCurrentVersion()
+
+
+def relogin(client):
+    """
+    Health check of the interactive sessions: log in again, restoring the session state
+    """
+    client.relogin()
+
+
+class ClientPool(object):
+    """
+    Thread safe pool of BDT clients, leased to one thread at a time.
+
+    suds clients cannot be shared between threads, so each worker leases a client for the duration of a task::
+
+        with ClientPool.service(url, user_id, password, client_id, size=8) as pool:
+            with pool.lease() as client:
+                client.getPortfolioExposureReports(job_id)
+
+    The clients are created upfront. A client whose lease ends with an exception other than a BDTError (a job
+    failure reported by the server), or which has been idle for longer than check_interval, is health checked and
+    recycled (terminated and replaced) if the check fails.
+    """
+
+    # keyword arguments of the classmethods passed to the pool instead of the client
+    POOL_OPTIONS = ('health_check', 'check_interval')
+
+    def __init__(self, factory, size=4, health_check=get_current_version, check_interval=300, logger=None):
+        """
+        :param factory: callable creating a new client, e.g. partial(ServiceClient, url, user_id, password, client_id)
+        :type factory:  callable
+        :param size: number of clients
+        :type size:  int
+        :param health_check: callable raising an exception if the client passed is broken, None to recycle the
+         clients on any exception other than a BDTError
+        :type health_check:  callable
+        :param check_interval: number of seconds after which an idle client is health checked before being leased,
+         None to never check idle clients
+        :type check_interval:  float
+        :param logger: optional logger object
+        :type logger:  logging
+        """
+        self.factory = factory
+        self.size = size
+        self.health_check = health_check
+        self.check_interval = check_interval
+        self.logger = getLogger(__name__) if logger is None else logger
+
+        self.condition = threading.Condition()
+        # (client, time it was released), most recently released last
+        self.idle = deque()
+        self.num_clients = 0
+        self.closed = False
+
+        # metrics
+        self.waiters = 0
+        self.max_waiters = 0
+        self.leases = 0
+        self.leased = 0
+        self.lease_time = 0.0
+        self.max_lease_time = 0.0
+        self.wait_time = 0.0
+        self.created = 0
+        self.recycled = 0
+
+        try:
+            for _ in range(size):
+                self.num_clients += 1
+                self.idle.append((self._create(), time.monotonic()))
+        except Exception:
+            self.close()
+            raise
+
+    @classmethod
+    def service(cls, url, user_id, password, client_id, size=4, logger=None, timeout=50000, **kwargs):
+        """
+        Return a pool of ServiceClient, see ServiceClient for the arguments and __init__ for the pool settings
+        """
+        from msci.bdt.context.ServiceClient import ServiceClient
+        pool_kwargs = {k: kwargs.pop(k) for k in cls.POOL_OPTIONS if k in kwargs}
+        return cls(partial(ServiceClient, url, user_id, password, client_id, logger, timeout, **kwargs), size,
+                   logger=logger, **pool_kwargs)
+
+    @classmethod
+    def interactive(cls, url, user_id, password, client_id, size=4, logger=None, timeout=50000, **kwargs):
+        """
+        Return a pool of logged in InteractiveClient, see InteractiveClient for the arguments and __init__ for the
+        pool settings. The sessions are health checked by logging them in again.
+        """
+        from msci.bdt.context.InteractiveClient import InteractiveClient
+        pool_kwargs = {k: kwargs.pop(k) for k in cls.POOL_OPTIONS if k in kwargs}
+        pool_kwargs.setdefault('health_check', relogin)
+        return cls(partial(InteractiveClient, url, user_id, password, client_id, logger, timeout, **kwargs), size,
+                   logger=logger, **pool_kwargs)
+
+    def _create(self):
+        """
+        Create a client in a slot reserved by the caller, freeing the slot if the factory fails
+        """
+        try:
+            client = self.factory()
+        except Exception:
+            with self.condition:
+                self.num_clients -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created += 1
+        return client
+
+    def _discard(self, client, broken=False):
+        """
+        Terminate a client and free its slot, to be filled by a new client on demand
+        """
+        with self.condition:
+            self.num_clients -= 1
+            self.recycled += broken
+            self.condition.notify()
+        try:
+            client.terminate()
+        except Exception as e:
+            self.logger.warning('Unable to terminate client: %s' % e)
+
+    def _is_healthy(self, client):
+        if self.health_check is None:
+            return False
+        try:
+            self.health_check(client)
+        except Exception as e:
+            self.logger.warning('Client failed health check: %s' % e)
+            return False
+        return True
+
+    def acquire(self, timeout=None):
+        """
+        Return an idle client, creating one if a slot is free, waiting for one to be released otherwise
+
+        :param timeout: maximum number of seconds to wait
+        :type timeout:  float
+        :raises BDTError: if no client was available within timeout, or the pool is closed
+        """
+        start = time.monotonic()
+        while True:
+            with self.condition:
+                if self.closed:
+                    raise BDTError('The client pool is closed')
+                if not self.idle and self.num_clients >= self.size:
+                    self.waiters += 1
+                    self.max_waiters = max(self.max_waiters, self.waiters)
+                    try:
+                        remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                        if remaining is not None and remaining <= 0 or not self.condition.wait(remaining):
+                            raise BDTError('No client available in the pool after %s seconds' % timeout)
+                    finally:
+                        self.waiters -= 1
+                    continue
+                entry = self.idle.pop() if self.idle else None
+                if entry is None:
+                    # reserve the slot, so that concurrent acquirers do not create more than size clients
+                    self.num_clients += 1
+
+            if entry is None:
+                client = self._create()
+            else:
+                client, released = entry
+                if self.check_interval is not None and time.monotonic() - released > self.check_interval \
+                        and not self._is_healthy(client):
+                    self._discard(client, broken=True)
+                    continue
+
+            with self.condition:
+                self.leased += 1
+                self.leases += 1
+                self.wait_time += time.monotonic() - start
+            return client
+
+    def release(self, client, broken=False):
+        """
+        Return a leased client to the pool, recycling it if broken
+        """
+        with self.condition:
+            self.leased -= 1
+        self._put_back(client, broken)
+
+    def _put_back(self, client, broken=False):
+        with self.condition:
+            if not broken and not self.closed:
+                self.idle.append((client, time.monotonic()))
+                self.condition.notify()
+                return
+        self._discard(client, broken)
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        Context manager leasing a client, see acquire
+
+        :param timeout: maximum number of seconds to wait for a client
+        :type timeout:  float
+        """
+        client = self.acquire(timeout)
+        start = time.monotonic()
+        broken = False
+        try:
+            yield client
+        except BDTError:
+            raise
+        except Exception:
+            broken = not self._is_healthy(client)
+            raise
+        finally:
+            lease_time = time.monotonic() - start
+            with self.condition:
+                self.lease_time += lease_time
+                self.max_lease_time = max(self.max_lease_time, lease_time)
+            self.release(client, broken)
+
+    def metrics(self):
+        """
+        Return the pool metrics
+
+        :rtype: dict
+        """
+        with self.condition:
+            return {
+                'Size': self.size,
+                'Clients': self.num_clients,
+                'Idle': len(self.idle),
+                'Leased': self.leased,
+                'Waiters': self.waiters,
+                'MaxWaiters': self.max_waiters,
+                'Leases': self.leases,
+                'MeanLeaseTime': self.lease_time / self.leases if self.leases else None,
+                'MaxLeaseTime': self.max_lease_time,
+                'MeanWaitTime': self.wait_time / self.leases if self.leases else None,
+                'Created': self.created,
+                'Recycled': self.recycled,
+            }
+
+    def close(self):
+        """
+        Terminate the idle clients, the leased ones being terminated when released
+        """
+        with self.condition:
+            self.closed = True
+            idle = [client for client, _ in self.idle]
+            self.idle.clear()
+            self.condition.notify_all()
+        for client in idle:
+            self._discard(client)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+class SessionPool(ClientPool):
+    """
+    Pool of logged in InteractiveClient sessions, kept warm so that short interactive queries do not pay a login::
+
+        with SessionPool.interactive(url, user_id, password, client_id, size=4) as pool:
+            with pool.lease() as client:
+                client.download_pos_report(cols)
+
+    A background thread logs in again the idle sessions approaching their expiry (see
+    InteractiveClient.session_lifetime), as does a lease of such a session. Sessions expiring anyway are logged in
+    again by InteractiveClient on the first call failing, the session state (analysis date, model, current
+    portfolio) being replayed in both cases.
+    """
+
+    POOL_OPTIONS = ClientPool.POOL_OPTIONS + ('refresh_interval',)
+
+    def __init__(self, factory, size=4, refresh_interval=30, health_check=relogin, check_interval=None, logger=None):
+        """
+        :param factory: callable creating a new InteractiveClient
+        :type factory:  callable
+        :param size: number of sessions
+        :type size:  int
+        :param refresh_interval: number of seconds between two checks of the idle sessions approaching expiry
+        :type refresh_interval:  float
+        :param health_check: see ClientPool, by default a session failing a call is logged in again
+        :type health_check:  callable
+        :param check_interval: see ClientPool
+        :type check_interval:  float
+        :param logger: optional logger object
+        :type logger:  logging
+        """
+        ClientPool.__init__(self, factory, size, health_check, check_interval, logger)
+        self.refresh_interval = refresh_interval
+        self.refreshed = 0
+        self.stopping = threading.Event()
+        self.refresher = threading.Thread(target=self._refresh_loop, name='bdt-session-refresh', daemon=True)
+        self.refresher.start()
+
+    def _refresh_loop(self):
+        while not self.stopping.wait(self.refresh_interval):
+            self.refresh()
+
+    def _relogin(self, client):
+        """
+        Log a session in again, returning False if it failed
+        """
+        try:
+            client.relogin()
+        except Exception as e:
+            self.logger.warning('Unable to refresh session: %s' % e)
+            return False
+        with self.condition:
+            self.refreshed += 1
+        return True
+
+    def refresh(self):
+        """
+        Log in again the idle sessions approaching their expiry
+        """
+        with self.condition:
+            expiring = [entry for entry in self.idle if entry[0].session_expiring()]
+            for entry in expiring:
+                self.idle.remove(entry)
+        for client, _ in expiring:
+            self._put_back(client, broken=not self._relogin(client))
+
+    def acquire(self, timeout=None):
+        """
+        Return an idle session, logged in again first if it approaches its expiry, see ClientPool.acquire
+        """
+        while True:
+            client = ClientPool.acquire(self, timeout)
+            if not client.session_expiring() or self._relogin(client):
+                return client
+            self.release(client, broken=True)
+
+    def metrics(self):
+        """
+        Return the pool metrics, see ClientPool.metrics, and the number of sessions refreshed
+
+        :rtype: dict
+        """
+        metrics = ClientPool.metrics(self)
+        metrics['Refreshed'] = self.refreshed
+        return metrics
+
+    def close(self):
+        """
+        Stop refreshing the sessions and log out the idle ones, the leased ones being logged out when released
+        """
+        self.stopping.set()
+        ClientPool.close(self)
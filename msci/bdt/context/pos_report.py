@@ -0,0 +1,282 @@
+"""
+Columnar parsing of interactive positions reports.
+
+The GetPositionsReport reply is read with an incremental parser (lxml if installed, the ElementTree C parser
+otherwise), and the Val attribute of the cells of each row is appended straight to the list of its column, instead of
+letting suds build an object per row and per cell. Each row is cleared once read, so that memory does not grow with
+the size of the report, and the parsing stops at the total row when only the total is requested.
+
+The columns are then converted according to a ReportSchema: numeric columns to float64 arrays, in a single
+vectorized conversion per column, and text columns to object arrays of interned strings.
+
+"""
+from warnings import warn
+
+import numpy as np
+
+try:
+    from lxml.etree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+
+TRUE_VALUES = ('true', '1')
+
+NUMERIC = 'Numeric'
+TEXT = 'Text'
+
+
+def to_float64(values):
+    """
+    Convert a column of strings to a float64 array, NaN for missing values (None, '' or 'N/A')
+
+    :raises ValueError: if a value is neither missing nor a number
+    """
+    array = np.array(values, dtype=object)
+    array[np.equal(array, None) | np.equal(array, '') | np.equal(array, 'N/A')] = np.nan
+    try:
+        return array.astype(np.float64)
+    except (TypeError, ValueError):
+        for value in array:
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                raise ValueError('%r is not a number' % value)
+        raise
+
+
+def to_text(values, strings=None):
+    """
+    Convert a column of strings to an object array, each distinct string being held once
+    """
+    intern = ({} if strings is None else strings).setdefault
+    array = np.empty(len(values), dtype=object)
+    array[:] = [value if value is None else intern(value, value) for value in values]
+    return array
+
+
+class ReportSchema(object):
+    """
+    Registry of the types of the positions report columns.
+
+    A column is converted with the converter registered for its name, or else for its data type in the column
+    definition of the report, or else as text. Converters are NUMERIC, TEXT or a callable taking the list of the
+    cell values (strings, None if missing) and returning the converted column::
+
+        InteractiveClient.pos_report_schema.register('Custom Score', NUMERIC)
+        InteractiveClient.pos_report_schema.register('Maturity Date', lambda values: np.array(values, 'datetime64[D]'))
+    """
+
+    # attributes of the column definitions which may hold the data type of the column
+    TYPE_ATTRIBUTES = ('DataType', 'Type')
+
+    def __init__(self, columns=None, data_types=None):
+        """
+        :param columns: 'Numeric' and 'Text' -> list of column names, as BDTClient.POS_REPORT_COLS
+        :type columns:  dict
+        :param data_types: data type of the column definitions -> converter
+        :type data_types:  dict
+        """
+        self.columns = {}
+        self.data_types = {}
+        for kind, names in (columns or {}).items():
+            for name in names:
+                self.register(name, kind)
+        for data_type, converter in (data_types or {}).items():
+            self.register_data_type(data_type, converter)
+
+    def register(self, name, converter):
+        """
+        Register the converter of a column
+
+        :param name: column name
+        :type name:  str
+        :param converter: NUMERIC, TEXT or a callable
+        """
+        self.columns[name] = converter
+
+    def register_data_type(self, data_type, converter):
+        """
+        Register the converter of the columns of a data type, for the columns not registered by name
+
+        :param data_type: data type of the column definition, case insensitive
+        :type data_type:  str
+        :param converter: NUMERIC, TEXT or a callable
+        """
+        self.data_types[data_type.lower()] = converter
+
+    def converter(self, name, definition=None):
+        """
+        Return the converter of a column
+
+        :param name: column name
+        :type name:  str
+        :param definition: attributes of the column definition
+        :type definition:  dict
+        """
+        converter = self.columns.get(name)
+        if converter is None and definition:
+            for attribute in self.TYPE_ATTRIBUTES:
+                data_type = definition.get(attribute)
+                if data_type:
+                    converter = self.data_types.get(str(data_type).lower())
+                    if converter is not None:
+                        break
+        return TEXT if converter is None else converter
+
+    def convert(self, columns, definitions=None):
+        """
+        Convert the columns of a report
+
+        :param columns: column name -> list of the cell values
+        :type columns:  dict
+        :param definitions: column name -> attributes of its column definition
+        :type definitions:  dict
+        :rtype: dict
+        """
+        definitions = definitions or {}
+        strings = {}
+        converted = {}
+        for name, values in columns.items():
+            converter = self.converter(name, definitions.get(name))
+            if converter == NUMERIC:
+                try:
+                    converted[name] = to_float64(values)
+                except ValueError as e:
+                    # as for the reports of the export sets, a column is numeric only if all its values are numbers
+                    warn('Positions report column %s is kept as text: %s' % (name, e))
+                    converted[name] = to_text(values, strings)
+            elif converter == TEXT:
+                converted[name] = to_text(values, strings)
+            else:
+                converted[name] = converter(values)
+        return converted
+
+
+# data types of the column definitions of numeric and text columns
+DEFAULT_DATA_TYPES = dict([(data_type, NUMERIC) for data_type in ('Double', 'Float', 'Decimal', 'Number', 'Numeric',
+                                                                   'Integer', 'Int', 'Long', 'Percent')] +
+                          [(data_type, TEXT) for data_type in ('String', 'Text')])
+
+
+def local_name(tag):
+    return tag[tag.rfind('}') + 1:]
+
+
+class EnvelopeReader(object):
+    """
+    File-like view of the SOAP envelope of a reply, removing the MIME type wrappers around it as LogPlugin does: the
+    bytes before the XML declaration and after the end of the envelope are skipped. A reply without XML declaration
+    is read as it is.
+    """
+
+    START = b'<?xml version'
+    END = b'</S:Envelope>'
+
+    def __init__(self, fp, chunk_size=65536):
+        """
+        :param fp: file-like SOAP reply, e.g. the open HTTP response
+        :type fp:  file-like object
+        :param chunk_size: number of bytes read from the reply at once
+        :type chunk_size:  int
+        """
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.started = False
+        self.ended = False
+        # offset of the buffer from which the end of the envelope is searched
+        self.scanned = 0
+
+    def _fill(self):
+        """
+        Read the next chunk of the reply into the buffer, returning False at the end of the envelope
+        """
+        if self.ended:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.ended = True
+            return False
+        self.buffer += chunk
+        if not self.started:
+            start = self.buffer.find(self.START)
+            if start < 0:
+                return True
+            del self.buffer[:start]
+            self.started = True
+            self.scanned = 0
+        end = self.buffer.find(self.END, self.scanned)
+        if end >= 0:
+            del self.buffer[end + len(self.END):]
+            self.ended = True
+        else:
+            self.scanned = max(0, len(self.buffer) - len(self.END) + 1)
+        return True
+
+    def read(self, size=-1):
+        # the bytes which may be the start of the end of the envelope are held back until it is found
+        hold = len(self.END) - 1
+        while (size is None or size < 0 or len(self.buffer) < size + hold or not self.started) and self._fill():
+            pass
+        available = len(self.buffer) if self.ended else max(0, len(self.buffer) - hold)
+        if size is None or size < 0 or size > available:
+            size = available
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.scanned = max(0, self.scanned - size)
+        return data
+
+
+def read_positions_report(reply, data_rows=True, schema=None):
+    """
+    Parse the first report of a GetPositionsReport SOAP reply into columns, as InteractiveClient.download_pos_report
+    does
+
+    :param reply: file-like SOAP reply, e.g. the open HTTP response, MIME type wrappers being removed
+    :type reply:  file-like object
+    :param data_rows: True to return the position rows, skipping the total rows, False to return the first total row
+    :type data_rows:  boolean
+    :param schema: schema converting the columns, None to return the cell values as they are
+    :type schema:  ReportSchema
+    :return: column name -> list of the cell values, or converted column
+    :rtype: dict
+    """
+    col_names = []
+    definitions = {}
+    columns = None
+    for _, elem in iterparse(EnvelopeReader(reply), events=('end',)):
+        name = local_name(elem.tag)
+        if name == 'Row':
+            if columns is None:
+                columns = [[] for _ in col_names]
+                appends = [column.append for column in columns]
+            is_total = (elem.get('IsTotalRow') or '').strip() in TRUE_VALUES
+            if is_total != data_rows:
+                cells = list(elem)
+                if len(cells) < len(appends):
+                    cells += [None] * (len(appends) - len(cells))
+                for append, cell in zip(appends, cells):
+                    append(None if cell is None else cell.get('Val'))
+                if is_total:
+                    # only the first total row is returned
+                    break
+            elem.clear()
+        elif name == 'ColDefData':
+            if columns is None:
+                col_names.append(elem.get('Name'))
+                definitions[elem.get('Name')] = dict(elem.attrib)
+        elif name == 'ColDefinition':
+            # the first column definition describes the cells
+            if columns is None:
+                columns = [[] for _ in col_names]
+                appends = [column.append for column in columns]
+        elif name == 'Report':
+            # only the first report is read
+            break
+
+    if columns is None:
+        columns = [[] for _ in col_names]
+    columns = dict(zip(col_names, columns))
+    if schema is not None:
+        return schema.convert(columns, definitions)
+    return columns
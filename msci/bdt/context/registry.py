@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+
+
+def freeze(value):
+    """
+    Return a hashable equivalent of an export set definition argument (lists and tuples become tuples, dictionaries
+    sorted tuples of items)
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class ExportSetRegistry(object):
+    """
+    Registry of the export sets created by a client, keyed by their definition.
+
+    An export set is created on the server the first time its definition is requested and reused afterwards, across
+    calls and analysis dates. Export sets idle for longer than ttl seconds, or beyond the max_size most recently used
+    ones, are deleted from the server, and all of them are deleted by clear() when the client is terminated.
+    """
+
+    def __init__(self, client, max_size=64, ttl=None):
+        """
+        :param client: the client used to delete the export sets
+        :type client:  msci.bdt.context.ServiceClient.ServiceClient
+        :param max_size: maximum number of export sets kept on the server
+        :type max_size:  int
+        :param ttl: optional number of seconds after which an unused export set is deleted
+        :type ttl:  float
+        """
+        self.client = client
+        self.max_size = max_size
+        self.ttl = ttl
+        # definition key -> [export set name, last used time], least recently used first
+        self.export_sets = OrderedDict()
+
+    def __len__(self):
+        return len(self.export_sets)
+
+    def __contains__(self, key):
+        return key in self.export_sets
+
+    def get(self, key, create):
+        """
+        Return the name of the export set registered for the definition key, calling create() to create it on the
+        server and return its name if there is none yet.
+
+        :param key: hashable export set definition, see freeze
+        :param create: callable creating the export set and returning its name
+        :type create:  callable
+        :return: the export set name
+        :rtype: str
+        """
+        now = time.monotonic()
+        if key in self.export_sets:
+            self.export_sets.move_to_end(key)
+            entry = self.export_sets[key]
+            entry[1] = now
+            self.evict(now)
+            return entry[0]
+
+        name = create()
+        self.export_sets[key] = [name, now]
+        self.evict(now)
+        return name
+
+    def definition(self, name):
+        """
+        Return the definition key of a registered export set name, None if the name is not registered
+        """
+        for key, (this_name, _) in self.export_sets.items():
+            if this_name == name:
+                return key
+        return None
+
+    def evict(self, now=None):
+        """
+        Delete the export sets idle for longer than ttl and the least recently used ones beyond max_size
+        """
+        if now is None:
+            now = time.monotonic()
+
+        for key, (name, last_used) in list(self.export_sets.items()):
+            expired = self.ttl is not None and now - last_used > self.ttl
+            if expired or len(self.export_sets) > self.max_size:
+                self._delete(key)
+
+    def discard(self, key):
+        """
+        Delete the export set registered for the definition key, if any
+        """
+        if key in self.export_sets:
+            self._delete(key)
+
+    def clear(self):
+        """
+        Delete all the registered export sets from the server
+        """
+        for key in list(self.export_sets):
+            self._delete(key)
+
+    def _delete(self, key):
+        name, _ = self.export_sets.pop(key)
+        try:
+            self.client.deleteExportSet(name)
+        except Exception as e:
+            # the export set may already have been removed on the server, we only log it
+            self.client.logger.warning('Unable to delete Export Set %s: %s' % (name, e))
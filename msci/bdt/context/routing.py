@@ -0,0 +1,357 @@
+"""
+Latency-aware routing of SOAP requests across equivalent BDT endpoints.
+
+An EndpointRouter keeps a window of recent latencies per endpoint, from the requests themselves and from lightweight
+probes, and sends each request to the fastest healthy endpoint. An endpoint failing with a connection error or a
+gateway error is set aside for a while, then probed again in the background.
+
+Idempotent calls (job status, export job download) can be hedged: if no reply came from the chosen endpoint after
+a high percentile of its latency for the same SOAP action, the same request is sent to the next endpoint and the
+first reply is used. The latencies are kept per action, so that a slow download is not compared with status polls.
+
+The endpoints must serve the same accounts and jobs, as any call may be sent to any of them.
+"""
+import copy
+import http.client
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from logging import getLogger
+from urllib.parse import urlsplit, urlunsplit
+
+from suds.transport import Request, TransportError
+
+from msci.bdt.context.transport import IDEMPOTENT_ACTIONS, soap_action
+
+# HTTP statuses meaning the endpoint, rather than the request, is failing
+GATEWAY_ERRORS = (http.client.BAD_GATEWAY, http.client.SERVICE_UNAVAILABLE, http.client.GATEWAY_TIMEOUT)
+
+
+def percentile(values, q):
+    """
+    Return the q-th percentile of the values, by nearest rank
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100.0 * len(values))) - 1))]
+
+
+class EndpointRouter(object):
+    """
+    Choose the endpoint of each request from the latencies measured so far, see the module documentation
+    """
+
+    # SOAP actions safe to send twice, which may be hedged or retried on another endpoint
+    IDEMPOTENT_ACTIONS = IDEMPOTENT_ACTIONS
+    # number of latencies kept per endpoint, and per endpoint and action
+    window = 50
+    # number of seconds after which the endpoints are probed again
+    probe_interval = 60
+    # path requested by the probes, any HTTP reply below 500 meaning the endpoint is up
+    probe_path = '/'
+    # number of seconds an endpoint is set aside after a failure
+    failure_backoff = 30
+    # percentile of the latency of the chosen endpoint after which a hedged request is sent to the next one
+    hedge_percentile = 95
+    # minimum number of latencies of an action before hedging it, the first requests are not hedged
+    min_hedge_samples = 10
+    # number of threads sending the hedged calls, shared by the clients of the router
+    hedge_workers = 32
+
+    # routers shared by the clients, by urls and hedging, so that they learn the latencies together, see shared
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, urls, hedge=False, logger=None):
+        """
+        :param urls: the endpoints, e.g. [URLS['PROD'], URLS['US']]
+        :type urls:  list[str]
+        :param hedge: if True, hedge the idempotent calls
+        :type hedge:  boolean
+        :param logger: optional logger object
+        :type logger:  logging
+        """
+        self.endpoints = [urlunsplit(urlsplit(url)[:2] + ('', '', '')) for url in urls]
+        self.hedge = hedge
+        self.logger = getLogger(__name__) if logger is None else logger
+        self.lock = threading.Lock()
+        self.latencies = {endpoint: deque(maxlen=self.window) for endpoint in self.endpoints}
+        # (endpoint, SOAP action) -> latencies of the requests of the action
+        self.action_latencies = defaultdict(lambda: deque(maxlen=self.window))
+        # endpoint -> time until which it is set aside
+        self.failed_until = {}
+        self.last_probe = None
+        self.probing = False
+        self.requests = {endpoint: 0 for endpoint in self.endpoints}
+        self.hedges = 0
+        self.hedge_wins = 0
+        # probes, apart from the hedged calls so that they neither wait for nor delay them
+        self.executor = ThreadPoolExecutor(max_workers=len(self.endpoints), thread_name_prefix='bdt-router')
+        self.hedge_executor = ThreadPoolExecutor(max_workers=self.hedge_workers, thread_name_prefix='bdt-hedge')
+        # number of clients using a shared router, and its key in _shared
+        self.users = 0
+        self.key = None
+
+    @classmethod
+    def shared(cls, urls, hedge=False, logger=None):
+        """
+        Return the router shared by the clients for these urls and hedging, to be released with release()
+
+        :param urls: the endpoints
+        :type urls:  list[str]
+        :param hedge: if True, hedge the idempotent calls
+        :type hedge:  boolean
+        :param logger: optional logger object
+        :type logger:  logging
+        :rtype: EndpointRouter
+        """
+        key = (tuple(urls), hedge)
+        with cls._shared_lock:
+            router = cls._shared.get(key)
+            if router is None:
+                router = cls._shared[key] = cls(urls, hedge, logger)
+                router.key = key
+            router.users += 1
+        return router
+
+    def release(self):
+        """
+        Release a shared router, closing it once no client uses it
+        """
+        with self._shared_lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            if self._shared.get(self.key) is self:
+                del self._shared[self.key]
+        self.close()
+
+    def record(self, endpoint, latency, action=None):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            if action is not None:
+                self.action_latencies[endpoint, action].append(latency)
+            self.failed_until.pop(endpoint, None)
+
+    def fail(self, endpoint, error):
+        self.logger.warning('Endpoint %s failed: %s' % (endpoint, error))
+        with self.lock:
+            self.failed_until[endpoint] = time.monotonic() + self.failure_backoff
+
+    def ranked(self):
+        """
+        Return the endpoints, healthy ones first, fastest first by median latency, untried ones last
+        """
+        now = time.monotonic()
+        with self.lock:
+            def rank(endpoint):
+                latencies = self.latencies[endpoint]
+                failed = self.failed_until.get(endpoint, 0) > now
+                return failed, not latencies, percentile(latencies, 50) if latencies else 0
+
+            return sorted(self.endpoints, key=rank)
+
+    def hedge_delay(self, endpoint, action):
+        """
+        Return the number of seconds to wait for the endpoint before hedging a request of the SOAP action, None if too
+        few latencies of the action are known
+        """
+        with self.lock:
+            latencies = list(self.action_latencies.get((endpoint, action), ()))
+        if len(latencies) < self.min_hedge_samples:
+            return None
+        return percentile(latencies, self.hedge_percentile)
+
+    def probe(self, transport, endpoint):
+        """
+        Measure the latency of an endpoint with a GET of probe_path
+        """
+        request = Request(endpoint + self.probe_path)
+        try:
+            self.timed_open(transport, request, endpoint).close()
+        except TransportError as e:
+            if e.httpcode not in GATEWAY_ERRORS and (e.httpcode is None or e.httpcode >= 500):
+                self.fail(endpoint, e)
+        except (OSError, http.client.HTTPException):
+            # set aside by timed_open
+            pass
+        except Exception as e:
+            self.fail(endpoint, e)
+
+    def probe_all(self, transport, block=False):
+        """
+        Probe the endpoints if they were not probed within probe_interval, in the background unless block
+        """
+        with self.lock:
+            if self.probing or (self.last_probe is not None and
+                                time.monotonic() - self.last_probe < self.probe_interval):
+                return
+            self.probing = True
+            self.last_probe = time.monotonic()
+        futures = [self.executor.submit(self.probe, transport, endpoint) for endpoint in self.endpoints]
+
+        def done(_):
+            with self.lock:
+                self.probing = not all(f.done() for f in futures)
+
+        for future in futures:
+            future.add_done_callback(done)
+        if block:
+            wait(futures)
+
+    def timed_open(self, transport, request, endpoint, action=None):
+        """
+        Send the request to the endpoint and return the open response, recording the latency to the reply headers,
+        for the SOAP action if given. The request url is moved to the endpoint, keeping its path and query.
+        """
+        url = urlsplit(request.url)
+        request = copy.copy(request)
+        request.url = urlunsplit(urlsplit(endpoint)[:2] + url[2:])
+        start = time.monotonic()
+        try:
+            fp = transport._open(request)
+        except TransportError as e:
+            if e.httpcode in GATEWAY_ERRORS:
+                self.fail(endpoint, e)
+            else:
+                # the endpoint replied, e.g. with a SOAP fault
+                self.record(endpoint, time.monotonic() - start, action)
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            self.fail(endpoint, e)
+            raise
+        self.record(endpoint, time.monotonic() - start, action)
+        return fp
+
+    def routed_open(self, transport, request, endpoint, action):
+        with self.lock:
+            self.requests[endpoint] += 1
+        return self.timed_open(transport, request, endpoint, action)
+
+    def open(self, transport, request):
+        """
+        Send the request to the fastest healthy endpoint and return the open response. Idempotent calls are retried
+        on the next endpoints on failure, and hedged if enabled.
+        """
+        self.probe_all(transport, block=self.last_probe is None)
+        endpoints = self.ranked()
+        action = soap_action(request)
+        if action not in self.IDEMPOTENT_ACTIONS:
+            return self.routed_open(transport, request, endpoints[0], action)
+        if self.hedge:
+            return self._hedged_open(transport, request, endpoints, action)
+
+        for i, endpoint in enumerate(endpoints):
+            try:
+                return self.routed_open(transport, request, endpoint, action)
+            except TransportError as e:
+                if e.httpcode not in GATEWAY_ERRORS or i == len(endpoints) - 1:
+                    raise
+            except (OSError, http.client.HTTPException):
+                if i == len(endpoints) - 1:
+                    raise
+
+    def _hedged_open(self, transport, request, endpoints, action):
+        # future -> (endpoint, event set once the request is sent, or its future done)
+        pending = {}
+        remaining = deque(endpoints)
+
+        def start():
+            endpoint = remaining.popleft()
+            sent = threading.Event()
+            sent.time = None
+
+            def send():
+                sent.time = time.monotonic()
+                sent.set()
+                return self.routed_open(transport, request, endpoint, action)
+
+            future = self.hedge_executor.submit(send)
+            future.add_done_callback(lambda _: sent.set())
+            pending[future] = (endpoint, sent)
+
+        start()
+        first = next(iter(pending))
+        error = None
+        while pending:
+            delay = None
+            if len(pending) == 1 and remaining:
+                endpoint, sent = next(iter(pending.values()))
+                delay = self.hedge_delay(endpoint, action)
+                if delay is not None:
+                    # the time waiting for a thread is not latency of the endpoint
+                    sent.wait()
+                    if sent.time is not None:
+                        delay = max(0.0, delay - (time.monotonic() - sent.time))
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # too slow, hedge on the next endpoint
+                with self.lock:
+                    self.hedges += 1
+                start()
+                continue
+            for future in done:
+                del pending[future]
+                try:
+                    fp = future.result()
+                except TransportError as e:
+                    if e.httpcode not in GATEWAY_ERRORS:
+                        self._discard(pending)
+                        raise
+                    error = e
+                except (OSError, http.client.HTTPException) as e:
+                    error = e
+                else:
+                    if future is not first:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    self._discard(pending)
+                    return fp
+            if not pending and remaining:
+                # failed, try the next endpoint straight away
+                start()
+        raise error
+
+    @staticmethod
+    def _discard(pending):
+        """
+        Close the responses of the requests which lost the race once they arrive
+        """
+        def close(future):
+            if not future.cancelled() and future.exception() is None:
+                future.result().close()
+
+        for future in pending:
+            future.add_done_callback(close)
+
+    def stats(self):
+        """
+        Return the median latency, number of requests and health of each endpoint, its median and hedging percentile
+        latency per SOAP action, and the number of hedged requests and of hedged requests answered first by the hedge
+
+        :rtype: dict
+        """
+        now = time.monotonic()
+        with self.lock:
+            endpoints = {}
+            for endpoint in self.endpoints:
+                latencies = self.latencies[endpoint]
+                endpoints[endpoint] = {
+                    'Median': percentile(latencies, 50) if latencies else None,
+                    'Requests': self.requests[endpoint],
+                    'Healthy': self.failed_until.get(endpoint, 0) <= now,
+                    'Actions': {},
+                }
+            for (endpoint, action), latencies in self.action_latencies.items():
+                endpoints[endpoint]['Actions'][action] = {
+                    'Median': percentile(latencies, 50),
+                    'Percentile': percentile(latencies, self.hedge_percentile),
+                }
+            return {'Endpoints': endpoints, 'Hedges': self.hedges, 'HedgeWins': self.hedge_wins}
+
+    def close(self):
+        """
+        Stop the probe and hedge threads
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.hedge_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,231 @@
+import base64
+import gzip
+import http.client
+import ssl
+import threading
+import time
+import zlib
+from collections import defaultdict, deque
+from io import BytesIO
+
+from suds.transport import Reply, TransportError
 from suds.transport.https import HttpAuthenticated as HttpAuthenticatedSuds
-from urllib.request import ProxyHandler
+from urllib.error import HTTPError
+from urllib.parse import unquote, urljoin, urlsplit
+from urllib.request import ProxyHandler, Request, getproxies, proxy_bypass
+
+# errors raised when sending on a kept-alive connection the server has closed in the meantime
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                           ConnectionAbortedError)
+# redirects followed, see HttpAuthenticated._open
+REDIRECT_STATUSES = (http.client.MOVED_PERMANENTLY, http.client.FOUND, http.client.SEE_OTHER,
+                     http.client.TEMPORARY_REDIRECT, http.client.PERMANENT_REDIRECT)
+# headers of the body, dropped when a redirected POST is sent again as a GET
+CONTENT_HEADERS = ('content-length', 'content-type', 'content-encoding')
+# SOAP actions safe to send twice, e.g. again on a new connection when no reply came
+IDEMPOTENT_ACTIONS = {'GetExportJobStatus', 'GetImportJobStatus', 'GetExportJob', 'GetImportJobLog',
+                      'GetCurrentVersion'}
+
+_default_ssl_context = None
+_default_ssl_context_lock = threading.Lock()
+
+
+def soap_action(request):
+    """
+    Return the name of the SOAP action of a request, e.g. 'GetExportJobStatus', empty if none
+    """
+    action = request.headers.get('SOAPAction', '')
+    if isinstance(action, bytes):
+        action = action.decode('utf-8')
+    return action.strip('"').rsplit(':', 1)[-1].rsplit('/', 1)[-1]
+
+
+def default_ssl_context():
+    """
+    Return the SSL context shared by the transports, created on first use as loading the certificates is slow
+    """
+    global _default_ssl_context
+    with _default_ssl_context_lock:
+        if _default_ssl_context is None:
+            _default_ssl_context = ssl.create_default_context()
+    return _default_ssl_context
+
+
+class ConnectionPool(object):
+    """
+    Thread safe pool of persistent http.client connections, kept per (scheme, host, port, proxy).
+
+    Up to max_size idle connections are kept per key and connections idle for longer than idle_timeout seconds are
+    closed instead of being reused, as servers and proxies drop them on their side.
+    """
+
+    def __init__(self, max_size=4, idle_timeout=60):
+        """
+        :param max_size: maximum number of idle connections kept per host
+        :type max_size:  int
+        :param idle_timeout: number of seconds after which an idle connection is closed
+        :type idle_timeout:  float
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        # key -> deque of (connection, time it was released), most recently released last
+        self.idle = defaultdict(deque)
+
+    def acquire(self, key, connect):
+        """
+        Return an idle connection for the key, or a new one from connect()
+
+        :return: (connection, True if it is a reused connection)
+        """
+        now = time.monotonic()
+        stale = []
+        conn = None
+        with self.lock:
+            idle = self.idle[key]
+            # drop the connections idle for too long, the oldest are first
+            while idle and now - idle[0][1] > self.idle_timeout:
+                stale.append(idle.popleft()[0])
+            if idle:
+                conn = idle.pop()[0]
+        for candidate in stale:
+            candidate.close()
+
+        if conn is not None:
+            return conn, True
+        return connect(), False
+
+    def release(self, key, conn):
+        """
+        Return a connection to the pool once its response has been fully read
+        """
+        with self.lock:
+            idle = self.idle[key]
+            if len(idle) < self.max_size:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self):
+        """
+        Close all the idle connections
+        """
+        with self.lock:
+            connections = [conn for idle in self.idle.values() for conn, _ in idle]
+            self.idle.clear()
+        for conn in connections:
+            conn.close()
+
+
+class PooledResponse(object):
+    """
+    File-like HTTP response which returns its connection to the pool once closed after being read to the end,
+    and closes the connection otherwise.
+
+    gzip and deflate encoded bodies are decompressed as they are read, and the number of bytes received and
+    decoded are reported to the on_read callback.
+    """
+
+    # size of the reads from the connection when decompressing
+    chunk_size = 1 << 16
+
+    def __init__(self, response, release, discard, on_read=None):
+        self.response = response
+        self.headers = response.headers
+        self.status = response.status
+        self.reason = response.reason
+        self._release = release
+        self._discard = discard
+        self._on_read = on_read
+        self.closed = False
+
+        encoding = (response.headers.get('Content-Encoding') or '').strip().lower()
+        if encoding in ('gzip', 'x-gzip'):
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            # zlib wrapped as the RFC says, or raw deflate as some servers send, see _decompress
+            self._decompressor = zlib.decompressobj(zlib.MAX_WBITS)
+        else:
+            self._decompressor = None
+        self._first_chunk = True
+        self._eof = False
+
+    def read(self, size=-1):
+        if self._decompressor is None:
+            if size is None or size < 0:
+                data = self.response.read()
+            else:
+                data = self.response.read(size)
+            self._count(len(data), len(data))
+            return data
+
+        if size is None or size < 0:
+            chunks = []
+            chunk = self._read_decoded(self.chunk_size)
+            while chunk:
+                chunks.append(chunk)
+                chunk = self._read_decoded(self.chunk_size)
+            return b''.join(chunks)
+        return self._read_decoded(size)
+
+    def _read_decoded(self, size):
+        """
+        Return up to size decompressed bytes, only returning no bytes at the end of the body
+        """
+        while True:
+            if self._decompressor.unconsumed_tail:
+                # output left over from the previous read because of the size limit
+                data = self._decompress(self._decompressor.unconsumed_tail, size)
+            elif self._eof:
+                return b''
+            else:
+                raw = self.response.read(self.chunk_size)
+                if not raw:
+                    self._eof = True
+                    data = self._decompressor.flush()
+                    if not self._decompressor.eof:
+                        raise zlib.error('Compressed reply ended before the end of its stream')
+                else:
+                    data = self._decompress(raw, size)
+                    self._count(len(raw), 0)
+            if data:
+                self._count(0, len(data))
+                return data
+
+    def _decompress(self, raw, size):
+        try:
+            return self._decompressor.decompress(raw, size)
+        except zlib.error:
+            if not self._first_chunk or self._decompressor.unused_data:
+                raise
+            # raw deflate stream without zlib header
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(raw, size)
+        finally:
+            self._first_chunk = False
+
+    def _count(self, received, decoded):
+        if self._on_read is not None:
+            self._on_read(received, decoded)
+
+    def info(self):
+        return self.response.info()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.response.isclosed():
+            self._release()
+        else:
+            self.response.close()
+            self._discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 class HttpAuthenticated(HttpAuthenticatedSuds):
@@ -9,7 +235,289 @@ class HttpAuthenticated(HttpAuthenticatedSuds):
        is {} instead of None. This solution improves on
        https://stackoverflow.com/questions/12414600/suds-ignoring-proxy-setting
        by keeping the proxy setting functionality, if needed.
+
+       SOAP calls are sent on persistent connections kept alive in a ConnectionPool, instead of opening a new
+       TCP (and TLS) connection per call through urllib.
     """
 
+    # default maximum number of idle connections kept per host
+    pool_size = 4
+    # default number of seconds after which an idle connection is closed
+    idle_timeout = 60
+    # Accept-Encoding header sent with the requests, None to ask for uncompressed replies
+    accept_encoding = 'gzip, deflate'
+    # maximum number of redirects followed per request, as urllib
+    max_redirects = 10
+
+    def __init__(self, pool_size=None, idle_timeout=None, **kwargs):
+        """
+        :param pool_size: maximum number of idle connections kept per host
+        :type pool_size:  int
+        :param idle_timeout: number of seconds after which an idle connection is closed
+        :type idle_timeout:  float
+        :param kwargs: suds transport options (proxy, timeout, username, password)
+        """
+        HttpAuthenticatedSuds.__init__(self, **kwargs)
+        if pool_size is not None:
+            self.pool_size = pool_size
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        self.pool = ConnectionPool(self.pool_size, self.idle_timeout)
+        # SSL context of the https connections, default_ssl_context() if None
+        self.ssl_context = None
+        self.stats_lock = threading.Lock()
+        # number of reply body bytes received on the wire, and after decompression
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        # url -> (ETag, Last-Modified) of the documents (WSDL, schemas) opened, see WsdlCache
+        self.document_validators = {}
+        # optional msci.bdt.context.routing.EndpointRouter choosing the endpoint of the SOAP requests
+        self.router = None
+
+    def _count_bytes(self, received, decoded):
+        with self.stats_lock:
+            self.bytes_received += received
+            self.bytes_decoded += decoded
+
+    def compressionStats(self):
+        """
+        Return the number of reply bytes received and decoded so far, and the ratio between them
+
+        :rtype: dict
+        """
+        with self.stats_lock:
+            received, decoded = self.bytes_received, self.bytes_decoded
+        return {'Received': received, 'Decoded': decoded, 'Ratio': received / decoded if decoded else None}
+
     def u2handlers(self):
         return [ProxyHandler(self.proxy if self.proxy else None)]
+
+    def open(self, request):
+        """
+        Open a document (WSDL, schema) like suds does, recording its validators
+        """
+        fp = HttpAuthenticatedSuds.open(self, request)
+        self.document_validators[request.url] = (fp.headers.get('ETag'), fp.headers.get('Last-Modified'))
+        return fp
+
+    def revalidate(self, url, etag, last_modified):
+        """
+        Check with a conditional request whether a document is unchanged since it was opened
+
+        :param url: the document url
+        :type url:  str
+        :param etag: ETag received with the document
+        :type etag:  str
+        :param last_modified: Last-Modified received with the document
+        :type last_modified:  str
+        :return: True if the document is unchanged, False if it changed or has no validators
+        :rtype: bool
+        """
+        if not etag and not last_modified:
+            return False
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        self.proxy = self.options.proxy
+        try:
+            fp = self.u2open(Request(url, headers=headers))
+        except HTTPError as e:
+            return e.code == http.client.NOT_MODIFIED
+        # servers ignoring the conditional headers
+        with fp:
+            return (fp.headers.get('ETag'), fp.headers.get('Last-Modified')) == (etag, last_modified)
+
+    def send(self, request):
+        """
+        Send a SOAP request on a pooled connection and return the suds Reply. The body of a 202 or 204 reply is
+        ignored as suds does, its empty message being processed to None.
+        """
+        self.addcredentials(request)
+        with self._route(request) as fp:
+            message = fp.read()
+        if fp.status in (http.client.ACCEPTED, http.client.NO_CONTENT):
+            return Reply(fp.status, fp.headers, b'')
+        return Reply(http.client.OK, fp.headers, message)
+
+    def open_stream(self, request):
+        """
+        Send the request like send(), but return the open HTTP response instead of reading the reply into memory.
+        The caller is responsible for closing the response, which returns the connection to the pool.
+
+        :param request: A suds transport request
+        :type request:  suds.transport.Request
+        :return: the open HTTP response
+        """
+        self.addcredentials(request)
+        return self._route(request)
+
+    def close(self):
+        """
+        Close the idle connections of the pool
+        """
+        self.pool.close()
+
+    def _route(self, request):
+        """
+        Open the request on the endpoint chosen by the router if any
+        """
+        if self.router is None:
+            return self._open(request)
+        return self.router.open(self, request)
+
+    def _open(self, request):
+        """
+        Send the request on a pooled connection, retrying on a new connection if a reused one turns out to have been
+        closed by the server, and return the PooledResponse. A request is only sent again if it failed while being
+        sent, or if it is safe to send twice (document GET, IDEMPOTENT_ACTIONS): the server may have processed a
+        request whose reply was lost.
+
+        Redirects are followed like urllib does, up to max_redirects: a POST redirected with 301, 302 or 303 is sent
+        again as a GET without body, and with 307 or 308 as the same POST. The credentials are not sent to another
+        host.
+
+        Raise TransportError with the body of the reply for HTTP errors, as suds expects for SOAP faults, and for
+        redirects not followed.
+        """
+        headers = dict(request.headers)
+        if self.accept_encoding and 'Accept-Encoding' not in headers:
+            headers['Accept-Encoding'] = self.accept_encoding
+        message = request.message
+        encoding = headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            message = gzip.compress(message)
+        elif encoding == 'deflate':
+            message = zlib.compress(message)
+        self.proxy = self.options.proxy
+        timeout = request.timeout or self.options.timeout
+        retry_lost_reply = message is None or soap_action(request) in IDEMPOTENT_ACTIONS
+
+        url = request.url
+        redirects = 0
+        while True:
+            fp = self._send(url, message, headers, timeout, retry_lost_reply)
+            location = fp.headers.get('Location')
+            if fp.status not in REDIRECT_STATUSES or not location or redirects >= self.max_redirects:
+                break
+            new_url = urljoin(url, location)
+            if urlsplit(new_url).scheme not in ('http', 'https'):
+                break
+            with fp:
+                fp.read()
+            redirects += 1
+            if fp.status != http.client.TEMPORARY_REDIRECT and fp.status != http.client.PERMANENT_REDIRECT:
+                # as urllib does, and a GET is safe to send twice
+                message = None
+                retry_lost_reply = True
+                headers = {k: v for k, v in headers.items() if k.lower() not in CONTENT_HEADERS}
+            if urlsplit(new_url).netloc != urlsplit(url).netloc:
+                headers = {k: v for k, v in headers.items() if k.lower() != 'authorization'}
+            url = new_url
+
+        if fp.status >= 300:
+            with fp:
+                body = fp.read()
+            raise TransportError(fp.reason, fp.status, BytesIO(body))
+        return fp
+
+    def _send(self, request_url, message, headers, timeout, retry_lost_reply):
+        """
+        Send a GET (message None) or POST request on a pooled connection, see _open, and return the PooledResponse
+        whatever its status
+        """
+        u2request = Request(request_url, message, headers)
+        self.addcookies(u2request)
+        headers = dict(headers, **u2request.unredirected_hdrs)
+
+        url = urlsplit(request_url)
+        proxy = self._proxy_for(url)
+        key = (url.scheme, url.hostname, url.port, proxy)
+        if proxy is not None and url.scheme == 'http':
+            # plain http proxies take the absolute url, https goes through a tunnel, see _connect
+            path = request_url
+            headers.update(self._proxy_headers(proxy))
+        else:
+            path = (url.path or '/') + ('?' + url.query if url.query else '')
+
+        while True:
+            conn, reused = self.pool.acquire(key, lambda: self._connect(url, proxy))
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request('POST' if message is not None else 'GET', path, message, headers)
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            try:
+                response = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused and retry_lost_reply:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            break
+
+        self.getcookies(response, u2request)
+        return PooledResponse(response, lambda: self.pool.release(key, conn), conn.close, self._count_bytes)
+
+    def _proxy_for(self, url):
+        """
+        Return the proxy url to use for a request url, from the proxy option or the ``*_proxy`` environment
+        variables, or None for a direct connection
+        """
+        proxies = self.options.proxy or getproxies()
+        proxy = proxies.get(url.scheme)
+        if not proxy or (not self.options.proxy and proxy_bypass(url.hostname)):
+            return None
+        if '://' not in proxy:
+            proxy = 'http://' + proxy
+        return proxy
+
+    def _connect(self, url, proxy):
+        """
+        Return a new connection to the host of the url, through the proxy if any
+        """
+        if proxy is None:
+            if url.scheme == 'https':
+                return http.client.HTTPSConnection(url.hostname, url.port, context=self.ssl_context or default_ssl_context())
+            return http.client.HTTPConnection(url.hostname, url.port)
+
+        proxy_url = urlsplit(proxy)
+        if url.scheme == 'https':
+            # tunnel the TLS connection through the proxy
+            conn = http.client.HTTPSConnection(proxy_url.hostname, proxy_url.port, context=self.ssl_context or default_ssl_context())
+            conn.set_tunnel(url.hostname, url.port, self._proxy_headers(proxy))
+            return conn
+        return http.client.HTTPConnection(proxy_url.hostname, proxy_url.port)
+
+    @staticmethod
+    def _proxy_headers(proxy):
+        """
+        Return the Proxy-Authorization header for the credentials of a proxy url, if any
+        """
+        proxy_url = urlsplit(proxy)
+        if not proxy_url.username:
+            return {}
+        token = '%s:%s' % (unquote(proxy_url.username), unquote(proxy_url.password or ''))
+        return {'Proxy-Authorization': 'Basic ' + base64.b64encode(token.encode('utf-8')).decode('ascii')}
+
+    def __deepcopy__(self, memo={}):
+        clone = HttpAuthenticatedSuds.__deepcopy__(self, memo)
+        # suds clones the transport with the client, keep the pool settings and share the connections
+        clone.pool = self.pool
+        clone.ssl_context = self.ssl_context
+        clone.accept_encoding = self.accept_encoding
+        clone.document_validators = self.document_validators
+        clone.router = self.router
+        return clone
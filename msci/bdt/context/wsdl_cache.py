@@ -0,0 +1,95 @@
+import json
+import os
+import pickle
+import tempfile
+import time
+
+import suds
+from suds.cache import Cache
+
+from msci.bdt.context.cache import private_directory
+
+
+class WsdlCache(Cache):
+    """
+    suds object cache keeping the parsed WSDL definitions of the BDT services, with their imported schemas, on disk
+    where they are shared by the clients of all processes.
+
+    An entry younger than max_age seconds is used as is. An older one is revalidated with a conditional request
+    (ETag / Last-Modified) for each of the documents it was built from, and refreshed if any of them changed or
+    cannot be revalidated.
+
+    The validators of the documents are recorded by the transport when suds fetches them, see
+    msci.bdt.context.transport.HttpAuthenticated.open.
+
+    The folder must be private to the current user, see msci.bdt.context.cache.private_directory.
+    """
+
+    def __init__(self, transport, directory=None, max_age=3600):
+        """
+        :param transport: the transport used to fetch and revalidate the documents
+        :type transport:  msci.bdt.context.transport.HttpAuthenticated
+        :param directory: cache folder, created if needed (a folder of the user in the temporary directory by default)
+        :type directory:  str
+        :param max_age: number of seconds during which an entry is used without being revalidated
+        :type max_age:  float
+        :raises BDTError: if the folder is owned by another user or writable by others
+        """
+        self.transport = transport
+        self.directory = private_directory(directory, 'msci-bdt-wsdl-cache')
+        self.max_age = max_age
+
+    def _paths(self, id):
+        # the pickled objects are only valid for the suds version which created them
+        name = os.path.join(self.directory, 'suds-%s-%s' % (suds.__version__, id))
+        return name + '.pickle', name + '.json'
+
+    def get(self, id):
+        data_path, meta_path = self._paths(id)
+        try:
+            with open(meta_path) as f:
+                validators = json.load(f)
+            age = time.time() - os.path.getmtime(data_path)
+        except (OSError, ValueError):
+            return None
+
+        if age > self.max_age:
+            for url, (etag, last_modified) in validators.items():
+                if not self.transport.revalidate(url, etag, last_modified):
+                    self.purge(id)
+                    return None
+            for path in (data_path, meta_path):
+                os.utime(path)
+
+        try:
+            with open(data_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # partial or incompatible entry, suds builds a new one
+            self.purge(id)
+            return None
+
+    def put(self, id, object):
+        data_path, meta_path = self._paths(id)
+        # the documents fetched while suds built the object
+        validators = dict(self.transport.document_validators)
+        for path, content, mode in ((data_path, pickle.dumps(object, pickle.HIGHEST_PROTOCOL), 'wb'),
+                                    (meta_path, json.dumps(validators), 'w')):
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, mode) as f:
+                f.write(content)
+            # atomic, so that concurrent processes never read a partial entry
+            os.replace(tmp_path, path)
+        return object
+
+    def purge(self, id):
+        for path in self._paths(id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.startswith('suds-'):
+                os.remove(os.path.join(self.directory, name))
@@ -1,6 +1,4 @@
 
-from msci.bdt import create_unique_export_set_name
-
 
 def download_exposures_report(service_bdt_client, model, portfolio, date, file_name, portfolio_owner='SYSTEM',
                          agg_type='LEAF_NODES_ONLY'):
@@ -28,7 +26,8 @@ def download_exposures_report(service_bdt_client, model, portfolio, date, file_n
 
     # Step 1 create portfolio exposure export set
     service_bdt_client.logger.debug('Creating PorfolioExposureExportSet ...')
-    export_set_name = service_bdt_client.createPorfolioExposureExportSet(None, model, [(portfolio, portfolio_owner, agg_type)])
+    export_set_name = service_bdt_client.exportSet('PortfolioExposure', model,
+                                                   [(portfolio, portfolio_owner, agg_type)])
     service_bdt_client.logger.debug(f'Created {export_set_name}')
     job_name = export_set_name
     service_bdt_client.logger.debug(f'Done creating {export_set_name} ')
@@ -48,7 +47,7 @@ def download_exposures_report(service_bdt_client, model, portfolio, date, file_n
     service_bdt_client.downloadExportJob(job_id, file_name)
     service_bdt_client.logger.debug(f'Job {job_id} downloaded')
 
-    # Remove export set
-    service_bdt_client.deleteExportSet(export_set_name)
+    # Remove export set, unless kept by the registry
+    service_bdt_client.releaseExportSet(export_set_name)
 
     return 0
@@ -0,0 +1,276 @@
+import datetime
+import hashlib
+import json
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+
+import numpy as np
+
+from msci.bdt.context.exceptions import BDTError
+
+# attributes of the stored analytics folders the filters apply to
+DATE_FIELD = 'AnalysisDate'
+OWNER_FIELD = 'Owner'
+PATH_FIELD = 'Path'
+# default attributes identifying a stored analytics folder in the manifest
+KEY_FIELDS = (PATH_FIELD, OWNER_FIELD, DATE_FIELD)
+
+
+def folder_field(folder, name):
+    """
+    Return an attribute of a stored analytics folder, as listed by InteractiveClient.get_available_stored_analytics
+    """
+    value = folder.get('_' + name, folder.get(name))
+    return None if value is None else str(value)
+
+
+def folder_key(folder, key_fields=KEY_FIELDS):
+    """
+    Return the identifier of a stored analytics folder in the manifest, from its key fields only, so that it does not
+    change with the other attributes listed for the folder
+
+    :param folder: stored analytics folder, as listed by InteractiveClient.get_available_stored_analytics
+    :type folder:  dict
+    :param key_fields: names of the attributes identifying the folder
+    :type key_fields:  tuple[str]
+    :rtype: str
+    :raises BDTError: if the folder lacks one of the key fields
+    """
+    fields = [folder_field(folder, name) for name in key_fields]
+    if None in fields:
+        raise BDTError('Stored analytics folder has no %s attribute to identify it, available attributes: %s'
+                       % (key_fields[fields.index(None)], ', '.join(sorted(k.lstrip('_') for k in folder))))
+    return hashlib.sha1(json.dumps(fields).encode('utf-8')).hexdigest()
+
+
+def folder_keys(folders, key_fields=KEY_FIELDS):
+    """
+    Return the folder_key of each folder, checking that no two folders have the same key, as they would overwrite
+    each other's report
+
+    :raises BDTError: if a folder lacks a key field or two folders have the same key
+    """
+    keys = [folder_key(folder, key_fields) for folder in folders]
+    seen = {}
+    for key, folder in zip(keys, folders):
+        if key in seen:
+            raise BDTError('Stored analytics folders %s and %s have the same %s, give key_fields identifying them'
+                           % (folder_field(seen[key], 'Name'), folder_field(folder, 'Name'), ', '.join(key_fields)))
+        seen[key] = folder
+    return keys
+
+
+def select_stored_analytics(folders, start_date=None, end_date=None, owners=None, path=None, predicate=None):
+    """
+    Return the stored analytics folders matching all the filters given
+
+    :param folders: stored analytics folders, as listed by InteractiveClient.get_available_stored_analytics
+    :type folders:  list[dict]
+    :param start_date: first analysis date, 'yyyy-mm-dd'
+    :type start_date:  str or datetime.date
+    :param end_date: last analysis date, 'yyyy-mm-dd'
+    :type end_date:  str or datetime.date
+    :param owners: owner or owners of the folders
+    :type owners:  str or list[str]
+    :param path: shell-style pattern of the tree path of the folders, e.g. 'Equity/*'
+    :type path:  str
+    :param predicate: callable taking a folder and returning True to select it
+    :type predicate:  callable
+    :rtype: list[dict]
+    """
+    if isinstance(owners, str):
+        owners = [owners]
+    selected = []
+    for folder in folders:
+        date = (folder_field(folder, DATE_FIELD) or '')[:10]
+        if start_date is not None and date < str(start_date)[:10]:
+            continue
+        if end_date is not None and date > str(end_date)[:10]:
+            continue
+        if owners is not None and folder_field(folder, OWNER_FIELD) not in owners:
+            continue
+        if path is not None and not fnmatch(folder_field(folder, PATH_FIELD) or '', path):
+            continue
+        if predicate is not None and not predicate(folder):
+            continue
+        selected.append(folder)
+    return selected
+
+
+class NpzSink(object):
+    """
+    Columnar sink writing each report to its own .npz file in a folder, next to the manifest of the stored analytics
+    folders extracted so far. Text columns are stored as fixed-width strings, so that the files load without pickle.
+
+    The manifest is a journal of JSON lines, one per folder extracted, appended to as the reports are written.
+    """
+
+    manifest_name = 'manifest.jsonl'
+
+    def __init__(self, directory):
+        """
+        :param directory: output folder, created if needed
+        :type directory:  str
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def write(self, key, columns):
+        """
+        Write the columns of a report, returning the name of the file written
+
+        :param key: identifier of the report
+        :type key:  str
+        :param columns: column name -> column
+        :type columns:  dict
+        :rtype: str
+        """
+        arrays = {}
+        for name, values in columns.items():
+            array = np.asarray(values)
+            if array.dtype == object:
+                array = np.array(['' if v is None else str(v) for v in array], dtype=str)
+            arrays[name] = array
+        file_name = key + '.npz'
+        self._write_atomic(file_name, lambda f: np.savez(f, **arrays))
+        return file_name
+
+    def load_manifest(self):
+        """
+        Return the manifest, folder key -> entry, empty if there is none yet
+
+        :rtype: dict
+        """
+        manifest = {}
+        try:
+            with open(os.path.join(self.directory, self.manifest_name), 'rb+') as f:
+                end = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # partial line of an interrupted run, removed so that the next entry starts on its own line,
+                        # its folder being extracted again
+                        f.truncate(end)
+                        break
+                    record = json.loads(line)
+                    manifest[record['Key']] = record['Entry']
+                    end += len(line)
+        except FileNotFoundError:
+            pass
+        return manifest
+
+    def append_manifest(self, key, entry):
+        """
+        Record in the manifest a folder whose report was written
+
+        :param key: identifier of the folder, see folder_key
+        :type key:  str
+        :param entry: manifest entry of the folder
+        :type entry:  dict
+        """
+        line = json.dumps({'Key': key, 'Entry': entry}) + '\n'
+        with open(os.path.join(self.directory, self.manifest_name), 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_atomic(self, file_name, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            # atomic, so that an interrupted run never leaves a partial file
+            os.replace(tmp_path, os.path.join(self.directory, file_name))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+
+def extract_stored_analytics(session_pool, cols, directory=None, data_rows=True, sink=None, start_date=None,
+                             end_date=None, owners=None, path=None, predicate=None, key_fields=KEY_FIELDS,
+                             logger=None):
+    """
+
+    Interactive calls to get the positions reports of all the stored analytics folders matching the filters, see
+    select_stored_analytics, in parallel across the sessions of the pool. Each report is written to the sink as soon
+    as it is downloaded and recorded in the manifest, so that a rerun only fetches the folders not extracted yet.
+
+    :param session_pool: pool of interactive sessions, one worker being run per session
+    :type session_pool:  msci.bdt.context.pool.SessionPool
+    :param cols: dict of two series 'Name' and 'Owner'
+    :type cols:  dict
+    :param directory: output folder of the default NpzSink
+    :type directory:  str
+    :param data_rows: set to True to get position level data, false to get just top-level results (faster)
+    :type data_rows:  boolean
+    :param sink: sink of the reports, with the write, load_manifest and append_manifest methods of NpzSink
+    :type sink:  NpzSink
+    :param key_fields: names of the folder attributes identifying the folders in the manifest, see folder_key
+    :type key_fields:  tuple[str]
+    :param logger: optional logger object
+    :type logger:  logging
+    :return: the manifest entries of the folders extracted by this run
+    :rtype: list[dict]
+    :raises BDTError: if some folders failed, once the others are extracted, or before extracting anything if the
+     folders are not identified by their key fields
+    """
+    if sink is None:
+        if directory is None:
+            raise ValueError('Either directory or sink must be given')
+        sink = NpzSink(directory)
+    if logger is None:
+        from logging import getLogger
+        logger = getLogger(__name__)
+
+    with session_pool.lease() as client:
+        folders = client.get_available_stored_analytics()
+    folders = select_stored_analytics(folders, start_date, end_date, owners, path, predicate)
+
+    keys = folder_keys(folders, key_fields)
+    manifest = sink.load_manifest()
+    todo = queue.Queue()
+    for key, folder in zip(keys, folders):
+        if key not in manifest:
+            todo.put((key, folder))
+    logger.info('Extracting %i of %i stored analytics folders' % (todo.qsize(), len(folders)))
+
+    lock = threading.Lock()
+    extracted = []
+    failed = []
+
+    def worker():
+        with session_pool.lease() as client:
+            while True:
+                try:
+                    key, folder = todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    positions = client.get_stored_analytics_position_report(folder, cols, data_rows)
+                    file_name = sink.write(key, positions)
+                except Exception as e:
+                    logger.error('Unable to extract stored analytics %s: %s' % (folder_field(folder, 'Name'), e))
+                    with lock:
+                        failed.append(folder)
+                    continue
+                entry = {'Folder': {k.lstrip('_'): str(v) for k, v in folder.items()}, 'File': file_name,
+                         'Rows': len(next(iter(positions.values()), [])),
+                         'Extracted': datetime.datetime.now().isoformat(timespec='seconds')}
+                with lock:
+                    manifest[key] = entry
+                    sink.append_manifest(key, entry)
+                    extracted.append(entry)
+
+    with ThreadPoolExecutor(max_workers=session_pool.size) as executor:
+        for future in [executor.submit(worker) for _ in range(min(session_pool.size, todo.qsize()))]:
+            future.result()
+
+    if failed:
+        msg = '%i stored analytics folders failed, rerun to retry them: %s' \
+              % (len(failed), ', '.join(str(folder_field(folder, 'Name')) for folder in failed))
+        logger.error(msg)
+        raise BDTError(msg)
+    return extracted
@@ -24,9 +24,6 @@ def get_exposures_report(service_bdt_client, model, portfolio, date, data_rows=T
     :return: portfolio exposures report
     """
 
-    export_set_name = create_unique_export_set_name(portfolio=portfolio, model=model)
-    job_name = export_set_name
-
     # Step 1 create portfolio exposure export set
     if not data_rows:
         # Create a single asset portfolio with itself
@@ -38,6 +35,7 @@ def get_exposures_report(service_bdt_client, model, portfolio, date, data_rows=T
                           }
 
         # the export set name is unique so we can use it for the portfolio name too
+        export_set_name = create_unique_export_set_name(portfolio=portfolio, model=model)
         port_name = export_set_name
         port_owner = service_bdt_client.user_id
         portfolios = [{'PortfolioName': port_name, 'EffectiveStartDate': date, 'Positions': port_positions}]
@@ -54,9 +52,15 @@ def get_exposures_report(service_bdt_client, model, portfolio, date, data_rows=T
         port_name = portfolio
         port_owner = portfolio_owner
 
-    # create the export set
-    service_bdt_client.createPorfolioExposureExportSet(export_set_name, model,
+    if data_rows:
+        # taken from the registry if the client reuses its export sets
+        export_set_name = service_bdt_client.exportSet('PortfolioExposure', model,
                                                        [(port_name, port_owner, agg_type)])
+    else:
+        # the portfolio is imported for this call only, so the export set is not registered
+        service_bdt_client.createPorfolioExposureExportSet(export_set_name, model,
+                                                           [(port_name, port_owner, agg_type)])
+    job_name = export_set_name
 
     # Step 2 submit the export job to the B1 server, hold the job id
     job_id = service_bdt_client.sendExportJob(export_set_name, date, job_name)
@@ -67,7 +71,7 @@ def get_exposures_report(service_bdt_client, model, portfolio, date, data_rows=T
     # Step 4 parse report into python data structure
     output = service_bdt_client.getPortfolioExposureReports(job_id)
 
-    # Remove export set
-    service_bdt_client.service.DeleteExportSet(export_set_name)
+    # Remove export set, unless kept by the registry
+    service_bdt_client.releaseExportSet(export_set_name)
 
     return output
@@ -1,6 +1,7 @@
 import random
 
-def get_mpc_correlation_report(service_bdt_client, model, case, report, report_owner, date):
+def get_mpc_correlation_report(service_bdt_client, model, case, report, report_owner, date, matrix=False,
+                               packed=False):
 
     """
 
@@ -18,12 +19,17 @@ def get_mpc_correlation_report(service_bdt_client, model, case, report, report_o
     :type report_owner:  str
     :param date:
     :type date:  str 'yyyy-mm-dd'
+    :param matrix: True to return the report as a NumPy matrix (see ServiceClient.getMPCMatrix), False (default)
+     for a dictionary of columns
+    :type matrix:  Boolean
+    :param packed: True to return the matrix in packed upper-triangular storage (only used if matrix is True)
+    :type packed:  Boolean
     :return: correlation report
     """
 
 
     # Step 1 create MPC export set
-    export_set_name = service_bdt_client.createMPCExportSet(None, model, case, [(report, report_owner)])
+    export_set_name = service_bdt_client.exportSet('MPC', model, case, [(report, report_owner)])
 
     # Step 2 submit the export job to the B1 server, hold the job id
     job_name = 'MPCEJ_%s_%02i' % (date, random.randint(0,99))
@@ -33,7 +39,12 @@ def get_mpc_correlation_report(service_bdt_client, model, case, report, report_o
     service_bdt_client.waitJob(job_id, 'Export')
 
     # Step 4 parse report into python data structure
-    return service_bdt_client.getMPCReport(job_id)
+    if matrix:
+        output = service_bdt_client.getMPCMatrix(job_id, packed=packed)
+    else:
+        output = service_bdt_client.getMPCReport(job_id)
 
-    # Remove export set
-    service_bdt_client.deleteExportSet(export_set_name)
+    # Remove export set, unless kept by the registry
+    service_bdt_client.releaseExportSet(export_set_name)
+
+    return output
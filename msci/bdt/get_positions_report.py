@@ -1,4 +1,7 @@
-from collections import defaultdict
+import queue
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 def get_positions_report(interactive_bdt_client, model, portfolio, date, cols, data_rows=True,
                          portfolio_owner='SYSTEM', model_owner='SYSTEM', current_settings=None, customize_settings=None):
@@ -22,7 +25,7 @@ def get_positions_report(interactive_bdt_client, model, portfolio, date, cols, d
     :type model_owner:  str
     :param current_settings: (None default)
     :type current_settings:  dict
-    :return: portfolio positions
+    :return: portfolio positions, column name -> column, see InteractiveClient.pos_report_schema
     """
 
     interactive_bdt_client.service.SetAnalysisDate(date)
@@ -40,3 +43,160 @@ def get_positions_report(interactive_bdt_client, model, portfolio, date, cols, d
 
     return interactive_bdt_client.download_pos_report(cols, data_rows, customize_settings=customize_settings)
 
+
+
+def positions_request(request, **defaults):
+    """
+    Return the get_positions_report keyword arguments of a request
+
+    :param request: (portfolio, date, model) or dictionary of get_positions_report keyword arguments
+    :type request:  tuple or dict
+    :param defaults: keyword arguments of the requests not giving them
+    :rtype: dict
+    """
+    if not isinstance(request, dict):
+        request = dict(zip(('portfolio', 'date', 'model'), request))
+    kwargs = dict(defaults)
+    kwargs.update(request)
+    return kwargs
+
+
+def state_order(kwargs):
+    """
+    Sort key of a request grouping the requests by date, model and settings, then by portfolio, so that going
+    through them in order changes the interactive session state as little as possible
+    """
+    settings = sorted((kwargs.get('current_settings') or {}).items())
+    return (str(kwargs['date']), kwargs.get('model_owner', 'SYSTEM'), kwargs['model'], repr(settings),
+            kwargs.get('portfolio_owner', 'SYSTEM'), kwargs['portfolio'])
+
+
+def get_positions_reports(interactive_bdt_client, requests, cols, data_rows=True, portfolio_owner='SYSTEM',
+                          model_owner='SYSTEM', current_settings=None, customize_settings=None):
+    """
+
+    Interactive call to get the positions of many portfolios, dates and models. The requests are run grouped by
+    date, model and settings, so that only the current portfolio changes from one request to the next within a
+    group, the interactive client skipping the calls which do not change the session state.
+
+    :param interactive_bdt_client:
+    :type interactive_bdt_client:  msci.bdt.context.InteractiveClient.InteractiveClient
+    :param requests: (portfolio, date, model) or dictionaries of get_positions_report keyword arguments, e.g. to
+     give the owners of each portfolio
+    :type requests:  list
+    :param cols: List of column names
+    :type cols:  List(str)
+    :param portfolio_owner: portfolio owner of the requests not giving it (SYSTEM default)
+    :type portfolio_owner:  str
+    :param model_owner: model owner of the requests not giving it (SYSTEM default)
+    :type model_owner:  str
+    :param current_settings: current settings of the requests not giving them (None default)
+    :type current_settings:  dict
+    :return: portfolio positions of each request, in the order of the requests
+    :rtype: list
+    """
+    kwargs_list = [positions_request(request, cols=cols, data_rows=data_rows, portfolio_owner=portfolio_owner,
+                                     model_owner=model_owner, current_settings=current_settings,
+                                     customize_settings=customize_settings) for request in requests]
+    positions = [None] * len(kwargs_list)
+    for i in sorted(range(len(kwargs_list)), key=lambda i: state_order(kwargs_list[i])):
+        positions[i] = get_positions_report(interactive_bdt_client, **kwargs_list[i])
+    return positions
+
+
+def iter_positions_reports(session_pool, requests, cols, data_rows=True, portfolio_owner='SYSTEM',
+                           model_owner='SYSTEM', current_settings=None, customize_settings=None):
+    """
+
+    Interactive calls to get the positions of many portfolios, dates and models in parallel, each worker leasing a
+    session of the pool. A worker takes the next request for the date, model and settings its session is in if any,
+    otherwise a request of the largest group left, so that the sessions change state as little as possible while
+    sharing the work. The positions are yielded as the reports complete.
+
+    A request failing does not stop the others: its exception is yielded instead of its positions, and its session
+    is health checked by the pool before being leased again. If no session can be leased anymore, the requests left
+    are yielded with the exception of the last lease.
+
+    :param session_pool: pool of interactive sessions, one worker being run per session
+    :type session_pool:  msci.bdt.context.pool.SessionPool
+    :param requests: (portfolio, date, model) or dictionaries of get_positions_report keyword arguments, e.g. to
+     give the owners or the columns of each portfolio
+    :type requests:  list
+    :param cols: List of column names of the requests not giving them
+    :type cols:  List(str)
+    :param portfolio_owner: portfolio owner of the requests not giving it (SYSTEM default)
+    :type portfolio_owner:  str
+    :param model_owner: model owner of the requests not giving it (SYSTEM default)
+    :type model_owner:  str
+    :param current_settings: current settings of the requests not giving them (None default)
+    :type current_settings:  dict
+    :return: iterator of (request, portfolio positions or exception), in the order the reports complete
+    """
+    kwargs_list = [positions_request(request, cols=cols, data_rows=data_rows, portfolio_owner=portfolio_owner,
+                                     model_owner=model_owner, current_settings=current_settings,
+                                     customize_settings=customize_settings) for request in requests]
+    groups = defaultdict(deque)
+    for i in sorted(range(len(kwargs_list)), key=lambda i: state_order(kwargs_list[i])):
+        groups[state_order(kwargs_list[i])[:-2]].append(i)
+    lock = threading.Lock()
+    stop = threading.Event()
+    # (request index, positions or exception), or (None, exception) once a worker cannot lease a session
+    results = queue.Queue()
+
+    def next_request(state):
+        with lock:
+            if not groups.get(state):
+                if not groups:
+                    return None, None
+                state = max(groups, key=lambda s: len(groups[s]))
+            if not groups[state]:
+                return None, None
+            return state, groups[state].popleft()
+
+    def worker():
+        while not stop.is_set():
+            failed = False
+            try:
+                with session_pool.lease() as client:
+                    state = None
+                    while not stop.is_set():
+                        state, i = next_request(state)
+                        if i is None:
+                            return
+                        try:
+                            positions = get_positions_report(client, **kwargs_list[i])
+                        except Exception as e:
+                            results.put((i, e))
+                            failed = True
+                            # raised through the lease, so that the pool checks the session
+                            raise
+                        results.put((i, positions))
+            except Exception as e:
+                if not failed:
+                    results.put((None, e))
+                    return
+
+    with ThreadPoolExecutor(max_workers=session_pool.size) as executor:
+        try:
+            workers = min(session_pool.size, len(kwargs_list))
+            for _ in range(workers):
+                executor.submit(worker)
+            done = 0
+            while done < len(kwargs_list):
+                i, positions = results.get()
+                if i is not None:
+                    done += 1
+                    yield requests[i], positions
+                    continue
+                workers -= 1
+                if not workers:
+                    # no session left to run the requests
+                    with lock:
+                        left = [i for group in groups.values() for i in group]
+                        groups.clear()
+                    for i in left:
+                        done += 1
+                        yield requests[i], positions
+        finally:
+            # the workers finish their current report
+            stop.set()
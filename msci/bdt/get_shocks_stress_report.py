@@ -1,7 +1,5 @@
 from msci.bdt.context.ServiceClient import ServiceClient
 
-from msci.bdt import create_unique_export_set_name
-
 
 def get_stress_test_report(service_bdt_client: ServiceClient, model: str,
                            portfolio_list, scenarios, date, model_owner='SYSTEM',
@@ -33,19 +31,14 @@ def get_stress_test_report(service_bdt_client: ServiceClient, model: str,
     if stress_testing_views_list is None:
         stress_testing_views_list = [('Summary Report', "SYSTEM")]
 
-    portfolio_str = ""
-    for port_tuple in portfolio_list:
-        portfolio_str = portfolio_str + port_tuple[0] + "_"
-    export_set = create_unique_export_set_name(portfolio=portfolio_str, model=model)
-    job_name = export_set
-
     # Step 1 create portfolio exposure export set
 
-    # Obtain stress test report srt
-    service_bdt_client.createShocksStressTestExportSet(name=export_set, portfolio_list=portfolio_list,
-                                                       scenarios=scenarios, risk_model=model, ccy=ccy,
-                                                       model_owner=model_owner,
-                                                       stress_testing_views_list=stress_testing_views_list)
+    # Obtain stress test report srt, taken from the registry if the client reuses its export sets
+    export_set = service_bdt_client.exportSet('STRESS', portfolio_list=portfolio_list,
+                                              scenarios=scenarios, risk_model=model, ccy=ccy,
+                                              model_owner=model_owner,
+                                              stress_testing_views_list=stress_testing_views_list)
+    job_name = export_set
 
     # Step 2 submit the export job to the B1 server, hold the job id
     job_id = service_bdt_client.sendExportJob(export_set, date, job_name)
@@ -56,7 +49,7 @@ def get_stress_test_report(service_bdt_client: ServiceClient, model: str,
     # Step 4 parse report into python data structure
     report = service_bdt_client.getShocksStressReport(job_id, True)
 
-    # Remove export set
-    service_bdt_client.service.DeleteExportSet(export_set)
+    # Remove export set, unless kept by the registry
+    service_bdt_client.releaseExportSet(export_set)
 
     return report
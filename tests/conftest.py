@@ -0,0 +1,29 @@
+import logging
+import os
+
+import pytest
+from suds.client import Client
+
+from msci.bdt.context.ServiceClient import ServiceClient
+from msci.bdt.context._CommonClient import _Service
+
+WSDL_PATH = os.path.join(os.path.dirname(__file__), 'data', 'BDTService.wsdl')
+
+
+@pytest.fixture
+def service_client():
+    """
+    ServiceClient built offline on the test WSDL, whose service calls return the suds request context instead of
+    being sent
+    """
+    client = ServiceClient.__new__(ServiceClient)
+    client.logger = logging.getLogger('test')
+    client.user_id, client.client_id, client.password = 'user', 'client', 'password'
+    client.url = 'file://' + os.path.abspath(WSDL_PATH)
+    client.timeout = 10
+    client.client = Client(client.url, cache=None, nosend=True)
+    client.factory = client.client.factory
+    client.service = _Service(client)
+    client.export_jobs = {}
+    client._import_log_types = None
+    return client
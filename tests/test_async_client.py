@@ -0,0 +1,85 @@
+import asyncio
+import base64
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from msci.bdt.context.AsyncServiceClient import AsyncServiceClient
+from msci.bdt.context.ServiceClient import ServiceClient
+from msci.bdt.context.cache import ReportCache
+from msci.bdt.context.exceptions import BDTError
+from msci.bdt.context.pool import ClientPool
+from msci.bdt.context.registry import ExportSetRegistry
+
+
+@pytest.fixture
+def pool(service_client, tmp_path, monkeypatch):
+    """
+    Pool of 2 offline ServiceClient sharing a report_cache, recording the jobs downloaded
+    """
+    downloads = []
+    statuses = {}
+
+    def factory():
+        client = copy.copy(service_client)
+        client.export_jobs = {}
+        client.export_set_registry = ExportSetRegistry(client)
+        client.service = SimpleNamespace(
+            SubmitExportJob=lambda name, analysis_date, job_name, flag: 'J_' + analysis_date,
+            GetExportJob=lambda job_id: downloads.append((client, job_id)) or SimpleNamespace(
+                BinaryData=base64.b64encode(job_id.encode('ascii'))))
+        return client
+
+    monkeypatch.setattr(ServiceClient, 'getJobStatus', lambda client, job_id, job_type: statuses.get(job_id, 0))
+    monkeypatch.setattr(ServiceClient, '_read_export_data',
+                        lambda client, byte_array, export_set_type, **kwargs: {'Reports': [byte_array]})
+    service_client.report_cache = ReportCache(str(tmp_path / 'cache'))
+    service_client.stream_downloads = False
+    pool = ClientPool(factory, size=2, health_check=None)
+    pool.downloads = downloads
+    pool.statuses = statuses
+    return pool
+
+
+def test_jobs_shared_across_pooled_clients(pool):
+    async def run():
+        async_client = AsyncServiceClient(pool)
+
+        # sent on one client, downloaded on the other
+        downloader = pool.acquire()
+        job_id = await async_client.sendExportJob('ES', '2026-01-02', 'job')
+        assert async_client.export_jobs == {job_id: ('ES', '2026-01-02')}
+        sender = pool.acquire()
+        pool.release(downloader)
+
+        reports = await async_client.getPortfolioExposureReports(job_id)
+        pool.release(sender)
+        assert reports == {'Reports': [b'J_2026-01-02']}
+        assert pool.downloads == [(downloader, job_id)]
+        assert async_client.export_jobs == {} and sender.export_jobs == {}
+
+        # read from the report_cache afterwards
+        assert await async_client.getPortfolioExposureReports(job_id) == reports
+        assert len(pool.downloads) == 1
+
+        # a failed job is forgotten too
+        pool.statuses['J_2026-01-03'] = -3
+        await async_client.sendExportJob('ES', '2026-01-03', 'job')
+        with pytest.raises(BDTError):
+            await async_client.getPortfolioExposureReports('J_2026-01-03')
+        assert async_client.export_jobs == {}
+
+    asyncio.run(run())
+
+
+def test_cached_reports_skip_the_wait(pool, monkeypatch):
+    async def run():
+        async_client = AsyncServiceClient(pool)
+        job_id = await async_client.sendExportJob('ES', '2026-01-02', 'job')
+        await async_client.getPortfolioExposureReports(job_id)
+
+        monkeypatch.setattr(ServiceClient, 'getJobStatus', lambda client, job_id, job_type: pytest.fail('polled'))
+        assert await async_client.getPortfolioExposureReports(job_id) == {'Reports': [b'J_2026-01-02']}
+
+    asyncio.run(run())
@@ -0,0 +1,92 @@
+import threading
+
+from msci.bdt.context.ServiceClient import ServiceClient
+from msci.bdt.context.exceptions import BDTError
+
+
+class FakeScheduler(object):
+    """
+    JobScheduler finishing the most recently added job first, failing the jobs of the given ids
+    """
+
+    def __init__(self, client, failing):
+        self.jobs = []
+        self.failing = failing
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, job_id, job_type):
+        self.jobs.append(job_id)
+
+    def poll(self, max_wait=None):
+        job_id = self.jobs.pop()
+        return job_id, BDTError('failed', job_id) if job_id in self.failing else None
+
+
+def test_backfill(service_client, monkeypatch):
+    main_thread = threading.current_thread()
+    submitted = []
+    read_kwargs = []
+    sunk = []
+
+    def send(client, exp_set_name, analysis_date, job_name):
+        assert threading.current_thread() is main_thread
+        submitted.append((analysis_date, job_name))
+        return 'J_' + analysis_date
+
+    def get_export_job(client, job_id):
+        # downloaded off the polling thread, on a worker client
+        assert threading.current_thread() is not main_thread
+        assert client.client is not service_client.client
+        if job_id == 'J_2026-01-05':
+            raise IOError('connection reset')
+        return job_id.encode('ascii')
+
+    def read_export_data(client, byte_array, export_set_type, **kwargs):
+        read_kwargs.append(kwargs)
+        return {'Reports': [byte_array.decode('ascii')], 'Type': export_set_type}
+
+    def sink(analysis_date, reports):
+        assert threading.current_thread() is main_thread
+        sunk.append((analysis_date, reports['Reports']))
+
+    monkeypatch.setattr(ServiceClient, 'sendExportJob', send)
+    monkeypatch.setattr(ServiceClient, 'getExportJob', get_export_job)
+    monkeypatch.setattr(ServiceClient, '_read_export_data', read_export_data)
+    monkeypatch.setattr('msci.bdt.context.ServiceClient.JobScheduler',
+                        lambda client: FakeScheduler(client, {'J_2026-01-03'}))
+    service_client.router = None
+    service_client.report_executor = None
+
+    dates = ['2026-01-0%i' % d for d in range(2, 8)]
+    results = service_client.backfill('ES', dates, sink, max_in_flight=2, columnar=True)
+
+    # submitted in date order
+    assert submitted == [(d, 'ES_' + d) for d in dates]
+    assert sorted(results) == dates
+    assert isinstance(results['2026-01-03'], BDTError)
+    assert isinstance(results['2026-01-05'], IOError)
+    ok = [d for d in dates if d not in ('2026-01-03', '2026-01-05')]
+    assert all(results[d] is None for d in ok)
+    assert sorted(sunk) == [(d, ['J_' + d]) for d in ok]
+    # parsed on the shared process pool
+    executors = {id(kwargs['executor']) for kwargs in read_kwargs}
+    assert len(executors) == 1
+    assert all(kwargs['workers'] == 2 and kwargs['columnar'] for kwargs in read_kwargs)
+
+
+def test_backfill_uses_given_executor(service_client, monkeypatch):
+    read_kwargs = []
+    monkeypatch.setattr(ServiceClient, 'sendExportJob', lambda client, name, analysis_date, job_name: analysis_date)
+    monkeypatch.setattr(ServiceClient, 'getExportJob', lambda client, job_id: b'')
+    monkeypatch.setattr(ServiceClient, '_read_export_data',
+                        lambda client, byte_array, export_set_type, **kwargs: read_kwargs.append(kwargs) or {})
+    monkeypatch.setattr('msci.bdt.context.ServiceClient.JobScheduler', lambda client: FakeScheduler(client, ()))
+    service_client.router = None
+    service_client.report_executor = None
+
+    results = service_client.backfill('ES', ['2026-01-02', '2026-01-03'], lambda d, r: None, executor='mine')
+
+    assert results == {'2026-01-02': None, '2026-01-03': None}
+    assert read_kwargs == [{'executor': 'mine'}] * 2
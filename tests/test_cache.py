@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+from msci.bdt.context.cache import BUFFER_LENGTH, HEADER, ReportCache
+from msci.bdt.context.exceptions import BDTError
+
+REPORT = {'Detail': {'Weight': np.arange(1000, dtype=np.float64), 'Name': np.array(['a', 'b'], dtype=object)}}
+
+
+def cache_files(cache):
+    return sorted(name for name in os.listdir(cache.directory) if name.endswith(ReportCache.suffix))
+
+
+def same_report(report):
+    return (np.array_equal(report['Detail']['Weight'], REPORT['Detail']['Weight'])
+            and report['Detail']['Name'].tolist() == ['a', 'b'])
+
+
+def test_round_trip(tmp_path):
+    cache = ReportCache(str(tmp_path / 'cache'))
+    assert cache.get(('job', 'u', '1'), 'options') is None
+    cache.put(('job', 'u', '1'), 'options', REPORT)
+    assert same_report(cache.get(('job', 'u', '1'), 'options'))
+    assert cache.get(('job', 'u', '1'), 'other options') is None
+    assert oct(os.stat(cache.directory).st_mode & 0o777) == oct(0o700)
+
+
+def test_aliases_written_once(tmp_path):
+    cache = ReportCache(str(tmp_path / 'cache'))
+    job, definition = ('job', 'u', '1'), ('definition', 'u', 'ES', '2026-01-02')
+    cache.put(job, 'options', REPORT, aliases=[definition])
+    paths = [os.path.join(cache.directory, name) for name in cache_files(cache)]
+    assert len(paths) == 2 and os.path.samefile(*paths)
+    assert same_report(cache.get(definition, 'options'))
+
+    # the links are counted once against max_bytes
+    cache.max_bytes = os.path.getsize(paths[0])
+    cache.evict()
+    assert len(cache_files(cache)) == 2
+
+    cache.invalidate(job)
+    assert cache.get(job, 'options') is None
+    assert same_report(cache.get(definition, 'options'))
+
+
+def corrupt_pickle(data):
+    _, num_buffers, main_length = HEADER.unpack_from(data)
+    start = HEADER.size + num_buffers * BUFFER_LENGTH.size
+    return data[:start] + b'\xff' * main_length + data[start + main_length:]
+
+
+@pytest.mark.parametrize('corrupt', [lambda data: data[:len(data) // 2], lambda data: data[:10],
+                                     lambda data: b'XXXX' + data[4:], corrupt_pickle])
+def test_corrupt_entry_is_a_miss(tmp_path, corrupt):
+    cache = ReportCache(str(tmp_path / 'cache'))
+    cache.put('tag', None, REPORT)
+    path = os.path.join(cache.directory, cache_files(cache)[0])
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(corrupt(data))
+
+    assert cache.get('tag') is None
+    assert cache_files(cache) == []
+
+
+def test_eviction_least_recently_used(tmp_path):
+    cache = ReportCache(str(tmp_path / 'cache'))
+    for tag in ('a', 'b'):
+        cache.put(tag, None, REPORT)
+    size = os.path.getsize(os.path.join(cache.directory, cache_files(cache)[0]))
+    path_a = cache._path('a', None)
+    os.utime(path_a, (0, 0))
+    cache.max_bytes = 2 * size
+    cache.put('c', None, REPORT)
+    assert not os.path.exists(path_a)
+    assert cache.get('b') is not None and cache.get('c') is not None
+
+
+def test_shared_folder_refused(tmp_path):
+    directory = tmp_path / 'shared'
+    directory.mkdir()
+    os.chmod(str(directory), 0o777)
+    with pytest.raises(BDTError):
+        ReportCache(str(directory))
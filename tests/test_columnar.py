@@ -0,0 +1,77 @@
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from msci.bdt.context._CommonClient import read_report_file
+from msci.bdt.context.columnar import exposure_matrix, parse_column, read_mpc_matrix_file, unpack_upper
+
+EXPOSURE_REPORT = '''Report:,Exposure
+Date:,2026-01-02
+Asset ID,Asset ID Type,Size,Value,Specific Risk
+A1,BARRA,0.5,N/A,10%
+A2,BARRA,,1.5,20%
+'''
+
+POSITIONS_REPORT = '''Report:,Positions
+Date:,2026-01-02
+Asset ID,CUSIP,Weight,Comment
+A1,00123,1.5%,x
+A2,N/A,2,N/A
+'''
+
+MPC_REPORT = '''Report:,Correlation
+Date:,2026-01-02
+Asset,Description,A,B,A
+A,Asset A,1,0.5,0.25
+B,Asset B,0.5,1,0.1
+A,Asset A bis,0.25,0.1,1
+'''
+
+
+def as_lists(columns):
+    return {name: [None if isinstance(v, float) and np.isnan(v) else v for v in np.asarray(values).tolist()]
+            for name, values in columns.items()}
+
+
+def test_parse_column():
+    assert parse_column(['1', '2.5%', 'N/A', '']).tolist()[:2] == [1.0, 0.025]
+    assert np.isnan(parse_column(['1', 'N/A', ''])[1:]).all()
+    text = parse_column(['00123', 'ABC'])
+    assert text.dtype == object and text.tolist() == ['00123', 'ABC']
+    assert parse_column(['00123', 'ABC'], str).dtype.kind == 'U'
+
+
+@pytest.mark.parametrize('report, export_set_type', [(EXPOSURE_REPORT, 'PortfolioExposure'),
+                                                     (POSITIONS_REPORT, 'PortfolioAnalysis')])
+def test_columnar_matches_lists(report, export_set_type):
+    lists = read_report_file(StringIO(report), 'report.csv', export_set_type, ',', include_specific_risk=True)
+    arrays = read_report_file(StringIO(report), 'report.csv', export_set_type, ',', include_specific_risk=True,
+                              columnar=True)
+    assert arrays['Header'] == lists['Header']
+    assert as_lists(arrays['Detail']) == lists['Detail']
+
+
+def test_exposure_matrix_dense():
+    detail = read_report_file(StringIO(EXPOSURE_REPORT), 'exp.csv', 'PortfolioExposure', ',',
+                              matrix='dense')['Detail']
+    assert detail['Factor'].tolist() == ['Size', 'Value']
+    assert detail['Exposure'].dtype == np.float32
+    np.testing.assert_array_equal(detail['Exposure'], [[0.5, np.nan], [np.nan, 1.5]])
+    np.testing.assert_allclose(detail['Specific Risk'], [0.1, 0.2])
+    with pytest.raises(ValueError):
+        exposure_matrix(detail, 'csc')
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_read_mpc_matrix_file(packed):
+    report = read_mpc_matrix_file(StringIO(MPC_REPORT), 'mpc.csv', packed=packed)
+    assert report['Header'] == {'Report': 'Correlation', 'Date': '2026-01-02'}
+    assert report['Assets'].tolist() == ['A', 'B', 'A-1']
+    matrix = unpack_upper(report['Matrix']) if packed else report['Matrix']
+    np.testing.assert_array_equal(matrix, [[1, 0.5, 0.25], [0.5, 1, 0.1], [0.25, 0.1, 1]])
+
+
+def test_read_mpc_matrix_file_rejects_missing_rows():
+    with pytest.raises(ValueError):
+        read_mpc_matrix_file(StringIO(MPC_REPORT.rsplit('\nA,', 1)[0]), 'mpc.csv')
@@ -0,0 +1,77 @@
+import base64
+import io
+
+import pytest
+from suds import WebFault
+from suds.transport import TransportError
+
+from msci.bdt.context.exceptions import BDTError
+
+DATA = bytes(range(256)) * 50
+
+REPLY = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<S:Envelope xmlns:S="http://schemas.xmlsoap.org/soap/envelope/"><S:Body>'
+    '<GetExportJobResponse xmlns="urn:bdt"><Name>job</Name><BinaryData>%s</BinaryData></GetExportJobResponse>'
+    '</S:Body></S:Envelope>'
+)
+
+FAULT = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b'<S:Envelope xmlns:S="http://schemas.xmlsoap.org/soap/envelope/"><S:Body>'
+    b'<S:Fault><faultcode>S:Server</faultcode><faultstring>Unknown job id</faultstring></S:Fault>'
+    b'</S:Body></S:Envelope>'
+)
+
+
+def open_stream(service_client, monkeypatch, reply):
+    """
+    Make the transport of the client answer streamed calls with reply, recording the requests sent
+    """
+    requests = []
+
+    def fake_open_stream(request):
+        requests.append(request)
+        if isinstance(reply, Exception):
+            raise reply
+        return io.BytesIO(reply)
+
+    monkeypatch.setattr(service_client.client.options.transport, 'open_stream', fake_open_stream, raising=False)
+    return requests
+
+
+def test_stream_export_job_decodes_binary_data(service_client, monkeypatch):
+    encoded = base64.encodebytes(DATA).decode('ascii')
+    requests = open_stream(service_client, monkeypatch, (REPLY % encoded).encode('utf-8'))
+    service_client.export_jobs['42'] = 'Exposures'
+
+    with service_client.getExportJob('42', stream=True) as f:
+        assert f.read() == DATA
+
+    assert b'42' in requests[0].message and b'password' in requests[0].message
+    assert '42' not in service_client.export_jobs
+
+
+def test_stream_export_job_without_binary_data(service_client, monkeypatch):
+    open_stream(service_client, monkeypatch, REPLY.replace('<BinaryData>%s</BinaryData>', '').encode('utf-8'))
+
+    with pytest.raises(BDTError):
+        service_client.streamExportJob('42', io.BytesIO())
+
+
+def test_stream_export_job_raises_soap_fault(service_client, monkeypatch):
+    open_stream(service_client, monkeypatch, TransportError('Internal Server Error', 500, io.BytesIO(FAULT)))
+
+    with pytest.raises(WebFault) as e:
+        service_client.streamExportJob('42', io.BytesIO())
+
+    assert e.value.fault.faultstring == 'Unknown job id'
+
+
+def test_stream_export_job_raises_http_error_like_suds(service_client, monkeypatch):
+    open_stream(service_client, monkeypatch, TransportError('Bad Gateway', 502, io.BytesIO(b'')))
+
+    with pytest.raises(Exception) as e:
+        service_client.streamExportJob('42', io.BytesIO())
+
+    assert e.value.args == ((502, 'Bad Gateway'),)
@@ -0,0 +1,74 @@
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from msci.bdt.context.exceptions import BDTError
+from msci.bdt.extract_stored_analytics import NpzSink, extract_stored_analytics, folder_key
+
+FOLDERS = [{'_Name': 'A', '_Path': 'Equity/A', '_Owner': 'SYSTEM', '_AnalysisDate': '2026-01-02', '_Size': '10'},
+           {'_Name': 'B', '_Path': 'Equity/B', '_Owner': 'SYSTEM', '_AnalysisDate': '2026-01-02', '_Size': '20'}]
+
+
+class FakeSessionPool(object):
+    size = 2
+
+    def __init__(self, folders):
+        self.folders = folders
+        self.reports = []
+
+    @contextmanager
+    def lease(self):
+        yield self
+
+    def get_available_stored_analytics(self):
+        return self.folders
+
+    def get_stored_analytics_position_report(self, folder, cols, data_rows):
+        self.reports.append(folder['_Name'])
+        return {'Name': np.array([folder['_Name'], None], dtype=object), 'Weight': np.array([0.5, np.nan])}
+
+
+def test_folder_key_ignores_other_attributes():
+    folder = dict(FOLDERS[0], _Size='11', _Modified='2026-02-01')
+    assert folder_key(folder) == folder_key(FOLDERS[0])
+    assert folder_key(FOLDERS[0]) != folder_key(FOLDERS[1])
+
+
+def test_extraction_resumes_from_manifest(tmp_path):
+    pool = FakeSessionPool(FOLDERS[:1])
+    assert len(extract_stored_analytics(pool, {}, str(tmp_path))) == 1
+
+    # an interrupted append leaves a partial last line, which is ignored
+    with open(os.path.join(str(tmp_path), NpzSink.manifest_name), 'a') as f:
+        f.write('{"Key": "trunc')
+
+    pool.folders = [dict(FOLDERS[0], _Size='11'), FOLDERS[1]]
+    extracted = extract_stored_analytics(pool, {}, str(tmp_path))
+    assert pool.reports == ['A', 'B']
+    assert [entry['Folder']['Name'] for entry in extracted] == ['B']
+    assert len(NpzSink(str(tmp_path)).load_manifest()) == 2
+
+    with np.load(os.path.join(str(tmp_path), extracted[0]['File'])) as report:
+        assert report['Name'].tolist() == ['B', '']
+
+
+def test_folders_without_key_fields_rejected(tmp_path):
+    folders = [{k: v for k, v in folder.items() if k != '_Path'} for folder in FOLDERS]
+    pool = FakeSessionPool(folders)
+    with pytest.raises(BDTError, match='no Path attribute'):
+        extract_stored_analytics(pool, {}, str(tmp_path))
+    assert pool.reports == []
+
+    # identified by their name instead
+    assert len(extract_stored_analytics(pool, {}, str(tmp_path), key_fields=('Name', 'Owner', 'AnalysisDate'))) == 2
+
+
+def test_duplicate_keys_rejected(tmp_path):
+    # differ only by a field which is not part of the key
+    pool = FakeSessionPool([FOLDERS[0], dict(FOLDERS[0], _Name='A2')])
+    with pytest.raises(BDTError, match='same Path, Owner, AnalysisDate'):
+        extract_stored_analytics(pool, {}, str(tmp_path))
+    assert pool.reports == []
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,45 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from msci.bdt.context.import_builder import build_import_envelope
+
+
+def portfolios(size):
+    return [
+        {'PortfolioName': 'P&{1}', 'EffectiveStartDate': datetime.date(2024, 1, 2), 'StoreByValue': True,
+         'Benchmark': 'B',
+         'Positions': {'id': ['ID%d%s' % (i, ['', '&', '<>', '"\'', '{x}', 'é'][i % 6]) for i in range(size)],
+                       'idtype': ['CUSIP'] * size,
+                       'Holdings': np.linspace(-1e6, 1e6, size),
+                       'Weight': [None if i % 7 == 0 else i / 3 for i in range(size)],
+                       'Active': [[True, False, None, ''][i % 4] for i in range(size)],
+                       'Priority': np.arange(size),
+                       'Description': ['d%d"' % i if i % 3 else '' for i in range(size)],
+                       'Unknown': list(range(size))}},
+        {'PortfolioName': 'Empty', 'EffectiveStartDate': '2024-01-02', 'Positions': {'id': [], 'idtype': []}},
+        {'PortfolioName': 'NoKeys'},
+        {'PortfolioName': 'OnlyIds', 'EffectiveStartDate': '2024-01-02',
+         'Positions': {'id': np.array(['A', 'B']), 'idtype': ['X', 'Y'], 'Price': np.array([1.5, 2], np.float32)}},
+    ]
+
+
+def test_envelope_is_identical_to_suds(service_client):
+    port_list = portfolios(50)
+    expected = service_client.submitPortfolioImportJob(port_list, 'Job').envelope
+    assert build_import_envelope(service_client, port_list, 'Job') == expected
+
+
+def test_short_column_raises(service_client):
+    port_list = [{'PortfolioName': 'P', 'EffectiveStartDate': '2024-01-02',
+                  'Positions': {'id': ['A', 'B', 'C'], 'idtype': ['X'] * 3, 'Holdings': [1.0]}}]
+    with pytest.raises(IndexError):
+        service_client.submitPortfolioImportJob(port_list)
+    with pytest.raises(IndexError, match='Holdings'):
+        build_import_envelope(service_client, port_list, 'Job')
+
+
+def test_no_valid_portfolio_raises(service_client):
+    with pytest.raises(Exception, match='No valid portfolios'):
+        build_import_envelope(service_client, [{'PortfolioName': 'NoKeys'}], 'Job')
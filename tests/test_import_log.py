@@ -0,0 +1,59 @@
+from io import BytesIO
+
+import numpy as np
+from suds.xsd.sxbuiltin import XBoolean, XInteger, XString
+
+from msci.bdt.context.import_log import DETAIL_ELEMENT, GROUP_ELEMENT, read_import_log, to_array
+
+REPLY = b'''<?xml version="1.0" encoding="UTF-8"?>
+<S:Envelope xmlns:S="http://schemas.xmlsoap.org/soap/envelope/"><S:Body>
+<GetImportJobLogResponse xmlns="http://bdt.test"><LogGroups>
+<ImportLogGroup PortfolioName="P1" Owner="u" EffectiveDate="2026-01-02-05:00" ResultCode="0" NumPositions="2"
+ Valid="true"><Details>
+<ImportLogDetail ResultCode="0" Message="OK"/>
+<ImportLogDetail ResultCode="3" Message="Unknown &amp; skipped"/>
+</Details></ImportLogGroup>
+<ImportLogGroup PortfolioName="P2" Owner="u" EffectiveDate="2026-01-03" ResultCode="0"><Details>
+<ImportLogDetail ResultCode="0" Message="OK"/>
+</Details></ImportLogGroup>
+</LogGroups></GetImportJobLogResponse></S:Body></S:Envelope>'''
+
+
+def xsd_types(service_client):
+    schema = service_client.client.wsdl.schema
+    return {GROUP_ELEMENT: {'NumPositions': XInteger(schema, 'int'), 'Valid': XBoolean(schema, 'boolean'),
+                            'PortfolioName': XString(schema, 'string')},
+            DETAIL_ELEMENT: {'ResultCode': XInteger(schema, 'int')}}
+
+
+def test_read_import_log(service_client):
+    import_log, import_detail = read_import_log(BytesIO(REPLY), xsd_types(service_client), first_job=3,
+                                                chunk_size=64)
+    assert import_log['Job'].tolist() == [3, 4]
+    assert import_log['EffectiveDate'].tolist() == ['2026-01-02', '2026-01-03']
+    # missing in the second group
+    assert np.isnan(import_log['NumPositions'][1]) and import_log['NumPositions'][0] == 2
+    assert import_log['Valid'].tolist() == [True, None]
+
+    assert import_detail['Job'].tolist() == [3, 3, 4]
+    assert import_detail['ResultCode'].dtype == np.int64
+    assert import_detail['Message'].tolist() == ['OK', 'Unknown & skipped', 'OK']
+
+
+def test_summary_only_counts_like_details(service_client):
+    types = xsd_types(service_client)
+    _, import_detail = read_import_log(BytesIO(REPLY), types)
+    _, result_codes = read_import_log(BytesIO(REPLY), types, summary_only=True)
+    assert result_codes == {0: 2, 3: 1}
+    assert all(result_codes[code] == count for code, count in
+               zip(*np.unique(import_detail['ResultCode'], return_counts=True)))
+
+    # without the types, the result codes are strings in both modes
+    _, result_codes = read_import_log(BytesIO(REPLY), summary_only=True)
+    assert result_codes == {'0': 2, '3': 1}
+
+
+def test_to_array_booleans(service_client):
+    boolean = XBoolean(service_client.client.wsdl.schema, 'boolean')
+    assert to_array(['true', 'false', '1'], boolean).dtype == bool
+    assert to_array(['true', None, '0'], boolean).tolist() == [True, None, False]
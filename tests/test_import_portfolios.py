@@ -0,0 +1,74 @@
+import datetime
+import threading
+from types import SimpleNamespace
+
+from msci.bdt.context.ServiceClient import ServiceClient
+from msci.bdt.context._CommonClient import chunk_portfolios, merge_columns
+
+
+def portfolio(name, size):
+    return {'PortfolioName': name, 'EffectiveStartDate': '2026-01-02',
+            'Positions': {'id': ['A%i' % i for i in range(size)], 'idtype': ['BARRA'] * size}}
+
+
+def test_chunk_portfolios():
+    ports = [portfolio(name, size) for name, size in (('P1', 3), ('P2', 2), ('P3', 9), ('P4', 1))]
+    chunks = chunk_portfolios(ports, 5)
+    # in order, whole portfolios, a larger one on its own
+    assert [[p['PortfolioName'] for p in chunk] for chunk in chunks] == [['P1', 'P2'], ['P3'], ['P4']]
+
+
+def test_merge_columns():
+    merged = merge_columns([{'Job': [1, 2], 'A': ['a', 'b']}, {'Job': [3], 'B': ['c']}])
+    assert merged == {'Job': [1, 2, 3], 'A': ['a', 'b', None], 'B': [None, None, 'c']}
+
+
+def test_import_portfolios(service_client, monkeypatch):
+    factory = service_client.factory
+    lock = threading.Lock()
+    busy = set()
+    used = set()
+    submitted = {}
+
+    def submit(client, port_list, job_name='BDTImportUserPort'):
+        # a suds client is never used by two threads at a time, nor by the polling thread
+        with lock:
+            assert client.client is not service_client.client
+            assert id(client.client) not in busy
+            busy.add(id(client.client))
+            used.add(id(client.client))
+        threading.Event().wait(0.01)
+        with lock:
+            busy.discard(id(client.client))
+            job_id = 'J%i' % len(submitted)
+            submitted[job_id] = (job_name, [p['PortfolioName'] for p in port_list])
+        return job_id
+
+    def import_log(job_id):
+        groups = []
+        for name in submitted[job_id][1]:
+            group = factory.create('ImportLogGroup')
+            group._PortfolioName = name
+            group._ResultCode = 'OK'
+            group._EffectiveDate = datetime.date(2026, 1, 2)
+            detail = factory.create('ImportLogDetail')
+            detail._ResultCode = '0'
+            group.Details = SimpleNamespace(ImportLogDetail=[detail])
+            groups.append(group)
+        return SimpleNamespace(LogGroups=SimpleNamespace(ImportLogGroup=groups))
+
+    monkeypatch.setattr(ServiceClient, 'submitPortfolioImportJob', submit)
+    service_client.getJobStatus = lambda job_id, job_type: 0
+    service_client.service = SimpleNamespace(GetImportJobLog=import_log)
+    service_client.router = None
+
+    ports = [portfolio('P%i' % i, size) for i, size in enumerate((2, 2, 3, 1, 4, 2))]
+    log, detail = service_client.importPortfolios(ports, 'Imp', max_positions=4, max_in_flight=3, bulk=False)
+
+    assert sorted(name for name, _ in submitted.values()) == ['Imp_%i' % i for i in range(1, 5)]
+    assert len(used) <= 3
+    # numbered across the chunks in port_list order
+    assert log['Job'] == [1, 2, 3, 4, 5, 6]
+    assert log['PortfolioName'] == ['P%i' % i for i in range(6)]
+    assert log['EffectiveDate'] == ['2026-01-02'] * 6
+    assert detail['Job'] == [1, 2, 3, 4, 5, 6]
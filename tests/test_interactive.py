@@ -0,0 +1,129 @@
+import logging
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+from suds import WebFault
+
+from msci.bdt.context.InteractiveClient import InteractiveClient, _Session
+from msci.bdt.context.pool import SessionPool
+
+
+def web_fault(fault_string):
+    return WebFault(SimpleNamespace(faultcode='S:Server', faultstring=fault_string), None)
+
+
+class FakeService(object):
+    """
+    Interactive service recording its calls, GetPositionsReport raising the queued faults first
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.faults = []
+
+    def __getattr__(self, name):
+        def call(*args):
+            self.calls.append(name)
+            if name == 'GetPositionsReport' and self.faults:
+                raise self.faults.pop(0)
+            return SimpleNamespace(IsDone=True)
+
+        return call
+
+
+@pytest.fixture
+def interactive_client():
+    """
+    InteractiveClient logged in to a FakeService
+    """
+    client = InteractiveClient.__new__(InteractiveClient)
+    client.logger = logging.getLogger('test')
+    client.user_id, client.client_id, client.password = 'user', 'client', 'password'
+    client.url = 'http://bdt.test'
+    client.client = SimpleNamespace(service=FakeService())
+    client.service = _Session(client)
+    client.session_state = OrderedDict()
+    client.state_cache = {}
+    client.skipped_calls = 0
+    client.login()
+    return client
+
+
+@pytest.mark.parametrize('fault_string', ['Session expired', 'User not logged in.', 'Invalid session id'])
+def test_auth_fault_logs_in_again(interactive_client, fault_string):
+    calls = interactive_client.client.service.calls
+    interactive_client.service.SetAnalysisDate('2026-01-02')
+    interactive_client.client.service.faults.append(web_fault(fault_string))
+
+    interactive_client.service.GetPositionsReport()
+    assert calls == ['Login', 'SetAnalysisDate', 'GetPositionsReport', 'Logout', 'Login', 'SetAnalysisDate',
+                     'GetPositionsReport']
+
+
+@pytest.mark.parametrize('fault_string', ['Session date is invalid for portfolio P', 'Invalid login name in report'])
+def test_other_fault_raised(interactive_client, fault_string):
+    calls = interactive_client.client.service.calls
+    interactive_client.client.service.faults.append(web_fault(fault_string))
+
+    with pytest.raises(WebFault):
+        interactive_client.service.GetPositionsReport()
+    assert calls == ['Login', 'GetPositionsReport']
+
+
+class FakeSession(object):
+    def __init__(self):
+        self.expiring = False
+        self.fail_relogin = False
+        self.relogins = 0
+        self.terminated = False
+
+    def session_expiring(self):
+        return self.expiring
+
+    def relogin(self):
+        if self.fail_relogin:
+            raise OSError('server down')
+        self.relogins += 1
+        self.expiring = False
+
+    def terminate(self):
+        self.terminated = True
+
+
+def test_session_pool_refresh():
+    with SessionPool(FakeSession, size=2, refresh_interval=3600) as pool:
+        first, second = [client for client, _ in pool.idle]
+        first.expiring = True
+        pool.refresh()
+        assert (first.relogins, second.relogins) == (1, 0)
+        assert pool.metrics()['Refreshed'] == 1
+
+        # a session failing to log in again is replaced
+        second.expiring = second.fail_relogin = True
+        pool.refresh()
+        assert second.terminated
+        assert pool.metrics()['Clients'] == 1
+
+
+def test_session_pool_lease():
+    with SessionPool(FakeSession, size=1, refresh_interval=3600) as pool:
+        client = pool.idle[0][0]
+        # logged in again before being leased when approaching expiry
+        client.expiring = True
+        with pool.lease() as leased:
+            assert leased is client and client.relogins == 1
+
+        # health checked by logging in again after a failed call
+        with pytest.raises(ValueError):
+            with pool.lease() as leased:
+                raise ValueError('call failed')
+        assert client.relogins == 2 and not client.terminated
+
+        client.fail_relogin = True
+        with pytest.raises(ValueError):
+            with pool.lease() as leased:
+                raise ValueError('call failed')
+        assert client.terminated
+        with pool.lease() as leased:
+            assert leased is not client
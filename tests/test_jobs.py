@@ -0,0 +1,40 @@
+import base64
+
+import pytest
+
+from msci.bdt.context.exceptions import BDTError
+
+
+@pytest.fixture
+def job_client(service_client, monkeypatch):
+    """
+    ServiceClient whose job statuses are taken from a list, recording the polling delays
+    """
+    service_client.statuses = []
+    service_client.sleeps = []
+    service_client.getJobStatus = lambda job_id, job_type: service_client.statuses.pop(0)
+    monkeypatch.setattr('msci.bdt.context._CommonClient.time.sleep', service_client.sleeps.append)
+    return service_client
+
+
+def test_wait_job_uses_poll_factor(job_client):
+    job_client.poll_factor = 0.01
+    job_client.statuses = [5, 4, 2, 0]
+    job_client.waitJob('1', 'Export')
+    assert job_client.sleeps == [0.04, 0.02]
+
+
+def test_export_jobs_pruned(job_client):
+    job_client.export_jobs = {'1': ('ES', '2026-01-02'), '2': ('ES', '2026-01-03')}
+
+    class Attachment(object):
+        BinaryData = base64.b64encode(b'data')
+
+    job_client.service = type('Service', (), {'GetExportJob': staticmethod(lambda job_id: Attachment())})()
+    assert job_client.getExportJob('1', stream=False) == b'data'
+    assert '1' not in job_client.export_jobs
+
+    job_client.statuses = [-3]
+    with pytest.raises(BDTError):
+        job_client.waitJob('2', 'Export')
+    assert job_client.export_jobs == {}
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from msci.bdt.context.exceptions import BDTError
+from msci.bdt.context.pool import ClientPool
+
+
+class FakeClient(object):
+    def terminate(self):
+        pass
+
+
+class SlowFactory(object):
+    def __init__(self):
+        self.created = 0
+        self.fail = False
+
+    def __call__(self):
+        time.sleep(0.05)
+        if self.fail:
+            raise OSError('server down')
+        self.created += 1
+        return FakeClient()
+
+
+def test_concurrent_acquirers_do_not_exceed_size():
+    factory = SlowFactory()
+    pool = ClientPool(factory, size=2, health_check=None)
+    for client in [pool.acquire(), pool.acquire()]:
+        pool.release(client, broken=True)
+
+    leased = []
+    lock = threading.Lock()
+
+    def lease():
+        client = pool.acquire(timeout=5)
+        with lock:
+            leased.append(client)
+            assert len(leased) <= 2
+        time.sleep(0.01)
+        with lock:
+            leased.remove(client)
+        pool.release(client)
+
+    threads = [threading.Thread(target=lease) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert factory.created == 4
+    assert pool.metrics()['Clients'] == 2
+    pool.close()
+
+
+def test_failed_creation_frees_the_slot():
+    factory = SlowFactory()
+    pool = ClientPool(factory, size=1, health_check=None)
+    pool.release(pool.acquire(), broken=True)
+    factory.fail = True
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.metrics()['Clients'] == 0
+    factory.fail = False
+    pool.release(pool.acquire(timeout=1))
+    pool.close()
+    with pytest.raises(BDTError):
+        pool.acquire()
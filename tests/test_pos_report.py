@@ -0,0 +1,75 @@
+import io
+
+import numpy as np
+import pytest
+
+from msci.bdt.context.pos_report import NUMERIC, EnvelopeReader, ReportSchema, read_positions_report
+
+ENVELOPE = b'''<?xml version="1.0" encoding="UTF-8"?>
+<S:Envelope xmlns:S="http://schemas.xmlsoap.org/soap/envelope/"><S:Body>
+<tns:GetPositionsReportResponse xmlns:tns="urn:bdti"><tns:Report>
+<tns:ReportDefinition><tns:ColDefinition>
+<tns:ColDefData Name="Weight" DataType="Double"/><tns:ColDefData Name="Name"/>
+</tns:ColDefinition></tns:ReportDefinition>
+<tns:ReportBody>
+<tns:Row IsTotalRow="true"><tns:Cell Val="1.0"/><tns:Cell Val="Total"/></tns:Row>
+<tns:Row><tns:Cell Val="0.25"/><tns:Cell Val="A"/></tns:Row>
+<tns:Row><tns:Cell Val="0.75"/></tns:Row>
+</tns:ReportBody></tns:Report></tns:GetPositionsReportResponse>
+</S:Body></S:Envelope>'''
+
+MIME_WRAPPED = b'--uuid:1\r\nContent-Type: application/xop+xml\r\n\r\n' + ENVELOPE + b'\r\n--uuid:1--\r\n'
+
+
+def read_all(reader, size):
+    data = b''
+    while True:
+        chunk = reader.read(size)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_envelope_reader_strips_mime_wrapper():
+    for chunk_size in (1, 7, 65536):
+        assert EnvelopeReader(io.BytesIO(MIME_WRAPPED), chunk_size).read() == ENVELOPE
+        for size in (1, 5, 100):
+            assert read_all(EnvelopeReader(io.BytesIO(MIME_WRAPPED), chunk_size), size) == ENVELOPE
+
+
+def test_envelope_reader_passes_unwrapped_reply():
+    assert EnvelopeReader(io.BytesIO(ENVELOPE)).read() == ENVELOPE
+    assert EnvelopeReader(io.BytesIO(b'<a/>')).read() == b'<a/>'
+
+
+def test_read_data_rows():
+    columns = read_positions_report(io.BytesIO(MIME_WRAPPED))
+    assert columns == {'Weight': ['0.25', '0.75'], 'Name': ['A', None]}
+
+
+def test_read_total_row():
+    columns = read_positions_report(io.BytesIO(MIME_WRAPPED), data_rows=False)
+    assert columns == {'Weight': ['1.0'], 'Name': ['Total']}
+
+
+def test_read_with_schema():
+    schema = ReportSchema(data_types={'Double': NUMERIC})
+    columns = read_positions_report(io.BytesIO(ENVELOPE), schema=schema)
+    assert columns['Weight'].dtype == np.float64
+    np.testing.assert_array_equal(columns['Weight'], [0.25, 0.75])
+    assert list(columns['Name']) == ['A', None]
+
+
+def test_schema_converts_missing_values_to_nan():
+    schema = ReportSchema({NUMERIC: ['x']})
+    converted = schema.convert({'x': ['1.5', None, '', 'N/A']})
+    np.testing.assert_array_equal(converted['x'], [1.5, np.nan, np.nan, np.nan])
+
+
+@pytest.mark.parametrize('invalid', ['5%', '1,234', 'n/a'])
+def test_schema_keeps_column_with_invalid_values_as_text(invalid):
+    schema = ReportSchema({NUMERIC: ['x']})
+    with pytest.warns(UserWarning, match='column x is kept as text'):
+        converted = schema.convert({'x': ['1.5', None, invalid]})
+    assert converted['x'].dtype == object
+    assert converted['x'].tolist() == ['1.5', None, invalid]
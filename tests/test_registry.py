@@ -0,0 +1,46 @@
+import pytest
+
+from msci.bdt.context.registry import ExportSetRegistry
+
+
+@pytest.fixture
+def export_client(service_client):
+    """
+    ServiceClient recording the export sets it creates and deletes instead of calling the server
+    """
+    service_client.created, service_client.deleted = [], []
+
+    def create(name, model, portfolio_list, **kwargs):
+        name = 'ES%i' % len(service_client.created)
+        service_client.created.append((name, model, portfolio_list))
+        return name
+
+    service_client.createPorfolioExposureExportSet = create
+    service_client.deleteExportSet = service_client.deleted.append
+    service_client.export_set_registry = ExportSetRegistry(service_client, 2)
+    return service_client
+
+
+def test_export_sets_deleted_without_registry(export_client):
+    for _ in range(2):
+        name = export_client.exportSet('PortfolioExposure', 'GEM3L', [('P', 'SYSTEM', 'NONE')])
+        export_client.releaseExportSet(name)
+    assert export_client.deleted == ['ES0', 'ES1']
+    assert len(export_client.export_set_registry) == 0
+
+
+def test_export_sets_reused_with_registry(export_client):
+    export_client.reuse_export_sets = True
+    for _ in range(2):
+        name = export_client.exportSet('PortfolioExposure', 'GEM3L', [('P', 'SYSTEM', 'NONE')])
+        export_client.releaseExportSet(name)
+    assert len(export_client.created) == 1
+    assert export_client.deleted == []
+
+    # beyond max_size, the least recently used export set is deleted
+    for portfolio in ('Q', 'R'):
+        export_client.exportSet('PortfolioExposure', 'GEM3L', [(portfolio, 'SYSTEM', 'NONE')])
+    assert export_client.deleted == ['ES0']
+
+    export_client.export_set_registry.clear()
+    assert export_client.deleted == ['ES0', 'ES1', 'ES2']
@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from suds.transport import Request
+
+from msci.bdt.context.routing import EndpointRouter
+
+
+def test_hedge_delay_is_per_action():
+    router = EndpointRouter(['https://a.test', 'https://b.test'], hedge=True)
+    try:
+        for _ in range(40):
+            router.record('https://a.test', 0.01, 'GetExportJobStatus')
+        for _ in range(5):
+            router.record('https://a.test', 2.0, 'GetExportJob')
+        assert router.hedge_delay('https://a.test', 'GetExportJobStatus') == 0.01
+        # too few downloads to know their latency
+        assert router.hedge_delay('https://a.test', 'GetExportJob') is None
+        for _ in range(5):
+            router.record('https://a.test', 3.0, 'GetExportJob')
+        assert router.hedge_delay('https://a.test', 'GetExportJob') == 3.0
+    finally:
+        router.close()
+
+
+def test_shared_router_closed_once_released():
+    urls = ['https://a.test', 'https://b.test']
+    first = EndpointRouter.shared(urls)
+    second = EndpointRouter.shared(urls)
+    assert first is second
+    first.release()
+    assert first.key in EndpointRouter._shared
+    second.release()
+    assert first.key not in EndpointRouter._shared
+    assert first.executor._shutdown
+
+
+class SlowTransport(object):
+    """
+    Transport answering the requests after a fixed delay, per endpoint if a dictionary
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def _open(self, request):
+        if isinstance(self.delay, dict):
+            time.sleep(self.delay[request.url.split('/axis2')[0]])
+        else:
+            time.sleep(self.delay)
+        return FakeReply()
+
+
+class FakeReply(object):
+    def close(self):
+        pass
+
+
+def test_queued_requests_not_hedged(monkeypatch):
+    monkeypatch.setattr(EndpointRouter, 'hedge_workers', 2)
+    router = EndpointRouter(['https://a.test', 'https://b.test'], hedge=True)
+    try:
+        # endpoint a answers in 20ms, hedging after 50ms
+        for _ in range(EndpointRouter.window):
+            router.record('https://a.test', 0.05, 'GetExportJobStatus')
+        router.last_probe = time.monotonic()
+        transport = SlowTransport(0.02)
+        request = Request('https://a.test/axis2/services/BDTService', b'')
+        request.headers['SOAPAction'] = '"urn:GetExportJobStatus"'
+
+        # many more callers than threads, waiting for a thread must not count as endpoint latency
+        with ThreadPoolExecutor(max_workers=16) as callers:
+            list(callers.map(lambda _: router.open(transport, request).close(), range(16)))
+        assert router.hedges == 0
+        assert router.requests['https://b.test'] == 0
+    finally:
+        router.close()
+
+
+def test_slow_request_hedged():
+    router = EndpointRouter(['https://a.test', 'https://b.test'], hedge=True)
+    try:
+        for _ in range(EndpointRouter.window):
+            router.record('https://a.test', 0.01, 'GetExportJobStatus')
+        router.last_probe = time.monotonic()
+        transport = SlowTransport({'https://a.test': 0.5, 'https://b.test': 0.01})
+        request = Request('https://a.test/axis2/services/BDTService', b'')
+        request.headers['SOAPAction'] = '"urn:GetExportJobStatus"'
+
+        start = time.monotonic()
+        router.open(transport, request).close()
+        assert time.monotonic() - start < 0.4
+        assert (router.hedges, router.hedge_wins) == (1, 1)
+    finally:
+        router.close()
@@ -0,0 +1,221 @@
+import gzip
+import http.client
+import io
+import zlib
+
+import pytest
+from suds.transport import Request, TransportError
+
+from msci.bdt.context.transport import HttpAuthenticated
+
+
+class FakeResponse(object):
+    status = 200
+    reason = 'OK'
+
+    def __init__(self, body, headers=None, status=200):
+        self.status = status
+        self.fp = io.BytesIO(body)
+        self.headers = http.client.HTTPMessage()
+        for name, value in (headers or {}).items():
+            self.headers[name] = value
+        self.msg = self.headers
+
+    def read(self, size=-1):
+        return self.fp.read(size)
+
+    def isclosed(self):
+        return self.fp.tell() == len(self.fp.getvalue())
+
+    def close(self):
+        pass
+
+    def info(self):
+        return self.headers
+
+
+class FakeConnection(object):
+    """
+    Connection whose request or response fails as on a connection the server closed, replying with body and headers
+    otherwise
+    """
+
+    def __init__(self, fail_on=None, body=b'<reply/>', headers=None, status=200):
+        self.fail_on = fail_on
+        self.body = body
+        self.headers = headers
+        self.status = status
+        self.sock = None
+        self.timeout = None
+        self.requests = []
+        self.sent = []
+
+    def request(self, method, path, body, headers):
+        self.requests.append((method, path))
+        self.sent.append((body, headers))
+        if self.fail_on == 'request':
+            raise BrokenPipeError()
+
+    def getresponse(self):
+        if self.fail_on == 'response':
+            raise http.client.RemoteDisconnected('Remote end closed connection without response')
+        return FakeResponse(self.body, self.headers, self.status)
+
+    def close(self):
+        pass
+
+
+def open_on(connections, action, message=b'<request/>', transport=None, headers=None, method='_open'):
+    """
+    Open a request on the connections in turn, the first one being a reused connection
+    """
+    if transport is None:
+        transport = HttpAuthenticated()
+    queue = list(connections)
+    transport.pool.acquire = lambda key, connect: (queue.pop(0), len(queue) == len(connections) - 1)
+    request = Request('http://bdt.test/axis2/services/BDTService', message)
+    request.headers = dict(headers or {}, SOAPAction='urn:%s' % action)
+    return getattr(transport, method)(request)
+
+
+def test_retry_failed_send():
+    stale, fresh = FakeConnection('request'), FakeConnection()
+    assert open_on([stale, fresh], 'SubmitExportJob').read() == b'<reply/>'
+    assert len(fresh.requests) == 1
+
+
+def test_retry_lost_reply_of_idempotent_action():
+    stale, fresh = FakeConnection('response'), FakeConnection()
+    assert open_on([stale, fresh], 'GetExportJobStatus').read() == b'<reply/>'
+    assert len(fresh.requests) == 1
+
+
+def test_no_retry_lost_reply_of_other_action():
+    stale, fresh = FakeConnection('response'), FakeConnection()
+    with pytest.raises(http.client.RemoteDisconnected):
+        open_on([stale, fresh], 'SubmitImportJob')
+    assert fresh.requests == []
+
+
+# compressible and incompressible parts, larger than the read chunks
+BODY = b'<reply>' + b'<row>0.125|0.25</row>' * 20000 + bytes(range(256)) * 300 + b'</reply>'
+
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+@pytest.mark.parametrize('encoding, compress', [('gzip', gzip.compress), ('x-gzip', gzip.compress),
+                                                ('deflate', zlib.compress), ('deflate', raw_deflate)])
+def test_decompress_reply(encoding, compress):
+    transport = HttpAuthenticated()
+    transport.pool.release = lambda key, conn: None
+    compressed = compress(BODY)
+    conn = FakeConnection(body=compressed, headers={'Content-Encoding': encoding})
+
+    assert open_on([conn], 'GetExportJob', transport=transport).read() == BODY
+    assert transport.compressionStats() == {'Received': len(compressed), 'Decoded': len(BODY),
+                                            'Ratio': len(compressed) / len(BODY)}
+
+
+@pytest.mark.parametrize('compress', [zlib.compress, raw_deflate])
+def test_decompress_reply_in_small_reads(compress):
+    transport = HttpAuthenticated()
+    transport.pool.release = lambda key, conn: None
+    compressed = compress(BODY)
+    fp = open_on([FakeConnection(body=compressed, headers={'Content-Encoding': 'deflate'})], 'GetExportJob',
+                 transport=transport)
+    fp.chunk_size = 1000
+
+    chunks = []
+    chunk = fp.read(777)
+    while chunk:
+        assert len(chunk) <= 777
+        chunks.append(chunk)
+        chunk = fp.read(777)
+    fp.close()
+
+    assert b''.join(chunks) == BODY
+    assert transport.compressionStats()['Received'] == len(compressed)
+    assert transport.compressionStats()['Decoded'] == len(BODY)
+
+
+def test_uncompressed_reply_counted():
+    transport = HttpAuthenticated()
+    assert transport.compressionStats() == {'Received': 0, 'Decoded': 0, 'Ratio': None}
+    transport.pool.release = lambda key, conn: None
+
+    assert open_on([FakeConnection(body=BODY)], 'GetExportJob', transport=transport).read() == BODY
+    assert transport.compressionStats() == {'Received': len(BODY), 'Decoded': len(BODY), 'Ratio': 1.0}
+
+
+@pytest.mark.parametrize('encoding, compress', [('gzip', gzip.compress), ('deflate', zlib.compress),
+                                                ('deflate', raw_deflate)])
+def test_truncated_compressed_reply(encoding, compress):
+    conn = FakeConnection(body=compress(BODY)[:-100], headers={'Content-Encoding': encoding})
+    with pytest.raises(zlib.error):
+        open_on([conn], 'GetExportJob').read()
+
+
+def test_corrupt_compressed_reply():
+    compressed = bytearray(gzip.compress(BODY))
+    # in the gzip trailer, CRC32 of the body
+    compressed[-6] ^= 0xff
+    conn = FakeConnection(body=bytes(compressed), headers={'Content-Encoding': 'gzip'})
+    with pytest.raises(zlib.error):
+        open_on([conn], 'GetExportJob').read()
+
+
+def redirect(status, location):
+    return FakeConnection(body=b'moved', headers={'Location': location}, status=status)
+
+
+@pytest.mark.parametrize('status', [307, 308])
+def test_post_redirect_keeps_method_and_body(status):
+    target = FakeConnection()
+    headers = {'Content-Type': 'text/xml', 'Authorization': 'Basic x'}
+    fp = open_on([redirect(status, '/axis2/services/Other'), target], 'SubmitExportJob', headers=headers)
+    assert fp.read() == b'<reply/>'
+    assert target.requests == [('POST', '/axis2/services/Other')]
+    body, sent_headers = target.sent[0]
+    assert body == b'<request/>'
+    assert sent_headers['Content-Type'] == 'text/xml' and sent_headers['Authorization'] == 'Basic x'
+
+
+@pytest.mark.parametrize('status', [301, 302, 303])
+def test_post_redirect_becomes_get(status):
+    target = FakeConnection()
+    open_on([redirect(status, 'http://bdt.test/moved?x=1'), target], 'GetCurrentVersion',
+            headers={'Content-Type': 'text/xml'}).read()
+    assert target.requests == [('GET', '/moved?x=1')]
+    body, sent_headers = target.sent[0]
+    assert body is None and 'Content-Type' not in sent_headers
+
+
+def test_redirect_to_other_host_drops_credentials():
+    target = FakeConnection()
+    open_on([redirect(307, 'https://other.test/BDTService'), target], 'SubmitExportJob',
+            headers={'Authorization': 'Basic x'}).read()
+    assert target.requests == [('POST', '/BDTService')]
+    assert 'Authorization' not in target.sent[0][1]
+
+
+def test_redirects_not_followed_raise():
+    transport = HttpAuthenticated()
+    transport.max_redirects = 2
+    with pytest.raises(TransportError) as e:
+        open_on([redirect(302, '/a'), redirect(302, '/b'), redirect(302, '/c')], 'GetCurrentVersion',
+                transport=transport)
+    assert e.value.httpcode == 302 and e.value.fp.read() == b'moved'
+
+    for conn in [FakeConnection(body=b'moved', status=302), redirect(302, 'ftp://bdt.test/a'),
+                 FakeConnection(body=b'', status=304)]:
+        with pytest.raises(TransportError):
+            open_on([conn], 'GetCurrentVersion')
+
+
+@pytest.mark.parametrize('status', [202, 204])
+def test_send_ignores_accepted_and_no_content_body(status):
+    reply = open_on([FakeConnection(body=b'<ignored', status=status)], 'SubmitExportJob', method='send')
+    assert reply.code == status and reply.message == b''